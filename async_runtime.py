@@ -0,0 +1,184 @@
+"""
+Optional asyncio runtime (RUNTIME=asyncio).
+One event loop runs the MQTT socket I/O (paho's external-loop socket callbacks) and every
+periodic job as a coroutine. Gammu calls still go through each modem's ModemWorker, the
+single thread that owns the state machine, and are awaited with asyncio.wrap_future; the
+mqtt_layer and gammu_layer functions are the same as in the threaded runtime.
+"""
+
+import asyncio
+import logging
+import time
+
+import mqtt_layer
+
+# paho housekeeping (keepalive pings, retries) interval
+MQTT_MISC_INTERVAL_SEC = 1.0
+# Reconnect backoff bounds while the broker is unreachable
+RECONNECT_MIN_DELAY_SEC = 1.0
+RECONNECT_MAX_DELAY_SEC = 60.0
+# How often paused jobs re-check the connection while MQTT is down
+DISCONNECTED_RECHECK_SEC = 1.0
+
+
+class MqttSocketBridge:
+    """
+    Hooks paho's socket callbacks into the event loop: the socket is read with add_reader
+    and written with add_writer instead of a network thread. paho may call these from a
+    modem worker (publish) or an executor thread (connect), so every loop operation is
+    handed over with call_soon_threadsafe.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, client):
+        self.loop = loop
+        self.client = client
+        self.misc = None
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def on_socket_open(self, client, userdata, sock):
+        self.loop.call_soon_threadsafe(self._open, sock)
+
+    def _open(self, sock):
+        self.loop.add_reader(sock, self.client.loop_read)
+        if self.misc is None or self.misc.done():
+            self.misc = self.loop.create_task(self._misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.call_soon_threadsafe(self._close, sock)
+
+    def _close(self, sock):
+        self.loop.remove_reader(sock)
+        self.loop.remove_writer(sock)
+        if self.misc is not None:
+            self.misc.cancel()
+            self.misc = None
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.call_soon_threadsafe(self.loop.add_writer, sock, self.client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.call_soon_threadsafe(self.loop.remove_writer, sock)
+
+    async def _misc_loop(self):
+        while self.client.loop_misc() == 0:
+            await asyncio.sleep(MQTT_MISC_INTERVAL_SEC)
+
+
+async def _await_worker(future):
+    """
+    Await a ModemWorker Future (None when submit_once skipped a duplicate). A job that raised
+    is logged and yields None, as in the threaded runtime: one modem error (e.g. a Gammu
+    timeout) must not end the loop awaiting it.
+    """
+    if future is None:
+        return None
+    try:
+        return await asyncio.wrap_future(future)
+    except Exception as e:
+        logging.error("Modem job failed: %s", e)
+        return None
+
+
+async def receive_loop(ctx, mctx, event_tick_sec: float) -> None:
+    """
+    One modem's inbox: event ticks or adaptive polling, paused while MQTT is down unless the
+    modem has a received journal.
+    """
+    while True:
+        if not ctx.mqtt_connected and getattr(mctx, "received_journal", None) is None:
+            await asyncio.sleep(DISCONNECTED_RECHECK_SEC)
+            continue
+        if mctx.event_receive:
+            await _await_worker(
+                mctx.worker.submit_once("receive", mqtt_layer.receive_tick, mctx, time.time())
+            )
+            await asyncio.sleep(event_tick_sec)
+        else:
+            mctx.last_receive_scan = time.time()
+            await _await_worker(mctx.worker.submit_once("receive", mqtt_layer.poll_receive, mctx))
+            await asyncio.sleep(mctx.receive_poller.interval)
+
+
+async def status_loop(ctx, status_scheduler) -> None:
+    """Status metrics of the primary modem, each on its own PollScheduler interval."""
+    while True:
+        now = time.time()
+        due_metrics = status_scheduler.peek(now) if ctx.mqtt_connected else []
+        if due_metrics:
+            future = ctx.worker.submit_once("status", mqtt_layer.poll_status, ctx, due_metrics)
+            if future is None:
+                # An earlier poll is still queued or running: keep these due, offer them again
+                await asyncio.sleep(mqtt_layer.STATUS_BUSY_RETRY_SEC)
+                continue
+            status_scheduler.due(now)
+            await _await_worker(future)
+        next_due = status_scheduler.next_due()
+        if next_due is None or not ctx.mqtt_connected:
+            await asyncio.sleep(DISCONNECTED_RECHECK_SEC)
+        else:
+            await asyncio.sleep(max(next_due - time.time(), 0.0))
+
+
+async def every(interval_sec: float, func, *args) -> None:
+    """Call func(*args) every interval_sec on the loop (stats, outbox flush)."""
+    while True:
+        await asyncio.sleep(interval_sec)
+        try:
+            func(*args)
+        except Exception as e:
+            logging.error("Periodic job %s failed: %s", getattr(func, "__name__", func), e)
+
+
+async def reconnect_loop(ctx) -> None:
+    """Reconnect with exponential backoff; the blocking connect runs in an executor."""
+    loop = asyncio.get_running_loop()
+    delay = RECONNECT_MIN_DELAY_SEC
+    while True:
+        await asyncio.sleep(delay)
+        if ctx.mqtt_connected:
+            delay = RECONNECT_MIN_DELAY_SEC
+            continue
+        try:
+            await loop.run_in_executor(None, ctx.client.reconnect)
+            logging.info("Reconnected to MQTT")
+            delay = RECONNECT_MIN_DELAY_SEC
+        except Exception as e:
+            logging.error("MQTT reconnect failed: %s", e)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY_SEC)
+
+
+async def run(ctx, status_scheduler, event_tick_sec: float) -> None:
+    """Connect MQTT on the event loop and run all periodic jobs until shutdown sets ctx.stopping."""
+    loop = asyncio.get_running_loop()
+    config = ctx.config
+    client = ctx.client
+    MqttSocketBridge(loop, client)
+    await loop.run_in_executor(None, client.connect, config.host, config.port)
+    ctx.mqtt_connected = True
+    mqtt_layer.replay_outbox(ctx, client)
+
+    if config.receive_mode == "event":
+        for mctx in ctx.modems:
+            mctx.event_receive = await _await_worker(
+                mctx.worker.submit("control", mqtt_layer.enable_event_receive, mctx)
+            )
+    jobs = [receive_loop(ctx, mctx, event_tick_sec) for mctx in ctx.modems]
+    jobs.append(status_loop(ctx, status_scheduler))
+    jobs.append(reconnect_loop(ctx))
+    if ctx.outbox is not None:
+        jobs.append(every(config.outbox_flush_sec, ctx.outbox.flush_if_due))
+    if config.stats_interval_sec:
+        jobs.append(every(config.stats_interval_sec, mqtt_layer.publish_stats, ctx))
+    logging.info("Asyncio runtime started (%d jobs)", len(jobs))
+    tasks = [asyncio.ensure_future(job) for job in jobs]
+    try:
+        # The signal handler (mqtt_layer.shutdown) only sets ctx.stopping
+        while not getattr(ctx, "stopping", False):
+            await asyncio.sleep(DISCONNECTED_RECHECK_SEC)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,396 @@
+"""
+Bridge benchmark against a simulated modem: no GSM modem or MQTT broker needed.
+
+Drives the real send path (on_mqtt_message -> send_request -> gammu_layer.send_sms) and
+receive path (loop_sms_receive -> _publish_received -> delete) with a fake Gammu state
+machine (configurable per-command latency) and an in-process MQTT client. Reports
+messages/second, per-message latency percentiles and allocations (tracemalloc), and
+compares against a saved baseline so regressions show up before a release.
+
+    uv run python benchmarks/bench_bridge.py                  # run and compare with baseline
+    uv run python benchmarks/bench_bridge.py --save-baseline  # record a new baseline
+    uv run python benchmarks/bench_bridge.py --latency SendSMS=0.05,GetSMS=0.01
+
+Exit status is 1 when a metric regressed by more than --tolerance against the baseline.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Gammu AT driver SIM inbox locations (folder 1)
+SIM_BASE_LOCATION = 100000
+
+
+def _gammu_stand_in() -> SimpleNamespace:
+    """
+    Minimal pure-Python replacement for the python-gammu helpers the bridge calls without a
+    device (EncodeSMS, LinkSMS, DecodeSMS), used when python-gammu is not installed.
+    """
+
+    class ERR_EMPTY(Exception):
+        pass
+
+    def encode_sms(smsinfo):
+        text = smsinfo["Entries"][0]["Buffer"]
+        size = 160 if len(text) <= 160 else 153
+        chunks = [text[i : i + size] for i in range(0, len(text), size)] or [""]
+        return [
+            {"Class": smsinfo.get("Class", -1), "Text": chunk, "Coding": "Default_No_Compression"}
+            for chunk in chunks
+        ]
+
+    def decode_sms(parts):
+        return {"Entries": [{"Buffer": "".join(p["Text"] for p in parts)}]}
+
+    return SimpleNamespace(
+        ERR_EMPTY=ERR_EMPTY,
+        EncodeSMS=encode_sms,
+        LinkSMS=lambda allsms: [list(sms) for sms in allsms],
+        DecodeSMS=decode_sms,
+        Version=lambda: ("stand-in", "stand-in"),
+        # Only used in annotations; the benchmark passes FakeStateMachine
+        StateMachine=object,
+    )
+
+
+try:
+    import gammu
+
+    GAMMU_IMPL = "python-gammu %s" % gammu.Version()[1]
+except ImportError:
+    gammu = sys.modules["gammu"] = _gammu_stand_in()
+    GAMMU_IMPL = "stand-in"
+
+import gammu_layer as gammu_io  # noqa: E402
+import mqtt_layer  # noqa: E402
+import serialization  # noqa: E402
+import sms2mqtt  # noqa: E402
+from publish_tracker import PublishTracker  # noqa: E402
+
+
+class FakeStateMachine:
+    """
+    In-memory modem: SIM storage as {location: [sms]}. Each Gammu command sleeps for its
+    entry in latency (seconds; "default" applies to commands not listed) like a serial
+    round trip would.
+    """
+
+    def __init__(self, latency: dict = None, size: int = 1000):
+        self.latency = latency or {}
+        self.size = size
+        self.storage = {}
+        self.sent = 0
+        self._next_ref = 0
+
+    def _wait(self, command: str) -> None:
+        seconds = self.latency.get(command, self.latency.get("default", 0.0))
+        if seconds:
+            time.sleep(seconds)
+
+    def _store(self, sms: dict) -> None:
+        for slot in range(1, self.size + 1):
+            location = SIM_BASE_LOCATION + slot
+            if location not in self.storage:
+                sms["Location"] = location
+                self.storage[location] = [sms]
+                return
+        raise RuntimeError("SIM storage full")
+
+    def deliver(self, number: str, text: str, parts: int = 1) -> None:
+        """Put an incoming SMS on the SIM; parts > 1 stores a concatenated SMS, last part first."""
+        now = datetime.datetime.now()
+        if parts == 1:
+            udh = {"Type": "NoUDH", "AllParts": -1}
+            self._store({"Number": number, "DateTime": now, "Text": text, "UDH": udh})
+            return
+        self._next_ref = (self._next_ref + 1) % 256
+        size = -(-len(text) // parts)
+        for part in range(parts, 0, -1):
+            udh = {
+                "Type": "ConcatenatedMessages",
+                "ID8bit": self._next_ref,
+                "ID16bit": -1,
+                "PartNumber": part,
+                "AllParts": parts,
+            }
+            chunk = text[(part - 1) * size : part * size]
+            self._store({"Number": number, "DateTime": now, "Text": chunk, "UDH": udh})
+
+    def SendSMS(self, message):
+        self._wait("SendSMS")
+        self.sent += 1
+        return self.sent
+
+    def GetSMSStatus(self):
+        self._wait("GetSMSStatus")
+        return {
+            "SIMUsed": len(self.storage),
+            "SIMSize": self.size,
+            "PhoneUsed": 0,
+            "PhoneSize": 0,
+        }
+
+    def GetSMS(self, Folder, Location):
+        self._wait("GetSMS")
+        if Location not in self.storage:
+            raise gammu.ERR_EMPTY()
+        return self.storage[Location]
+
+    def GetNextSMS(self, Folder, Start=False, Location=None):
+        self._wait("GetNextSMS")
+        locations = sorted(self.storage)
+        if not Start:
+            locations = [loc for loc in locations if loc > Location]
+        if not locations:
+            raise gammu.ERR_EMPTY()
+        return self.storage[locations[0]]
+
+    def DeleteSMS(self, Folder, Location):
+        self._wait("DeleteSMS")
+        del self.storage[Location]
+
+
+class StubMqttClient:
+    """
+    In-process paho stand-in: publish always succeeds and records when each topic was hit.
+    QoS 1 publishes are acknowledged at once through on_publish, like a broker on localhost.
+    """
+
+    def __init__(self, prefix: str):
+        self.received_topic = f"{prefix}/received"
+        self.sent_topic = f"{prefix}/sent"
+        self.received_at = []
+        self.sent_at = []
+        self.mid = 0
+        self.userdata = None
+        self.on_publish = None
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        self.mid += 1
+        if topic == self.received_topic:
+            self.received_at.append(time.perf_counter())
+        elif topic == self.sent_topic:
+            self.sent_at.append(time.perf_counter())
+        if qos and self.on_publish is not None:
+            self.on_publish(self, self.userdata, self.mid, 0, None)
+        return SimpleNamespace(rc=0, mid=self.mid)
+
+    def loop(self, timeout=1.0):
+        return 0
+
+
+def build_bridge(latency: dict, journal: bool = False) -> SimpleNamespace:
+    """Runtime context wired like sms2mqtt.main(), with the fake modem and stub client."""
+    config = sms2mqtt.build_config_from_env()
+    # Measure the bridge itself: no send rate limit, no outbox file, journal only on request
+    config.send_rate_per_min = 0.0
+    config.outbox_path = None
+    if not journal:
+        config.multipart_journal = ""
+    gammu_io.configure_pdu_cache(config.pdu_cache_size)
+    serialization.configure(config.payload_format, config.payload_format_topics)
+    ctx = sms2mqtt.build_runtime_context(config)
+    ctx.client = StubMqttClient(config.prefix)
+    if config.received_inflight_max:
+        ctx.publish_tracker = PublishTracker(
+            config.received_inflight_max, config.received_ack_timeout_sec
+        )
+        ctx.client.userdata = ctx
+        ctx.client.on_publish = mqtt_layer.on_mqtt_publish
+    ctx.gammusm = FakeStateMachine(latency)
+    sms2mqtt.configure_modem(config, ctx)
+    return ctx
+
+
+def _percentiles(samples: list) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": None, "p95": None, "p99": None}
+
+    def pick(q):
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 3)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+def run_send(ctx, messages: int, text_length: int) -> list:
+    """Publish messages to {prefix}/send; returns per-message latency (call to /sent feedback)."""
+    client = ctx.client
+    topic = f"{ctx.config.prefix}/send"
+    latencies = []
+    for i in range(messages):
+        text = f"bench {i:06d} ".ljust(text_length, "x")
+        payload = json.dumps({"number": f"+1555{i % 10000:04d}", "text": text}).encode()
+        msg = SimpleNamespace(topic=topic, payload=payload)
+        started = time.perf_counter()
+        mqtt_layer.on_mqtt_message(client, ctx, msg)
+        latencies.append(client.sent_at[-1] - started)
+    return latencies
+
+
+def run_receive(ctx, messages: int, batch: int, multipart_every: int) -> list:
+    """
+    Deliver messages to the SIM in bursts of batch and run receive passes until each burst
+    is published; returns per-message latency (delivery to /received publish).
+    """
+    client = ctx.client
+    modem = ctx.gammusm
+    latencies = []
+    i = 0
+    while i < messages:
+        burst = min(batch, messages - i)
+        for j in range(burst):
+            parts = 2 if multipart_every and (i + j + 1) % multipart_every == 0 else 1
+            modem.deliver(f"+1555{(i + j) % 10000:04d}", f"incoming {i + j:06d} " * 12, parts)
+        delivered = time.perf_counter()
+        done = len(client.received_at)
+        while len(client.received_at) - done < burst:
+            if not mqtt_layer.loop_sms_receive(ctx) and not modem.storage:
+                break
+        latencies.extend(t - delivered for t in client.received_at[done:])
+        i += burst
+    # Acknowledged SMS are deleted at the start of a pass: one more clears the SIM
+    mqtt_layer.loop_sms_receive(ctx)
+    return latencies
+
+
+def measure(name: str, run, messages: int) -> dict:
+    """Timed pass, then an allocation pass of the same workload under tracemalloc."""
+    started = time.perf_counter()
+    latencies = run()
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    snapshot = tracemalloc.take_snapshot()
+    run()
+    after, peak = tracemalloc.get_traced_memory()
+    blocks = sum(s.count_diff for s in tracemalloc.take_snapshot().compare_to(snapshot, "filename"))
+    tracemalloc.stop()
+
+    result = {
+        "messages": len(latencies),
+        "seconds": round(elapsed, 4),
+        "msgs_per_sec": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": _percentiles(latencies),
+        "alloc_peak_kb": round((peak - before) / 1024, 1),
+        "retained_bytes_per_msg": round((after - before) / max(messages, 1), 1),
+        "retained_blocks": blocks,
+    }
+    logging.info("%s: %s", name, result)
+    return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions worse than tolerance (fraction) against baseline, as readable strings."""
+    if baseline.get("params") != results["params"]:
+        print("Baseline was recorded with different parameters; not comparing", file=sys.stderr)
+        return []
+    regressions = []
+    for path in ("send", "receive"):
+        cur, base = results.get(path), baseline.get(path)
+        if not cur or not base:
+            continue
+        if base["msgs_per_sec"] and cur["msgs_per_sec"] < base["msgs_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{path}: {cur['msgs_per_sec']} msgs/s vs baseline {base['msgs_per_sec']}"
+            )
+        for key, cur_value, base_value in (
+            ("latency p95 ms", cur["latency_ms"]["p95"], base["latency_ms"]["p95"]),
+            ("alloc peak kB", cur["alloc_peak_kb"], base["alloc_peak_kb"]),
+        ):
+            if base_value and cur_value > base_value * (1 + tolerance):
+                regressions.append(f"{path}: {key} {cur_value} vs baseline {base_value}")
+    return regressions
+
+
+def parse_latency(spec: str) -> dict:
+    """'SendSMS=0.05,default=0.001' -> {'SendSMS': 0.05, 'default': 0.001} (seconds)."""
+    latency = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        command, _, seconds = item.partition("=")
+        latency[command.strip()] = float(seconds)
+    return latency
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=2000, help="messages per path")
+    parser.add_argument("--latency", default="", help="per-command seconds, e.g. SendSMS=0.05")
+    parser.add_argument("--text-length", type=int, default=100, help="sent text length")
+    parser.add_argument("--batch", type=int, default=10, help="received SMS per burst")
+    parser.add_argument(
+        "--multipart-every", type=int, default=5, help="every Nth received SMS has 2 parts"
+    )
+    parser.add_argument("--journal", action="store_true", help="enable the multipart journal")
+    parser.add_argument("--only", choices=("send", "receive"), help="run one path")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression (0.2)")
+    parser.add_argument("--output", help="also write results JSON here")
+    args = parser.parse_args(argv)
+
+    # The bridge logs every message at INFO; keep the console for the report
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    latency = parse_latency(args.latency)
+    params = {
+        "messages": args.messages,
+        "latency": latency,
+        "text_length": args.text_length,
+        "batch": args.batch,
+        "multipart_every": args.multipart_every,
+        "journal": args.journal,
+    }
+    results = {
+        "params": params,
+        "gammu": GAMMU_IMPL,
+        "python": platform.python_version(),
+        "recorded": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if args.only in (None, "send"):
+        ctx = build_bridge(latency, args.journal)
+        results["send"] = measure(
+            "send", lambda: run_send(ctx, args.messages, args.text_length), args.messages
+        )
+    if args.only in (None, "receive"):
+        ctx = build_bridge(latency, args.journal)
+        results["receive"] = measure(
+            "receive",
+            lambda: run_receive(ctx, args.messages, args.batch, args.multipart_every),
+            args.messages,
+        )
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}", file=sys.stderr)
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline yet (run with --save-baseline)", file=sys.stderr)
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for line in regressions:
+        print("REGRESSION " + line, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
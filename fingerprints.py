@@ -0,0 +1,67 @@
+"""
+Fingerprints of received SMS already handed off (published to MQTT or taken by the multipart
+reassembler) whose delete from modem storage failed. While a fingerprint is held, the receive
+loop only retries the delete instead of publishing the message again. Bounded in size (oldest
+first) and age (TTL). No MQTT, no Gammu calls.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def sms_fingerprint(part: dict) -> str:
+    """One stored message: sender, timestamp, text hash and storage location."""
+    text = part.get("Text") or ""
+    digest = hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=8).hexdigest()
+    return f"{part.get('Number', '')}|{part.get('DateTime', '')}|{digest}|{part['Location']}"
+
+
+class FingerprintCache:
+    """Set of fingerprints in insertion order, each kept for at most ttl_sec."""
+
+    def __init__(self, max_size: int = 1000, ttl_sec: float = 86400.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl_sec = ttl_sec
+        self.clock = clock
+        self.suppressed = 0
+        self._lock = threading.Lock()
+        self._expires = OrderedDict()
+
+    def add(self, fingerprint: str) -> None:
+        now = self.clock()
+        with self._lock:
+            self._expires.pop(fingerprint, None)
+            self._expires[fingerprint] = now + self.ttl_sec
+            while self._expires:
+                oldest, expires = next(iter(self._expires.items()))
+                if len(self._expires) <= self.max_size and expires > now:
+                    break
+                del self._expires[oldest]
+
+    def seen(self, fingerprint: str) -> bool:
+        with self._lock:
+            expires = self._expires.get(fingerprint)
+            if expires is None:
+                return False
+            if expires <= self.clock():
+                del self._expires[fingerprint]
+                return False
+            return True
+
+    def seen_all(self, parts: list) -> bool:
+        """True if every part is held; counts one suppressed republish."""
+        if not parts or not all(self.seen(sms_fingerprint(part)) for part in parts):
+            return False
+        with self._lock:
+            self.suppressed += 1
+        return True
+
+    def discard(self, fingerprint: str) -> None:
+        with self._lock:
+            self._expires.pop(fingerprint, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"held": len(self._expires), "suppressed": self.suppressed}
@@ -3,10 +3,70 @@ Gammu I/O layer: modem init, send/receive SMS, signal/battery/network/datetime.
 No MQTT, no topic names, no business logic — thin wrapper over gammu.
 """
 
+import functools
+import itertools
 import logging
+import os
+import random
+import select
+import termios
+import threading
+import time
+import tty
+from collections import OrderedDict
 
 import gammu
 
+import metrics
+
+
+def _record_call(op: str, seconds: float, ok: bool) -> None:
+    metrics.GAMMU_CALL_SECONDS.observe(seconds, op=op)
+    if not ok:
+        metrics.GAMMU_CALL_ERRORS.inc(op=op)
+
+
+# Called as recorder(op, seconds, ok) after every timed Gammu call; see set_call_recorder
+_call_recorder = [_record_call]
+
+
+def set_call_recorder(recorder) -> None:
+    """Replace the per-call timing hook (e.g. for tests or another backend); None disables."""
+    _call_recorder[0] = recorder
+
+
+def timed(func):
+    """Time a Gammu call and report it to the call recorder under the function's name."""
+    op = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        recorder = _call_recorder[0]
+        if recorder is None:
+            return func(*args, **kwargs)
+        started = time.monotonic()
+        ok = False
+        try:
+            result = func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            recorder(op, time.monotonic() - started, ok)
+
+    return wrapper
+
+
+def call_stats() -> dict:
+    """Per Gammu operation: count, errors and p50/p95/p99 seconds (bucket estimates)."""
+    stats = {}
+    for op in metrics.GAMMU_CALL_SECONDS.label_values("op"):
+        hist = metrics.GAMMU_CALL_SECONDS
+        stats[op] = {"count": hist.count(op=op), "errors": metrics.GAMMU_CALL_ERRORS.value(op=op)}
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = hist.quantile(q, op=op)
+            stats[op][name] = round(value, 4) if value is not None else None
+    return stats
+
 
 def write_gammurc(path: str, device: str, gammuoption: str = "") -> None:
     """Write Gammu config file to path (must be in a writable directory)."""
@@ -24,6 +84,7 @@ connection = at
         raise
 
 
+@timed
 def init_state_machine(gammurc_path: str, pincode: str = None) -> gammu.StateMachine:
     """Init Gammu state machine; enter PIN if required. Returns ready StateMachine."""
     sm = gammu.StateMachine()
@@ -34,19 +95,148 @@ def init_state_machine(gammurc_path: str, pincode: str = None) -> gammu.StateMac
     return sm
 
 
+@timed
+def set_incoming_storage(device: str, memory: str, timeout_sec: float = 2.0) -> bool:
+    """
+    Route newly received SMS to memory ("ME" phone, "SM" SIM) with AT+CPMS. python-gammu
+    only selects the memory it reads from, so this talks to the serial device directly and
+    must run before Gammu opens it. Returns True if the modem answered OK.
+    """
+    command = f'AT+CPMS="{memory}","{memory}","{memory}"\r'.encode("ascii")
+    fd = os.open(device, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    try:
+        attrs = termios.tcgetattr(fd)
+        tty.setraw(fd)
+        try:
+            os.write(fd, command)
+            reply = b""
+            deadline = time.monotonic() + timeout_sec
+            while b"OK" not in reply and b"ERROR" not in reply:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                    break
+                reply += os.read(fd, 256)
+        finally:
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    finally:
+        os.close(fd)
+    logging.debug("AT+CPMS reply from %s: %r", device, reply)
+    return b"OK" in reply and b"ERROR" not in reply
+
+
+class PduCache:
+    """
+    Bounded LRU of encoded PDU templates (gammu.EncodeSMS output) keyed by text and
+    encoding options. Recipients get shallow copies with Number/SMSC patched (and a fresh
+    concatenation reference for multipart, see with_concat_reference), so a fan-out or a
+    recurring alert text is encoded once. Thread-safe (one worker per modem).
+    """
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, text: str, sms_class: int = -1, entry_id: str = "ConcatenatedAutoTextLong"
+    ) -> list:
+        """Return the encoded message template list for text (encode on miss)."""
+        key = (text, sms_class, entry_id)
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return encoded
+            self.misses += 1
+        smsinfo = {"Class": sms_class, "Entries": [{"ID": entry_id, "Buffer": text}]}
+        encoded = gammu.EncodeSMS(smsinfo)
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[key] = encoded
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return encoded
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_pdu_cache = PduCache()
+
+
+def configure_pdu_cache(max_size: int) -> None:
+    """Resize the PDU template cache; 0 disables caching (every send encodes)."""
+    global _pdu_cache
+    _pdu_cache = PduCache(max_size)
+
+
+def pdu_cache_stats() -> dict:
+    """Hit/miss counters and size of the PDU template cache."""
+    return _pdu_cache.stats()
+
+
+# Concatenated-SMS information elements in the UDH: IEI -> reference length in bytes
+_CONCAT_IEI = {0x00: 1, 0x08: 2}
+
+# Per-send concatenation reference, like Gammu's own counter (random start, then +1)
+_concat_refs = itertools.count(random.randrange(1 << 16))
+
+
+def with_concat_reference(message: dict, ref: int) -> dict:
+    """
+    Shallow copy of one encoded part with its concatenation reference set to ref (8- or
+    16-bit, in both the UDH bytes and ID8bit/ID16bit). Other UDHs are copied unchanged.
+    """
+    message = dict(message)
+    udh = message.get("UDH") or {}
+    data = bytearray(udh.get("Text") or b"")
+    pos = 1
+    while pos + 1 < len(data) and pos <= data[0]:
+        size = _CONCAT_IEI.get(data[pos])
+        if size is not None and pos + 2 + size <= len(data):
+            ref &= (1 << (8 * size)) - 1
+            data[pos + 2 : pos + 2 + size] = ref.to_bytes(size, "big")
+            message["UDH"] = dict(udh, Text=bytes(data))
+            message["UDH"]["ID8bit" if size == 1 else "ID16bit"] = ref
+            break
+        pos += 2 + data[pos + 1]
+    return message
+
+
+@timed
 def send_sms(sm: gammu.StateMachine, number: str, text: str) -> None:
-    """Encode and send one SMS. No MQTT."""
-    smsinfo = {
-        "Class": -1,
-        "Entries": [{"ID": "ConcatenatedAutoTextLong", "Buffer": text}],
-    }
-    encoded = gammu.EncodeSMS(smsinfo)
-    for message in encoded:
+    """Encode (or reuse cached PDUs) and send one SMS. No MQTT."""
+    templates = _pdu_cache.get(text)
+    # Each send of a multipart text needs its own reference, or phones merge the parts
+    ref = next(_concat_refs) if len(templates) > 1 else None
+    for template in templates:
+        message = dict(template) if ref is None else with_concat_reference(template, ref)
         message["SMSC"] = {"Location": 1}
         message["Number"] = number
-        sm.SendSMS(message)
+        started = time.monotonic()
+        try:
+            sm.SendSMS(message)
+        finally:
+            metrics.SEND_SEGMENT_SECONDS.observe(time.monotonic() - started)
 
 
+@timed
 def fetch_sms_batch(sm: gammu.StateMachine) -> list:
     """Fetch all pending SMS from modem. Returns list of raw SMS dicts (GetNextSMS results)."""
     allsms = []
@@ -64,36 +254,89 @@ def fetch_sms_batch(sm: gammu.StateMachine) -> list:
     return allsms
 
 
+# Gammu AT driver numbers SMS locations per folder: folder * stride + slot
+LOCATION_FOLDER_STRIDE = 100000
+
+
+@timed
+def get_sms_status(sm: gammu.StateMachine) -> dict:
+    """Return SMS storage counters (SIMUsed, SIMSize, PhoneUsed, PhoneSize, ...)."""
+    return sm.GetSMSStatus()
+
+
+def is_unsupported(error: Exception) -> bool:
+    """True if Gammu refused a call as not supported or not implemented for this modem."""
+    return isinstance(error, (gammu.ERR_NOTSUPPORTED, gammu.ERR_NOTIMPLEMENTED))
+
+
+@timed
+def read_sms(sm: gammu.StateMachine, location: int):
+    """Read the SMS at one location (GetSMS). Returns None if the location is empty."""
+    try:
+        return sm.GetSMS(Folder=0, Location=location)
+    except gammu.ERR_EMPTY:
+        return None
+
+
+@timed
+def enable_incoming_sms(sm: gammu.StateMachine, callback) -> bool:
+    """
+    Register callback for unsolicited modem notifications and enable new-SMS events.
+    callback(sm, callback_type, data) is invoked from read_device(). Returns False if
+    the modem refuses to enable SMS notifications (caller should keep polling).
+    """
+    sm.SetIncomingCallback(callback)
+    try:
+        sm.SetIncomingSMS(Enable=True)
+    except Exception as e:
+        logging.warning("Modem does not support incoming SMS notifications: %s", e)
+        return False
+    return True
+
+
+@timed
+def read_device(sm: gammu.StateMachine) -> None:
+    """Read pending bytes from the modem without waiting; dispatches incoming callbacks."""
+    sm.ReadDevice(Wait=False)
+
+
+@timed
 def link_sms(allsms: list) -> list:
     """Link SMS parts into concatenated messages. Pure gammu helper."""
     return gammu.LinkSMS(allsms)
 
 
+@timed
 def decode_sms(sms: list) -> dict:
     """Decode multipart SMS. Pure gammu helper."""
     return gammu.DecodeSMS(sms)
 
 
+@timed
 def delete_sms(sm: gammu.StateMachine, folder: int, location: int) -> None:
     """Delete one SMS at folder/location."""
     sm.DeleteSMS(Folder=folder, Location=location)
 
 
+@timed
 def get_signal_quality(sm: gammu.StateMachine) -> dict:
     """Return signal quality dict from modem."""
     return sm.GetSignalQuality()
 
 
+@timed
 def get_battery_charge(sm: gammu.StateMachine) -> dict:
     """Return battery charge dict from modem."""
     return sm.GetBatteryCharge()
 
 
+@timed
 def get_network_info(sm: gammu.StateMachine) -> dict:
     """Return network info dict from modem."""
     return sm.GetNetworkInfo()
 
 
+@timed
 def get_datetime_ts(sm: gammu.StateMachine) -> float:
     """Return modem datetime as Unix timestamp."""
     return sm.GetDateTime().timestamp()
@@ -0,0 +1,126 @@
+"""
+Idempotency keys for /send. A request carrying an "id" is remembered together with the /sent
+feedback of its recipients, so a redelivered (QoS 1) or retried request is answered from here
+instead of reaching the modem again. Bounded in size (least recently used keys go first) and
+age (TTL), with an optional SQLite file so keys survive a restart. No MQTT, no Gammu.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+    key TEXT PRIMARY KEY,
+    results TEXT NOT NULL,
+    expires REAL NOT NULL
+)
+"""
+
+
+class IdempotencyStore:
+    """
+    Keys in LRU order, each with the number of recipients expected and the feedback recorded
+    so far. begin() claims a key; record() adds one recipient's feedback and, with a path,
+    writes the key to SQLite once every recipient has one. Keys still sending are kept in
+    memory only: after a crash the outbox replays those sends.
+    """
+
+    def __init__(
+        self, max_keys: int = 10000, ttl_sec: float = 86400.0, path: str = None, clock=time.time
+    ):
+        self.max_keys = max_keys
+        self.ttl_sec = ttl_sec
+        self.clock = clock
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(_SCHEMA)
+            self._load()
+            logging.info("Idempotency keys loaded from %s (%d)", path, len(self._entries))
+
+    def _load(self) -> None:
+        now = self.clock()
+        with self._conn:
+            self._conn.execute("DELETE FROM idempotency WHERE expires <= ?", (now,))
+        rows = self._conn.execute(
+            "SELECT key, results, expires FROM idempotency ORDER BY expires DESC LIMIT ?",
+            (self.max_keys,),
+        ).fetchall()
+        for key, results, expires in reversed(rows):
+            results = json.loads(results)
+            self._entries[key] = SimpleNamespace(
+                expected=len(results), results=results, expires=expires
+            )
+
+    def begin(self, key: str, expected: int):
+        """
+        None if key is new (now claimed for expected recipients); otherwise the feedback
+        recorded for it so far, which is empty while the first request is still sending.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry.results)
+            self._entries.pop(key, None)
+            self._entries[key] = SimpleNamespace(
+                expected=expected, results=[], expires=now + self.ttl_sec
+            )
+            self._evict(now)
+        return None
+
+    def record(self, key: str, feedback: dict) -> None:
+        """Add one recipient's /sent feedback; persisted once all recipients have one."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.results.append(feedback)
+            if self._conn is None or len(entry.results) < entry.expected:
+                return
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO idempotency (key, results, expires)"
+                        " VALUES (?, ?, ?)",
+                        (key, json.dumps(entry.results), entry.expires),
+                    )
+            except sqlite3.Error as e:
+                logging.error("Idempotency key %s not persisted: %s", key, e)
+
+    def _evict(self, now: float) -> None:
+        """Drop keys over max_keys, and expired keys at the least recently used end."""
+        evicted = []
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_keys and entry.expires > now:
+                break
+            self._entries.popitem(last=False)
+            evicted.append((key,))
+        if evicted and self._conn is not None:
+            try:
+                with self._conn:
+                    self._conn.executemany("DELETE FROM idempotency WHERE key = ?", evicted)
+            except sqlite3.Error as e:
+                logging.error("Idempotency eviction not persisted: %s", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"keys": len(self._entries), "hits": self.hits}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
@@ -0,0 +1,108 @@
+"""
+Incremental inbox scanning for one modem.
+A cheap GetSMSStatus pre-check skips the folder walk when storage occupancy matches what
+is already known; new messages are read by probing free locations instead of re-reading
+every stored SMS (e.g. incomplete multipart fragments). No MQTT.
+"""
+
+import logging
+import time
+
+import gammu_layer as gammu_io
+
+# Empty locations probed beyond the expected new count before giving up and walking the folder
+PROBE_SLACK = 3
+# Full folder walk at least this often, to resync if storage changed behind our back
+FULL_RESCAN_SEC = 300.0
+
+
+class InboxScanner:
+    """
+    Keeps the raw SMS (GetNextSMS/GetSMS entries) known to be in storage, keyed by location.
+    scan() returns the full current list for processing, or None when nothing new arrived.
+    Callers must call forget(location) after deleting an SMS, and invalidate() when an SMS
+    they were handed stays in storage for a retry (it is known, so counters do not show it).
+    """
+
+    def __init__(self, full_rescan_sec: float = FULL_RESCAN_SEC):
+        self.full_rescan_sec = full_rescan_sec
+        self.known = {}
+        self.folder_bases = set()
+        self.synced = False
+        self.status_supported = True
+        self.last_full_scan = 0.0
+        self.full_scans = 0
+        self.skipped = 0
+        self.probes = 0
+        self.last_status = None
+
+    def forget(self, location: int) -> None:
+        self.known.pop(location, None)
+
+    def invalidate(self) -> None:
+        """Walk the folder on the next scan: an SMS left in storage is to be processed again."""
+        self.synced = False
+
+    def scan(self, sm, now: float = None):
+        now = time.time() if now is None else now
+        if not self.status_supported:
+            return self._full_scan(sm, now)
+        try:
+            status = gammu_io.get_sms_status(sm)
+        except Exception as e:
+            logging.warning("GetSMSStatus unsupported, using full inbox scans: %s", e)
+            self.status_supported = False
+            return self._full_scan(sm, now)
+        self.last_status = status
+        used = status.get("SIMUsed", 0) + status.get("PhoneUsed", 0)
+        new_count = used - len(self.known)
+        if not self.synced or new_count < 0 or now - self.last_full_scan >= self.full_rescan_sec:
+            return self._full_scan(sm, now)
+        if new_count == 0:
+            self.skipped += 1
+            return None
+        size = max(status.get("SIMSize", 0), status.get("PhoneSize", 0))
+        if not self._probe_new(sm, new_count, size):
+            return self._full_scan(sm, now)
+        return list(self.known.values())
+
+    def _full_scan(self, sm, now: float) -> list:
+        allsms = gammu_io.fetch_sms_batch(sm)
+        self.known = {sms[0]["Location"]: sms for sms in allsms}
+        self.folder_bases.update(loc // gammu_io.LOCATION_FOLDER_STRIDE for loc in self.known)
+        self.synced = True
+        self.last_full_scan = now
+        self.full_scans += 1
+        return allsms
+
+    def _probe_new(self, sm, new_count: int, size: int) -> bool:
+        """Read free locations in known folders, lowest first, until new_count SMS are found."""
+        if not self.folder_bases or size <= 0:
+            return False
+        found = 0
+        misses = 0
+        for base in sorted(self.folder_bases):
+            for slot in range(1, size + 1):
+                location = base * gammu_io.LOCATION_FOLDER_STRIDE + slot
+                if location in self.known:
+                    continue
+                self.probes += 1
+                sms = gammu_io.read_sms(sm, location)
+                if sms is None:
+                    misses += 1
+                    if misses > new_count + PROBE_SLACK:
+                        return False
+                    continue
+                self.known[location] = sms
+                found += 1
+                if found == new_count:
+                    return True
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "known": len(self.known),
+            "full_scans": self.full_scans,
+            "skipped": self.skipped,
+            "probes": self.probes,
+        }
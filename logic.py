@@ -5,7 +5,7 @@ Pure functions for unit testing; no MQTT or Gammu dependencies.
 
 import json
 import logging
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 
 def normalize_number(raw: str) -> str:
@@ -26,16 +26,47 @@ def normalize_number(raw: str) -> str:
     return "".join(normalized)
 
 
-def validate_send_payload(
-    payload_bytes: bytes,
-    max_text_length: Optional[int] = None,
-) -> Tuple[Optional[str], Optional[str], Optional[dict]]:
+class SendRequest:
     """
-    Parse and validate send payload. No I/O or globals — for unit testing.
-    Returns (number, text, None) on success or (None, None, error_feedback) on error.
-    error_feedback has keys "result" and "payload" (safe string for client).
-    number is normalized (digits + optional leading +). If max_text_length is set,
-    text longer than that returns an error.
+    One message on {prefix}/send, decoded once. A send has normalized recipients in numbers
+    and text; a control command has action set; an invalid payload has error set to the
+    feedback dict. payload is the decoded string, kept for error feedback. id is the
+    client's optional idempotency key. expires_at
+    (time.monotonic deadline), response_topic and correlation_data come from MQTT v5
+    properties when present.
+    """
+
+    __slots__ = (
+        "numbers",
+        "text",
+        "action",
+        "payload",
+        "error",
+        "id",
+        "expires_at",
+        "response_topic",
+        "correlation_data",
+    )
+
+    def __init__(self, numbers=(), text=None, action=None, payload="", error=None):
+        self.numbers = numbers
+        self.text = text
+        self.action = action
+        self.payload = payload
+        self.error = error
+        self.id = None
+        self.expires_at = None
+        self.response_topic = None
+        self.correlation_data = None
+
+
+def parse_send_request(payload_bytes: bytes, max_text_length: Optional[int] = None) -> SendRequest:
+    """
+    Decode, parse and validate a send payload in one pass. No I/O or globals.
+    Keys are case-insensitive; number may hold several ;-separated recipients, each
+    normalized (digits + optional leading +); id is an optional idempotency key. If
+    max_text_length is set, text longer than that is an error. A payload with an "action"
+    key is returned as a control command.
     """
     try:
         payload_str = payload_bytes.decode("utf-8")
@@ -44,41 +75,159 @@ def validate_send_payload(
             safe = payload_bytes.decode("utf-8", errors="replace")
         except Exception:
             safe = repr(payload_bytes)
-        return (None, None, {"result": f"error : failed to decode JSON ({e})", "payload": safe})
+        error = {"result": f"error : failed to decode JSON ({e})", "payload": safe}
+        return SendRequest(payload=safe, error=error)
     try:
         data = json.loads(payload_str, strict=False)
     except Exception as e:
-        return (
-            None,
-            None,
-            {"result": f"error : failed to decode JSON ({e})", "payload": payload_str},
-        )
+        error = {"result": f"error : failed to decode JSON ({e})", "payload": payload_str}
+        return SendRequest(payload=payload_str, error=error)
+    if not isinstance(data, dict):
+        error = {"result": "error : payload must be a JSON object", "payload": payload_str}
+        return SendRequest(payload=payload_str, error=error)
+    if "action" in data:
+        action = data["action"] if isinstance(data["action"], str) else None
+        return SendRequest(action=action, payload=payload_str)
     number = None
     text = None
+    request_id = None
     for key, value in data.items():
         if key.lower() == "number":
             number = value
         if key.lower() == "text":
             text = value
+        if key.lower() == "id":
+            request_id = value
+    numbers, error = check_number_and_text(number, text, max_text_length)
+    if error is None and request_id is not None:
+        if isinstance(request_id, int) and not isinstance(request_id, bool):
+            request_id = str(request_id)
+        if not isinstance(request_id, str) or not request_id.strip():
+            error = "error : id must be a non-empty string"
+    if error is not None:
+        return SendRequest(payload=payload_str, error={"result": error, "payload": payload_str})
+    request = SendRequest(tuple(numbers), text, payload=payload_str)
+    request.id = request_id
+    return request
+
+
+def validate_send_payload(
+    payload_bytes: bytes,
+    max_text_length: Optional[int] = None,
+) -> Tuple[Optional[str], Optional[str], Optional[dict]]:
+    """
+    Parse and validate send payload. No I/O or globals — for unit testing.
+    Returns (number, text, None) on success or (None, None, error_feedback) on error.
+    error_feedback has keys "result" and "payload" (safe string for client).
+    number is normalized (digits + optional leading +), ;-joined for several recipients.
+    """
+    request = parse_send_request(payload_bytes, max_text_length)
+    if request.error is not None:
+        return (None, None, request.error)
+    if request.action is not None or not request.numbers:
+        return (None, None, {"result": "error : no number to send to", "payload": request.payload})
+    return (";".join(request.numbers), request.text, None)
+
+
+def check_number_and_text(
+    number, text, max_text_length: Optional[int] = None
+) -> Tuple[Optional[List[str]], Optional[str]]:
+    """
+    Validate one number field (may be ;-separated) and text.
+    Returns (normalized numbers, None) or (None, error result string).
+    """
     if number is None or not isinstance(number, str) or not number.strip():
-        return (None, None, {"result": "error : no number to send to", "payload": payload_str})
+        return (None, "error : no number to send to")
     if text is None or not isinstance(text, str):
-        return (None, None, {"result": "error : no text body to send", "payload": payload_str})
+        return (None, "error : no text body to send")
     if max_text_length is not None and len(text) > max_text_length:
+        return (None, f"error : text exceeds max length ({len(text)} > {max_text_length})")
+    parts = [p.strip() for p in number.split(";") if p.strip()]
+    normalized_parts = [normalize_number(p) for p in parts]
+    if any(not p for p in normalized_parts):
+        return (None, "error : no number to send to")
+    return (normalized_parts, None)
+
+
+def validate_bulk_payload(
+    payload_bytes: bytes,
+    max_text_length: Optional[int] = None,
+    max_recipients: Optional[int] = None,
+) -> Tuple[Optional[str], Optional[List[Tuple[str, str]]], Optional[List[dict]], Optional[dict]]:
+    """
+    Parse and validate a send_bulk job. No I/O. Accepted shapes:
+      {"job_id": "...", "text": "...", "numbers": ["+1", "+2"]}
+      {"job_id": "...", "messages": [{"number": "+1", "text": "..."}, ...]}
+    Returns (job_id, items, rejected, None) where items is a list of (number, text) and
+    rejected a list of {"number", "error"} for recipients that failed validation, or
+    (None, None, None, error_feedback) if the job itself is invalid.
+    """
+    try:
+        payload_str = payload_bytes.decode("utf-8")
+        data = json.loads(payload_str, strict=False)
+    except Exception as e:
+        safe = payload_bytes.decode("utf-8", errors="replace")
         return (
             None,
             None,
-            {
-                "result": f"error : text exceeds max length ({len(text)} > {max_text_length})",
-                "payload": payload_str,
-            },
+            None,
+            {"result": f"error : failed to decode JSON ({e})", "payload": safe},
         )
-    parts = [p.strip() for p in number.split(";") if p.strip()]
-    normalized_parts = [normalize_number(p) for p in parts]
-    if any(not p for p in normalized_parts):
-        return (None, None, {"result": "error : no number to send to", "payload": payload_str})
-    number = ";".join(normalized_parts)
-    return (number, text, None)
+    if not isinstance(data, dict):
+        return (
+            None,
+            None,
+            None,
+            {"result": "error : job must be a JSON object", "payload": payload_str},
+        )
+    data = {k.lower(): v for k, v in data.items()}
+    job_id = data.get("job_id")
+    if isinstance(job_id, int) and not isinstance(job_id, bool):
+        job_id = str(job_id)
+    if not isinstance(job_id, str) or not job_id.strip():
+        return (None, None, None, {"result": "error : no job_id", "payload": payload_str})
+
+    def _error(result):
+        return (None, None, None, {"job_id": job_id, "result": result})
+
+    if "messages" in data:
+        messages = data["messages"]
+        if not isinstance(messages, list) or not all(isinstance(m, dict) for m in messages):
+            return _error("error : messages must be a list of objects")
+        pairs = []
+        for m in messages:
+            m = {k.lower(): v for k, v in m.items()}
+            pairs.append((m.get("number"), m.get("text")))
+    elif "numbers" in data:
+        numbers = data["numbers"]
+        if not isinstance(numbers, list):
+            return _error("error : numbers must be a list")
+        text = data.get("text")
+        if not isinstance(text, str):
+            return _error("error : no text body to send")
+        pairs = [(n, text) for n in numbers]
+    else:
+        return _error("error : no numbers or messages")
+    if not pairs:
+        return _error("error : no recipients")
+    if max_recipients is not None and len(pairs) > max_recipients:
+        return _error(f"error : too many recipients ({len(pairs)} > {max_recipients})")
+
+    items = []
+    rejected = []
+    for number, text in pairs:
+        # One recipient per entry: ";" is not a separator here
+        if isinstance(number, str) and ";" in number:
+            rejected.append({"number": number, "error": "error : one number per recipient"})
+            continue
+        normalized, error = check_number_and_text(number, text, max_text_length)
+        if error is not None:
+            rejected.append(
+                {"number": number if isinstance(number, str) else str(number), "error": error}
+            )
+            continue
+        items.append((normalized[0], text))
+    return (job_id.strip(), items, rejected, None)
 
 
 def parse_log_level(value) -> int:
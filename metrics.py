@@ -0,0 +1,230 @@
+"""
+Process metrics: counters, gauges and fixed-bucket histograms, rendered in the Prometheus
+text exposition format and optionally served on a local HTTP /metrics endpoint.
+Standard library only; metrics are always recorded (cheap), the endpoint is opt-in.
+"""
+
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; covers fast AT replies up to slow SMSC round trips
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple) -> str:
+    if not key:
+        return ""
+    body = ",".join('%s="%s"' % (k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in key)
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge:
+    """Current value per label set, either set directly or read from a callback at scrape."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+        self._func = None
+        _registry.append(self)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def set_function(self, func) -> None:
+        """func() returns a number, or a list of (labels dict, number) pairs."""
+        self._func = func
+
+    def samples(self) -> list:
+        if self._func is not None:
+            try:
+                result = self._func()
+            except Exception as e:
+                logging.debug("Gauge %s callback failed: %s", self.name, e)
+                return []
+            if isinstance(result, (int, float)):
+                return [(self.name, (), result)]
+            return [(self.name, _label_key(labels), value) for labels, value in result]
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """
+    Fixed upper bounds; observe() is one bisect and two additions under a lock. Bucket
+    counts are kept per bucket and made cumulative only when rendered.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}
+        _registry.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return series[2] if series else 0
+
+    def label_values(self, name: str) -> list:
+        """Distinct values of one label across recorded series."""
+        with self._lock:
+            keys = list(self._series)
+        return sorted({v for key in keys for k, v in key if k == name})
+
+    def quantile(self, q: float, **labels):
+        """
+        Estimate the q-quantile by linear interpolation inside its bucket (None if empty).
+        Values above the last bound are reported as the last bound.
+        """
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            if not series or not series[2]:
+                return None
+            counts, count = list(series[0]), series[2]
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def samples(self) -> list:
+        out = []
+        with self._lock:
+            series_items = [(k, list(s[0]), s[1], s[2]) for k, s in self._series.items()]
+        for key, counts, total, count in series_items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                out.append(
+                    (self.name + "_bucket", key + (("le", _format_value(bound)),), cumulative)
+                )
+            out.append((self.name + "_sum", key, total))
+            out.append((self.name + "_count", key, count))
+        return out
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, value in metric.samples():
+            lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug("metrics: " + format, *args)
+
+
+def start_http_server(port: int, addr: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics on a daemon thread. Returns the server (server.shutdown() to stop)."""
+    server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logging.info("Metrics endpoint on http://%s:%d/metrics", addr, server.server_address[1])
+    return server
+
+
+SMS_SENT = Counter("sms2mqtt_sms_sent_total", "SMS sent successfully")
+SMS_SEND_FAILED = Counter("sms2mqtt_sms_send_failed_total", "SMS send attempts that failed")
+SMS_SEND_EXPIRED = Counter(
+    "sms2mqtt_sms_send_expired_total", "Sends dropped because MQTT v5 message expiry passed"
+)
+SMS_RECEIVED = Counter("sms2mqtt_sms_received_total", "Received SMS published to MQTT")
+SEND_SEGMENT_SECONDS = Histogram(
+    "sms2mqtt_send_segment_seconds", "SendSMS duration per message segment"
+)
+RECEIVE_LOOP_SECONDS = Histogram(
+    "sms2mqtt_receive_loop_seconds", "loop_sms_receive duration (one inbox pass)"
+)
+PUBLISH_FAILURES = Counter(
+    "sms2mqtt_mqtt_publish_failures_total", "Received SMS that could not be published to MQTT"
+)
+MQTT_RECONNECTS = Counter("sms2mqtt_mqtt_reconnects_total", "MQTT connections after the first")
+QUEUE_DEPTH = Gauge("sms2mqtt_send_queue_depth", "Sends queued or running on each modem worker")
+OUTBOX_PENDING = Gauge("sms2mqtt_outbox_pending", "Accepted sends not yet attempted (outbox)")
+SIM_STORAGE_USED = Gauge("sms2mqtt_sim_storage_used", "SMS stored on the modem (SIM + phone)")
+SIM_STORAGE_SIZE = Gauge("sms2mqtt_sim_storage_size", "SMS storage capacity (SIM + phone)")
+SMS_STORAGE_FILL = Gauge("sms2mqtt_sms_storage_fill", "SMS storage fill level (0-1) per memory")
+GAMMU_CALL_SECONDS = Histogram("sms2mqtt_gammu_call_seconds", "Duration of each gammu_layer call")
+GAMMU_CALL_ERRORS = Counter("sms2mqtt_gammu_call_errors_total", "gammu_layer calls that raised")
@@ -0,0 +1,62 @@
+"""
+Modem pool: choose which modem sends next and track per-modem send health.
+Works on modem contexts (ctx.modems); no MQTT, no Gammu calls.
+"""
+
+import logging
+import time
+
+# A modem with this many consecutive send failures is skipped for new sends...
+UNHEALTHY_AFTER_FAILURES = 3
+# ...until this long after its last failure, when it gets another chance
+UNHEALTHY_RETRY_SEC = 60.0
+
+
+def is_healthy(mctx, now: float = None) -> bool:
+    """Worker alive and not in a recent run of send failures."""
+    worker = getattr(mctx, "worker", None)
+    if worker is not None and not worker.is_alive():
+        return False
+    if mctx.send_failures < UNHEALTHY_AFTER_FAILURES:
+        return True
+    now = time.time() if now is None else now
+    return (now - mctx.last_send_failure) >= UNHEALTHY_RETRY_SEC
+
+
+def send_load(mctx) -> int:
+    """Sends (single and bulk) queued or running on this modem's worker."""
+    worker = getattr(mctx, "worker", None)
+    if worker is None:
+        return 0
+    return worker.pending("send") + worker.pending("bulk")
+
+
+def pick_modem(modems: list, now: float = None):
+    """
+    Least-loaded healthy modem; ties go to the lowest index. If none is healthy,
+    fall back to the least-loaded modem overall so sends are attempted rather than dropped.
+    """
+    if len(modems) == 1:
+        return modems[0]
+    candidates = [m for m in modems if is_healthy(m, now)]
+    if not candidates:
+        logging.warning("No healthy modem in pool, sending on least-loaded modem")
+        candidates = modems
+    return min(candidates, key=send_load)
+
+
+def record_send_result(mctx, ok: bool, now: float = None) -> None:
+    """Update consecutive failure count used by is_healthy."""
+    if ok:
+        if mctx.send_failures >= UNHEALTHY_AFTER_FAILURES:
+            logging.info("Modem %s healthy again", getattr(mctx, "index", 0))
+        mctx.send_failures = 0
+        return
+    mctx.send_failures += 1
+    mctx.last_send_failure = time.time() if now is None else now
+    if mctx.send_failures == UNHEALTHY_AFTER_FAILURES:
+        logging.warning(
+            "Modem %s marked unhealthy after %d consecutive send failures",
+            getattr(mctx, "index", 0),
+            mctx.send_failures,
+        )
@@ -0,0 +1,314 @@
+"""
+Simulated modem for load and soak testing without hardware (DEVICE=sim:<scenario.json>).
+SimulatedModem implements the gammu.StateMachine methods the bridge calls, so every
+gammu_layer function works on it unchanged. A JSON scenario drives SIM capacity, per-command
+latency, send failures, incoming SMS streams (multipart part order, gaps and loss) and
+unsolicited new-SMS notifications. No MQTT.
+"""
+
+import datetime
+import heapq
+import itertools
+import json
+import logging
+import random
+import time
+
+import gammu
+
+import gammu_layer as gammu_io
+
+DEVICE_PREFIX = "sim:"
+# SIM inbox is folder 1 in Gammu's AT location numbering
+SIM_FOLDER = 1
+# Characters per part of a concatenated SMS (GSM 7-bit with UDH)
+PART_LENGTH = 153
+
+DEFAULT_SCENARIO = {
+    "seed": None,
+    "sim_size": 30,
+    "latency": {"default": 0.0},
+    "latency_jitter": 0.0,
+    "send_failure_rate": 0.0,
+    "events": True,
+    "incoming": [],
+    "imsi": None,
+    "signal": {"SignalStrength": -71, "SignalPercent": 63, "BitErrorRate": -1},
+    "battery": {"BatteryPercent": 100, "ChargeState": "BatteryPowered"},
+    "network": {"NetworkName": "Simulated", "State": "HomeNetwork", "NetworkCode": "001 01"},
+}
+STREAM_DEFAULTS = {
+    "number": "+15550000000",
+    "text": "Simulated SMS {n}",
+    "parts": 1,
+    "interval_sec": 60.0,
+    "start_sec": 0.0,
+    "count": None,
+    "order": "in_order",
+    "part_gap_sec": 0.0,
+    "loss": 0.0,
+}
+STREAM_ORDERS = ("in_order", "reverse", "shuffle")
+
+_instances = itertools.count()
+
+
+def is_simulated(device: str) -> bool:
+    return device.startswith(DEVICE_PREFIX)
+
+
+def load_scenario(path: str) -> dict:
+    """Scenario file merged over DEFAULT_SCENARIO (empty path: defaults, no incoming SMS)."""
+    scenario = dict(DEFAULT_SCENARIO)
+    if path:
+        with open(path) as f:
+            scenario.update(json.load(f))
+    unknown = set(scenario) - set(DEFAULT_SCENARIO)
+    if unknown:
+        logging.warning("Unknown modem scenario keys ignored: %s", sorted(unknown))
+    streams = []
+    for stream in scenario["incoming"]:
+        stream = {**STREAM_DEFAULTS, **stream}
+        if stream["order"] not in STREAM_ORDERS:
+            raise ValueError(f"Unknown incoming order {stream['order']!r}, use {STREAM_ORDERS}")
+        if stream["interval_sec"] <= 0 or stream["parts"] < 1:
+            raise ValueError("incoming interval_sec must be > 0 and parts >= 1")
+        streams.append(stream)
+    scenario["incoming"] = streams
+    return scenario
+
+
+def open_device(device: str) -> "SimulatedModem":
+    """SimulatedModem for a DEVICE value of the form sim:<scenario.json>."""
+    path = device[len(DEVICE_PREFIX) :].strip()
+    logging.info("Using simulated modem (scenario: %s)", path or "defaults")
+    return SimulatedModem(load_scenario(path))
+
+
+class SimulatedModem:
+    """
+    SIM storage as {location: [sms]}. Incoming SMS parts are scheduled on the clock and
+    land in storage when due on the next modem call; while storage is full they stay queued
+    at the SMSC, as on a real network. Each command sleeps for its configured latency.
+    """
+
+    def __init__(self, scenario: dict = None, clock=time.monotonic, sleep=time.sleep):
+        self.scenario = scenario if scenario is not None else load_scenario("")
+        self.clock = clock
+        self.sleep = sleep
+        self.rand = random.Random(self.scenario["seed"])
+        self.instance = next(_instances)
+        self.size = self.scenario["sim_size"]
+        self.storage = {}
+        self.pending = []
+        self.notifications = []
+        self.callback = None
+        self.incoming_enabled = False
+        self._seq = itertools.count()
+        self._ref = 0
+        started = clock()
+        self.streams = [
+            {**stream, "next_at": started + stream["start_sec"], "emitted": 0}
+            for stream in self.scenario["incoming"]
+        ]
+        self.counters = {
+            "generated": 0,
+            "parts_lost": 0,
+            "delivered": 0,
+            "storage_full": 0,
+            "sent": 0,
+            "send_failures": 0,
+        }
+
+    # --- simulation ---
+
+    def _wait(self, command: str) -> None:
+        latency = self.scenario["latency"]
+        seconds = latency.get(command, latency.get("default", 0.0))
+        jitter = self.scenario["latency_jitter"]
+        if jitter:
+            seconds *= 1 + self.rand.uniform(-jitter, jitter)
+        if seconds > 0:
+            self.sleep(seconds)
+        self._advance(self.clock())
+
+    def _advance(self, now: float) -> None:
+        """Generate due stream messages, then move due parts into free storage."""
+        for stream in self.streams:
+            while stream["next_at"] <= now and (
+                stream["count"] is None or stream["emitted"] < stream["count"]
+            ):
+                self._generate(stream, stream["next_at"])
+                stream["emitted"] += 1
+                stream["next_at"] += stream["interval_sec"]
+        while self.pending and self.pending[0][0] <= now:
+            location = self._free_location()
+            if location is None:
+                self.counters["storage_full"] += 1
+                break
+            _, _, sms = heapq.heappop(self.pending)
+            sms["Location"] = location
+            self.storage[location] = [sms]
+            self.counters["delivered"] += 1
+            if self.incoming_enabled and self.scenario["events"]:
+                self.notifications.append({"Folder": SIM_FOLDER, "Location": location})
+
+    def _generate(self, stream: dict, at: float) -> None:
+        n = stream["emitted"] + 1
+        text = stream["text"].format(n=n, number=stream["number"])
+        parts = stream["parts"]
+        self.counters["generated"] += 1
+        if parts == 1:
+            self._schedule(at, _sms(stream["number"], text, {"Type": "NoUDH", "AllParts": -1}))
+            return
+        self._ref = (self._ref + 1) % 256
+        body = (text + " ") * (PART_LENGTH * parts // (len(text) + 1) + 1)
+        order = list(range(1, parts + 1))
+        if stream["order"] == "reverse":
+            order.reverse()
+        elif stream["order"] == "shuffle":
+            self.rand.shuffle(order)
+        for i, part in enumerate(order):
+            if stream["loss"] and self.rand.random() < stream["loss"]:
+                self.counters["parts_lost"] += 1
+                continue
+            udh = {
+                "Type": "ConcatenatedMessages",
+                "Text": b"",
+                "ID8bit": self._ref,
+                "ID16bit": -1,
+                "PartNumber": part,
+                "AllParts": parts,
+            }
+            chunk = body[(part - 1) * PART_LENGTH : part * PART_LENGTH]
+            self._schedule(at + i * stream["part_gap_sec"], _sms(stream["number"], chunk, udh))
+
+    def _schedule(self, at: float, sms: dict) -> None:
+        heapq.heappush(self.pending, (at, next(self._seq), sms))
+
+    def _free_location(self):
+        for slot in range(1, self.size + 1):
+            location = SIM_FOLDER * gammu_io.LOCATION_FOLDER_STRIDE + slot
+            if location not in self.storage:
+                return location
+        return None
+
+    def stats(self) -> dict:
+        return {**self.counters, "stored": len(self.storage), "queued": len(self.pending)}
+
+    # --- gammu.StateMachine API used by the bridge ---
+
+    def GetSIMIMSI(self):
+        self._wait("GetSIMIMSI")
+        return self.scenario["imsi"] or f"00101{self.instance:010d}"
+
+    def GetManufacturer(self):
+        self._wait("GetManufacturer")
+        return "sms2mqtt simulator"
+
+    def GetIMEI(self):
+        self._wait("GetIMEI")
+        return f"35000000{self.instance:07d}"
+
+    def SetDateTime(self, value):
+        self._wait("SetDateTime")
+
+    def GetDateTime(self):
+        self._wait("GetDateTime")
+        return datetime.datetime.now()
+
+    def GetSignalQuality(self):
+        self._wait("GetSignalQuality")
+        return dict(self.scenario["signal"])
+
+    def GetBatteryCharge(self):
+        self._wait("GetBatteryCharge")
+        return dict(self.scenario["battery"])
+
+    def GetNetworkInfo(self):
+        self._wait("GetNetworkInfo")
+        return dict(self.scenario["network"])
+
+    def SendSMS(self, message):
+        self._wait("SendSMS")
+        rate = self.scenario["send_failure_rate"]
+        if rate and self.rand.random() < rate:
+            self.counters["send_failures"] += 1
+            raise gammu.ERR_TIMEOUT({"Text": "Simulated send failure", "Code": 14})
+        self.counters["sent"] += 1
+        return self.counters["sent"] % 256
+
+    def GetSMSStatus(self):
+        self._wait("GetSMSStatus")
+        return {
+            "SIMUsed": len(self.storage),
+            "SIMUnRead": sum(1 for sms in self.storage.values() if sms[0]["State"] == "UnRead"),
+            "SIMSize": self.size,
+            "PhoneUsed": 0,
+            "PhoneUnRead": 0,
+            "PhoneSize": 0,
+            "TemplatesUsed": 0,
+        }
+
+    def GetSMS(self, Folder, Location):
+        self._wait("GetSMS")
+        if Location not in self.storage:
+            raise gammu.ERR_EMPTY({"Text": "Empty location", "Code": 22})
+        return self.storage[Location]
+
+    def GetNextSMS(self, Folder, Start=False, Location=None):
+        self._wait("GetNextSMS")
+        locations = sorted(self.storage)
+        if not Start:
+            locations = [loc for loc in locations if loc > Location]
+        if not locations:
+            raise gammu.ERR_EMPTY({"Text": "No more messages", "Code": 22})
+        return self.storage[locations[0]]
+
+    def DeleteSMS(self, Folder, Location):
+        self._wait("DeleteSMS")
+        if self.storage.pop(Location, None) is None:
+            raise gammu.ERR_EMPTY({"Text": "Empty location", "Code": 22})
+
+    def SetIncomingCallback(self, callback):
+        self.callback = callback
+
+    def SetIncomingSMS(self, Enable=True):
+        self._wait("SetIncomingSMS")
+        self.incoming_enabled = Enable
+
+    def ReadDevice(self, Wait=False):
+        self._wait("ReadDevice")
+        notifications, self.notifications = self.notifications, []
+        if self.callback is not None:
+            for data in notifications:
+                self.callback(self, "SMS", data)
+        return len(notifications)
+
+
+def _sms(number: str, text: str, udh: dict) -> dict:
+    """Inbox SMS in the shape GetNextSMS returns; Location is set on delivery."""
+    now = datetime.datetime.now()
+    return {
+        "Folder": SIM_FOLDER,
+        "InboxFolder": 1,
+        "Memory": "SM",
+        "Location": 0,
+        "State": "UnRead",
+        "Type": "Deliver",
+        "Number": number,
+        "Name": "",
+        "Text": text,
+        "UDH": {"Text": b"", "ID8bit": -1, "ID16bit": -1, "PartNumber": -1, **udh},
+        "Coding": "Default_No_Compression",
+        "Class": -1,
+        "DateTime": now,
+        "SMSCDateTime": now,
+        "SMSC": {"Location": 0, "Number": "+15559999999", "Name": "", "Format": "Text"},
+        "MessageReference": 0,
+        "ReplyViaSameSMSC": 0,
+        "RejectDuplicates": 0,
+        "ReplaceMessage": 0,
+        "DeliveryStatus": 0,
+        "Length": len(text),
+    }
@@ -0,0 +1,184 @@
+"""
+Modem worker: one thread owns the Gammu state machine and runs every modem call.
+MQTT callbacks and the main loop only enqueue prioritized commands; each command
+carries a Future so callers can wait for (or ignore) the result.
+"""
+
+import heapq
+import itertools
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+# Lower value runs first. Control and sends jump ahead of inbox scans and status polls.
+COMMAND_PRIORITIES = {
+    "control": 0,
+    "send": 10,
+    "receive": 20,
+    # Bulk jobs yield to interactive sends and inbox scans
+    "bulk": 25,
+    "status": 30,
+}
+
+_STOP_PRIORITY = -1
+
+
+class ModemCommand:
+    """One queued modem operation. Ordered by (priority, sequence) so equal priorities stay FIFO."""
+
+    __slots__ = ("kind", "priority", "seq", "func", "args", "kwargs", "future")
+
+    def __init__(self, kind, priority, seq, func, args, kwargs):
+        self.kind = kind
+        self.priority = priority
+        self.seq = seq
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class ModemWorker:
+    """Single-thread executor for Gammu calls with a priority queue."""
+
+    def __init__(self, name: str = "modem"):
+        self.name = name
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._active_kinds = {}
+        self._thread = None
+        self._held = []
+        self._held_kinds = frozenset()
+        self._hold_wait = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        logging.info("Modem worker %s started", self.name)
+
+    def stop(self, timeout: float = 5.0) -> bool:
+        """
+        Stop once the command running now returns; wait up to timeout. Commands still queued
+        or held are not run: their Futures are cancelled. Returns False if the running command
+        outlasted timeout (the thread is then still finishing it).
+        """
+        if self._thread is None:
+            return True
+        self._queue.put(ModemCommand("stop", _STOP_PRIORITY, next(self._seq), None, (), {}))
+        self._thread.join(timeout)
+        stopped = not self._thread.is_alive()
+        self._thread = None
+        if stopped:
+            logging.info("Modem worker %s stopped", self.name)
+        else:
+            logging.warning("Modem worker %s still busy after %.0f s", self.name, timeout)
+        return stopped
+
+    def hold(self, kinds, wait_time) -> None:
+        """
+        Hold back commands of these kinds while wait_time() > 0 (seconds until the next one
+        is allowed, e.g. the send rate limiter) and run the other kinds meanwhile, instead of
+        sleeping inside the command. Held commands keep their priority order.
+        """
+        self._held_kinds = frozenset(kinds)
+        self._hold_wait = wait_time
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def qsize(self) -> int:
+        """Number of commands waiting, held ones included (not counting the one running)."""
+        return self._queue.qsize() + len(self._held)
+
+    def pending(self, kind: str) -> int:
+        """Number of commands of this kind queued or running."""
+        with self._lock:
+            return self._active_kinds.get(kind, 0)
+
+    def submit(self, kind: str, func, *args, priority: int = None, **kwargs) -> Future:
+        """Enqueue func(*args, **kwargs) to run on the worker thread. Returns its Future."""
+        if priority is None:
+            priority = COMMAND_PRIORITIES.get(kind, COMMAND_PRIORITIES["status"])
+        cmd = ModemCommand(kind, priority, next(self._seq), func, args, kwargs)
+        with self._lock:
+            self._active_kinds[kind] = self._active_kinds.get(kind, 0) + 1
+        self._queue.put(cmd)
+        return cmd.future
+
+    def submit_once(self, kind: str, func, *args, **kwargs):
+        """
+        Like submit, but skip if a command of this kind is already queued or running.
+        For periodic jobs (receive, status) so a slow modem does not pile them up.
+        Returns the Future, or None when skipped.
+        """
+        with self._lock:
+            if self._active_kinds.get(kind):
+                return None
+        return self.submit(kind, func, *args, **kwargs)
+
+    def _hold_time(self) -> float:
+        return self._hold_wait() if self._hold_wait is not None else 0.0
+
+    def _next(self) -> ModemCommand:
+        """Next command to run; held kinds go back in the queue (head first) once allowed."""
+        while True:
+            timeout = None
+            if self._held:
+                wait = self._hold_time()
+                if wait <= 0:
+                    self._queue.put(heapq.heappop(self._held))
+                else:
+                    timeout = wait
+            try:
+                cmd = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if cmd.kind in self._held_kinds and self._hold_time() > 0:
+                heapq.heappush(self._held, cmd)
+                continue
+            return cmd
+
+    def _cancel_pending(self) -> None:
+        """Drop every queued and held command, cancelling its Future."""
+        dropped, self._held = self._held, []
+        while True:
+            try:
+                dropped.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        cancelled = 0
+        for cmd in dropped:
+            if cmd.priority == _STOP_PRIORITY:
+                continue
+            cmd.future.cancel()
+            cancelled += 1
+            with self._lock:
+                self._active_kinds[cmd.kind] -= 1
+        if cancelled:
+            logging.warning(
+                "Modem worker %s stopped, %d command(s) cancelled", self.name, cancelled
+            )
+
+    def _run(self) -> None:
+        while True:
+            cmd = self._next()
+            if cmd.priority == _STOP_PRIORITY:
+                self._cancel_pending()
+                return
+            try:
+                if cmd.future.set_running_or_notify_cancel():
+                    try:
+                        cmd.future.set_result(cmd.func(*cmd.args, **cmd.kwargs))
+                    except Exception as e:
+                        logging.error("Modem command %s failed: %s", cmd.kind, e, exc_info=True)
+                        cmd.future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._active_kinds[cmd.kind] -= 1
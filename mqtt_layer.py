@@ -3,22 +3,30 @@ MQTT interface layer: callbacks, subscribe/publish, topic naming.
 Orchestrates logic (validation) and gammu_layer (send/receive/status); owns JSON and topics.
 """
 
-import json
+import functools
 import logging
+import threading
 import time
+from types import SimpleNamespace
 
 import certifi
 import paho.mqtt.client as mqtt
 
 import gammu_layer as gammu_io
-from logic import validate_send_payload
+import metrics
+import modem_pool
+import serialization
+from fingerprints import sms_fingerprint
+from logic import SendRequest, parse_send_request, validate_bulk_payload
 
 # Set by main after ctx is created; used by shutdown when signal fires
 _app_ctx = [None]
 # When callbacks get userdata=None (e.g. tests), tests can assert _compat_mqtt_connected[0]
 _compat_mqtt_connected = [True]
 
-ALLOWED_ACTIONS = ("delete_stuck_sms",)
+ALLOWED_ACTIONS = ("delete_stuck_sms", "gammu_stats")
+# QoS 0 topics published often enough to be worth an MQTT v5 topic alias
+ALIASED_TOPICS = ("sent", "send_bulk_progress", "signal", "stats")
 
 
 def setup_mqtt_ssl(client: mqtt.Client, use_tls: bool = False) -> None:
@@ -39,20 +47,47 @@ def on_mqtt_connect(client, userdata, flags, reason_code, properties):
     prefix = userdata.config.prefix if userdata else "sms2mqtt"
     if userdata:
         userdata.mqtt_connected = True
-        userdata.reconnect_delay_sec = 2.0
+        # Pool modems decide per received SMS whether to publish it or journal it
+        for mctx in getattr(userdata, "modems", ()):
+            mctx.mqtt_connected = True
+        userdata.mqtt_connects = getattr(userdata, "mqtt_connects", 0) + 1
+        aliases = getattr(userdata, "topic_aliases", None)
+        if aliases is not None:
+            # Aliases are per connection; the broker's CONNACK says how many it accepts
+            aliases.reset(getattr(properties, "TopicAliasMaximum", 0))
+        if userdata.mqtt_connects > 1:
+            metrics.MQTT_RECONNECTS.inc()
+        # Resume receive/status timers right away after a (re)connect
+        wake = getattr(userdata, "wake", None)
+        if wake is not None:
+            wake.set()
     else:
         _compat_mqtt_connected[0] = True
     logging.info("Connected to MQTT host")
     client.publish(f"{prefix}/connected", "1", 0, True)
-    client.subscribe(f"{prefix}/send")
+    # With a durable outbox, QoS 1: the PUBACK is sent after on_mqtt_message has enqueued
+    send_qos = 1 if userdata and getattr(userdata, "outbox", None) is not None else 0
+    # With a shared group, bridges on the same broker share the send topics (one gets each job);
+    # control stays per bridge so every bridge acts on its own modems
+    group = getattr(userdata.config, "mqtt_shared_group", None) if userdata else None
+    share = f"$share/{group}/" if group else ""
+    client.subscribe(f"{share}{prefix}/send", qos=send_qos)
+    client.subscribe(f"{share}{prefix}/send_bulk", qos=send_qos)
     client.subscribe(f"{prefix}/control")
-    logging.info("Subscribed to %s/send and %s/control", prefix, prefix)
+    logging.info(
+        "Subscribed to %s/send, %s/send_bulk and %s/control", share + prefix, share + prefix, prefix
+    )
 
 
 def on_mqtt_disconnect(client, userdata, disconnect_flags, reason_code, properties):
     """Callback for MQTT disconnect (paho-mqtt CallbackAPIVersion.VERSION2)."""
     if userdata:
         userdata.mqtt_connected = False
+        for mctx in getattr(userdata, "modems", ()):
+            mctx.mqtt_connected = False
+        aliases = getattr(userdata, "topic_aliases", None)
+        if aliases is not None:
+            aliases.reset()
     else:
         _compat_mqtt_connected[0] = False
     logging.info("Disconnected from MQTT host")
@@ -67,88 +102,429 @@ def on_mqtt_message(client, userdata, msg):
         logging.error("on_mqtt_message: no userdata (context)")
         return
     prefix = ctx.config.prefix
-    gsm = ctx.gammusm
 
-    try:
-        logging.debug(
-            "MQTT received on %s payload_len=%s", msg.topic, len(msg.payload) if msg.payload else 0
-        )
+    if msg.topic == f"{prefix}/send_bulk":
         logging.info("MQTT message on topic: %s", msg.topic)
-        payload = msg.payload.decode("utf-8")
-        data = json.loads(payload, strict=False)
-    except Exception as e:
-        try:
-            safe_payload = (
-                msg.payload.decode("utf-8", errors="replace")
-                if isinstance(msg.payload, bytes)
-                else str(msg.payload)
-            )
-        except Exception:
-            safe_payload = repr(msg.payload)
-        feedback = {"result": "error : failed to decode JSON", "payload": safe_payload}
-        client.publish(f"{prefix}/sent", json.dumps(feedback, ensure_ascii=False))
-        logging.error("failed to decode JSON (%s), payload: %s", e, safe_payload)
+        handle_send_bulk(ctx, client, msg.payload)
+        return
+
+    logging.debug(
+        "MQTT received on %s payload_len=%s", msg.topic, len(msg.payload) if msg.payload else 0
+    )
+    logging.info("MQTT message on topic: %s", msg.topic)
+    # Decoded, parsed and normalized once; the request object is what gets queued
+    request = parse_send_request(
+        msg.payload, max_text_length=getattr(ctx.config, "max_text_length", None)
+    )
+    _apply_request_properties(request, getattr(msg, "properties", None))
+    if request.error is not None:
+        publish_reply(ctx, client, request, request.error)
+        logging.error("%s, payload: %s", request.error["result"], request.payload)
         return
 
-    if "action" in data:
-        action = data["action"] if isinstance(data.get("action"), str) else None
+    if request.action is not None or not request.numbers:
+        action = request.action
         if action in ALLOWED_ACTIONS and action == "delete_stuck_sms":
-            deleted = []
-            for s in ctx.last_stuck_sms:
-                try:
-                    gammu_io.delete_sms(gsm, 0, s["Location"])
-                    deleted.append(s["Location"])
-                except Exception as e:
-                    logging.error("Failed to delete stuck SMS at %s: %s", s["Location"], e)
-            result = {"result": "deleted" if deleted else "nothing", "deleted_locations": deleted}
-            client.publish(f"{prefix}/control_response", json.dumps(result))
-            ctx.last_stuck_sms.clear()
-            ctx.stuck_sms_detected = False
-            ctx.last_stuck_locations = None
-            logging.info("Stuck SMS deleted: %s", deleted)
+            for mctx in getattr(ctx, "modems", None) or [ctx]:
+                run_on_modem(mctx, "control", delete_stuck_sms, mctx, client)
+        elif action in ALLOWED_ACTIONS and action == "gammu_stats":
+            # Read-only counters: answered from the MQTT thread, no modem round trip
+            result = {"result": "gammu_stats", "gammu": gammu_io.call_stats()}
+            client.publish(
+                f"{prefix}/control_response", serialization.dumps("control_response", result)
+            )
         else:
             logging.warning("Unknown or invalid action received: %s", action)
         return
 
-    max_len = getattr(ctx.config, "max_text_length", None)
-    number, text, error_feedback = validate_send_payload(msg.payload, max_text_length=max_len)
-    if error_feedback is not None:
-        client.publish(f"{prefix}/sent", json.dumps(error_feedback, ensure_ascii=False))
-        logging.error("%s", error_feedback.get("result", "validation error"))
+    store = getattr(ctx, "idempotency", None)
+    if request.id is not None and store is not None:
+        results = store.begin(request.id, len(request.numbers))
+        if results is not None:
+            # Redelivery or client retry: answer with the original outcome, modem untouched
+            logging.info(
+                "Duplicate send id %s, not sending again (%d result(s))", request.id, len(results)
+            )
+            for feedback in results:
+                publish_reply(ctx, client, request, dict(feedback, duplicate=True))
+            return
+
+    items = [(num, request.text) for num in request.numbers]
+    outbox_ids = _outbox_add(
+        ctx, "send", items, request_id=request.id, expires_at=request.expires_at
+    )
+    # One job per recipient so a multi-modem pool spreads fan-out across modems
+    modems = getattr(ctx, "modems", None) or [ctx]
+    for num, outbox_id in zip(request.numbers, outbox_ids):
+        mctx = modem_pool.pick_modem(modems)
+        run_on_modem(mctx, "send", send_request, mctx, client, request, num, outbox_id)
+
+
+def _apply_request_properties(request, properties) -> None:
+    """Copy MQTT v5 message expiry, response topic and correlation data onto the request."""
+    if properties is None:
         return
+    expiry = getattr(properties, "MessageExpiryInterval", None)
+    if expiry is not None:
+        # Seconds left at the broker when delivered: counts down while the send is queued here
+        request.expires_at = time.monotonic() + expiry
+    request.response_topic = getattr(properties, "ResponseTopic", None) or None
+    request.correlation_data = getattr(properties, "CorrelationData", None)
+
+
+def publish_aliased(ctx, client, topic: str, payload):
+    """
+    QoS 0 publish, using an MQTT v5 topic alias when ctx has an alias table with topic in it.
+    Only QoS 0: paho re-sends QoS 1 publishes unchanged after a reconnect, when the broker no
+    longer knows the alias, so those keep the full topic.
+    """
+    aliases = getattr(ctx, "topic_aliases", None)
+    if aliases is None:
+        return client.publish(topic, payload)
+    with aliases.lock:
+        topic, alias = aliases.resolve(topic)
+        if alias is None:
+            return client.publish(topic, payload)
+        properties = mqtt.Properties(mqtt.PacketTypes.PUBLISH)
+        properties.TopicAlias = alias
+        return client.publish(topic, payload, properties=properties)
+
 
-    for num in number.split(";"):
-        num = num.replace(" ", "").strip()
-        if not num:
+def publish_reply(ctx, client, request, feedback: dict) -> None:
+    """
+    Publish send feedback to {prefix}/sent and, for an MQTT v5 request with a response topic,
+    to that topic with the request's correlation data.
+    """
+    payload = serialization.dumps("sent", feedback)
+    publish_aliased(ctx, client, f"{ctx.config.prefix}/sent", payload)
+    if getattr(request, "response_topic", None):
+        properties = mqtt.Properties(mqtt.PacketTypes.PUBLISH)
+        if request.correlation_data is not None:
+            properties.CorrelationData = request.correlation_data
+        client.publish(request.response_topic, payload, properties=properties)
+
+
+def _outbox_add(
+    ctx, kind: str, items: list, job_id: str = None, request_id: str = None, expires_at=None
+) -> list:
+    """
+    Durably enqueue items if an outbox is configured. expires_at (time.monotonic deadline)
+    is stored as wall-clock time. Returns one row id (or None) per item.
+    """
+    outbox = getattr(ctx, "outbox", None)
+    if outbox is None:
+        return [None] * len(items)
+    expires = None
+    if expires_at is not None:
+        expires = time.time() + (expires_at - time.monotonic())
+    try:
+        return outbox.add(kind, items, job_id=job_id, request_id=request_id, expires=expires)
+    except Exception as e:
+        # Still send: losing durability beats dropping an accepted request
+        logging.error("Outbox enqueue failed, sending without durability: %s", e)
+        return [None] * len(items)
+
+
+def _outbox_done(ctx, outbox_id) -> None:
+    outbox = getattr(ctx, "outbox", None)
+    if outbox is None or outbox_id is None:
+        return
+    try:
+        outbox.done(outbox_id)
+    except Exception as e:
+        logging.error("Outbox update failed for row %s: %s", outbox_id, e)
+
+
+def replay_outbox(ctx, client) -> int:
+    """
+    Re-enqueue sends left in the outbox by a previous run. Rows of one /send request are
+    replayed as that request again, idempotency key included: the key is claimed before the
+    modem is used, so a redelivery of the original message is answered as a duplicate. An
+    MQTT v5 message expiry still applies: a send past it is answered "error : expired".
+    Returns the number replayed.
+    """
+    outbox = getattr(ctx, "outbox", None)
+    if outbox is None:
+        return 0
+    rows = outbox.pending()
+    if not rows:
+        return 0
+    modems = getattr(ctx, "modems", None) or [ctx]
+    store = getattr(ctx, "idempotency", None)
+    sends = {}
+    bulk_jobs = {}
+    for row_id, kind, job_id, number, text, request_id, expires in rows:
+        if kind == "bulk":
+            bulk_jobs.setdefault(job_id, []).append((number, text, row_id))
             continue
+        # Rows without a key are separate requests (row ids are ints, keys strings)
+        sends.setdefault(request_id or row_id, []).append((number, text, row_id, expires))
+    for key, items in sends.items():
+        request = SendRequest(tuple(item[0] for item in items), items[0][1])
+        expires = items[0][3]
+        if expires is not None:
+            request.expires_at = time.monotonic() + (expires - time.time())
+        if isinstance(key, str):
+            request.id = key
+            if store is not None and store.begin(key, len(items)) is not None:
+                # Sent and recorded before the restart; only the outbox cleanup was lost
+                logging.info("Outbox send id %s already completed, not sending again", key)
+                for item in items:
+                    _outbox_done(ctx, item[2])
+                continue
+        for number, _, row_id, _ in items:
+            mctx = modem_pool.pick_modem(modems)
+            run_on_modem(mctx, "send", send_request, mctx, client, request, number, row_id)
+    for job_id, items in bulk_jobs.items():
+        job = _new_bulk_job(job_id, len(items), [])
+        job.resumed = True
+        for number, text, row_id in items:
+            mctx = modem_pool.pick_modem(modems)
+            run_on_modem(mctx, "bulk", send_bulk_item, mctx, client, job, number, text, row_id)
+    logging.info("Replaying %d send(s) from outbox (%d bulk job(s))", len(rows), len(bulk_jobs))
+    return len(rows)
+
+
+def run_on_modem(ctx, kind: str, func, *args):
+    """
+    Run a modem job on ctx.worker (the modem-owner thread) if one is running, else inline.
+    Returns the command Future, or None when run inline.
+    """
+    worker = getattr(ctx, "worker", None)
+    if worker is None:
+        func(*args)
+        return None
+    return worker.submit(kind, func, *args)
+
+
+def delete_stuck_sms(ctx, client) -> None:
+    """Control action: delete parts of incomplete multipart SMS and publish control_response."""
+    prefix = ctx.config.prefix
+    if getattr(ctx, "reassembler", None) is not None:
+        # Parts are already off the modem: publish what arrived as partial text instead
+        flushed = publish_reassembled(ctx, flush=True)
+        _await_acks(ctx)
+        ctx.stuck_sms_detected = bool(ctx.reassembler.incomplete())
+        result = {"result": "deleted" if flushed else "nothing", "deleted_locations": flushed}
+        _tag_imsi(ctx, result)
+        client.publish(
+            f"{prefix}/control_response", serialization.dumps("control_response", result)
+        )
+        ctx.last_stuck_locations = None
+        logging.info("Incomplete multipart SMS flushed: %s", flushed)
+        return
+    deleted = []
+    for s in ctx.last_stuck_sms:
         try:
-            logging.info("Sending SMS to %s", num)
-            gammu_io.send_sms(gsm, num, text)
-            feedback = {
-                "result": "success",
-                "datetime": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "number": num,
-                "text": text,
-            }
-            client.publish(f"{prefix}/sent", json.dumps(feedback, ensure_ascii=False))
-            logging.info("SMS sent to %s", num)
+            _delete_sms(ctx, s["Location"])
+            deleted.append(s["Location"])
         except Exception as e:
-            logging.error("Send SMS failed for %s: %s", num, e)
-            feedback = {
-                "result": "error : send failed",
-                "datetime": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "number": num,
-                "text": text,
-            }
-            client.publish(f"{prefix}/sent", json.dumps(feedback, ensure_ascii=False))
+            logging.error("Failed to delete stuck SMS at %s: %s", s["Location"], e)
+    result = {"result": "deleted" if deleted else "nothing", "deleted_locations": deleted}
+    _tag_imsi(ctx, result)
+    client.publish(f"{prefix}/control_response", serialization.dumps("control_response", result))
+    ctx.last_stuck_sms.clear()
+    ctx.stuck_sms_detected = False
+    ctx.last_stuck_locations = None
+    logging.info("Stuck SMS deleted: %s", deleted)
+
+
+def send_one(ctx, number: str, text: str) -> None:
+    """
+    Send one SMS on this modem: take a token from the modem's rate limiter, send, and feed
+    the outcome to pool health and adaptive rate. Raises on send failure. On a worker the
+    token is already due (ModemWorker.hold); without one (tests, tools) acquire() sleeps.
+    """
+    limiter = getattr(ctx, "send_limiter", None)
+    if limiter is not None:
+        waited = limiter.acquire()
+        if waited:
+            logging.debug("Rate limit: waited %.2fs before sending to %s", waited, number)
+    started = time.monotonic()
+    try:
+        gammu_io.send_sms(ctx.gammusm, number, text)
+    except Exception:
+        modem_pool.record_send_result(ctx, False)
+        metrics.SMS_SEND_FAILED.inc(modem=getattr(ctx, "index", 0))
+        if limiter is not None:
+            limiter.record(False, time.monotonic() - started)
+        raise
+    modem_pool.record_send_result(ctx, True)
+    metrics.SMS_SENT.inc(modem=getattr(ctx, "index", 0))
+    if limiter is not None:
+        limiter.record(True, time.monotonic() - started)
+
+
+def send_request(ctx, client, request, number: str, outbox_id=None) -> None:
+    """
+    Send request.text to number (one of request.numbers, already normalized) and publish its
+    /sent feedback. outbox_id, if set, is marked done once the modem attempt is over.
+    """
+    try:
+        if request.expires_at is not None and time.monotonic() >= request.expires_at:
+            # MQTT v5 message expiry passed while queued: a late OTP is worse than none
+            logging.warning("Message expired before sending, not sending to %s", number)
+            metrics.SMS_SEND_EXPIRED.inc()
+            result = "error : expired"
+        else:
+            result = _try_send(ctx, number, request.text)
+        feedback = {
+            "result": result,
+            "datetime": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "number": number,
+            "text": request.text,
+        }
+        _tag_imsi(ctx, feedback)
+        if request.id is not None:
+            feedback["id"] = request.id
+            store = getattr(ctx, "idempotency", None)
+            if store is not None:
+                store.record(request.id, feedback)
+        publish_reply(ctx, client, request, feedback)
+    finally:
+        _outbox_done(ctx, outbox_id)
+
+
+def _try_send(ctx, number: str, text: str) -> str:
+    """Send one SMS; returns the /sent result string."""
+    try:
+        logging.info("Sending SMS to %s", number)
+        send_one(ctx, number, text)
+        logging.info("SMS sent to %s", number)
+        return "success"
+    except Exception as e:
+        logging.error("Send SMS failed for %s: %s", number, e)
+        return "error : send failed"
+
+
+# Defaults when config has no bulk settings (e.g. tests)
+BULK_MAX_RECIPIENTS = 10000
+BULK_PROGRESS_EVERY = 100
+
+
+def handle_send_bulk(ctx, client, payload: bytes) -> None:
+    """
+    Validate a send_bulk job and enqueue one bulk command per recipient. Progress and the
+    final summary go to {prefix}/send_bulk_progress and {prefix}/send_bulk_result.
+    """
+    prefix = ctx.config.prefix
+    job_id, items, rejected, error_feedback = validate_bulk_payload(
+        payload,
+        max_text_length=getattr(ctx.config, "max_text_length", None),
+        max_recipients=getattr(ctx.config, "bulk_max_recipients", BULK_MAX_RECIPIENTS),
+    )
+    if error_feedback is not None:
+        client.publish(
+            f"{prefix}/send_bulk_result", serialization.dumps("send_bulk_result", error_feedback)
+        )
+        logging.error("send_bulk rejected: %s", error_feedback.get("result"))
+        return
+    job = _new_bulk_job(job_id, len(items) + len(rejected), rejected)
+    logging.info(
+        "send_bulk job %s: %d recipients queued, %d rejected", job_id, len(items), len(rejected)
+    )
+    if not items:
+        _publish_bulk_result(client, prefix, job)
+        return
+    outbox_ids = _outbox_add(ctx, "bulk", items, job_id=job_id)
+    modems = getattr(ctx, "modems", None) or [ctx]
+    for (number, text), outbox_id in zip(items, outbox_ids):
+        mctx = modem_pool.pick_modem(modems)
+        run_on_modem(mctx, "bulk", send_bulk_item, mctx, client, job, number, text, outbox_id)
+
+
+def _new_bulk_job(job_id: str, total: int, rejected: list) -> SimpleNamespace:
+    """Shared counters for one bulk job; updated from every modem worker under job.lock."""
+    return SimpleNamespace(
+        job_id=job_id,
+        total=total,
+        done=len(rejected),
+        ok=0,
+        failed=len(rejected),
+        failures=list(rejected),
+        started=time.time(),
+        resumed=False,
+        lock=threading.Lock(),
+    )
+
+
+def send_bulk_item(ctx, client, job, number: str, text: str, outbox_id=None) -> None:
+    """Send one bulk recipient, update job counters, publish progress/summary when due."""
+    try:
+        send_one(ctx, number, text)
+        error = None
+    except Exception as e:
+        logging.error("Bulk send failed for %s (job %s): %s", number, job.job_id, e)
+        error = "error : send failed"
+    finally:
+        _outbox_done(ctx, outbox_id)
+    prefix = ctx.config.prefix
+    every = getattr(ctx.config, "bulk_progress_every", BULK_PROGRESS_EVERY)
+    with job.lock:
+        job.done += 1
+        if error is None:
+            job.ok += 1
+        else:
+            job.failed += 1
+            job.failures.append({"number": number, "error": error})
+        finished = job.done == job.total
+        progress_due = every > 0 and job.done % every == 0
+        progress = {
+            "job_id": job.job_id,
+            "done": job.done,
+            "total": job.total,
+            "failed": job.failed,
+        }
+    if finished:
+        _publish_bulk_result(client, prefix, job)
+    elif progress_due:
+        publish_aliased(
+            ctx,
+            client,
+            f"{prefix}/send_bulk_progress",
+            serialization.dumps("send_bulk_progress", progress),
+        )
+
+
+def _publish_bulk_result(client, prefix: str, job) -> None:
+    summary = {
+        "job_id": job.job_id,
+        "result": "success" if job.failed == 0 else "partial" if job.ok else "error : send failed",
+        "total": job.total,
+        "sent": job.ok,
+        "failed": job.failed,
+        "failures": job.failures,
+        "duration_sec": round(time.time() - job.started, 3),
+    }
+    if job.resumed:
+        # Replayed after a restart: counts cover only recipients not yet attempted before it
+        summary["resumed"] = True
+    client.publish(f"{prefix}/send_bulk_result", serialization.dumps("send_bulk_result", summary))
+    logging.info("send_bulk job %s finished: %d sent, %d failed", job.job_id, job.ok, job.failed)
+
+
+def _tag_imsi(ctx, payload: dict) -> None:
+    """In a multi-modem pool, add the modem's SIM IMSI so consumers know which SIM was used."""
+    if getattr(ctx, "tag_imsi", False):
+        payload["imsi"] = ctx.imsi
 
 
 # QoS 1 for received so messages are not lost on brief disconnect (QoS 0 can drop silently)
 RECEIVED_PUBLISH_QOS = 1
 
 
-def _publish_received(ctx, prefix: str, payload: str, kind: str) -> bool:
-    """Publish one received SMS to MQTT with QoS 1; log [FIX] on failure. Returns True if queued successfully."""
+def _publish_received(
+    ctx, prefix: str, payload: str, kind: str, on_delivered=None, keys=(), from_journal=False
+) -> bool:
+    """
+    Publish one received SMS to MQTT with QoS 1; log [FIX] on failure. Returns True if queued
+    successfully. on_delivered (delete from storage, drop a reassembled group) runs once the
+    broker has the message: after its PUBACK with ctx.publish_tracker, else right away.
+    keys are not published again while the PUBACK is pending (see _is_inflight).
+    While _journaling, the SMS goes to ctx.received_journal instead (unless from_journal).
+    """
+    if not from_journal and _journaling(ctx):
+        return _journal_received(ctx, payload, kind, on_delivered)
     topic = f"{prefix}/received"
     try:
         msg_info = ctx.client.publish(topic, payload, qos=RECEIVED_PUBLISH_QOS)
@@ -159,60 +535,283 @@ def _publish_received(ctx, prefix: str, payload: str, kind: str) -> bool:
                 msg_info.rc,
                 kind,
             )
+            metrics.PUBLISH_FAILURES.inc()
             return False
-        # Flush so the message is sent before we continue (reduces chance of loss on disconnect)
-        ctx.client.loop(timeout=0.1)
         logging.debug("[FIX] Published %s SMS to %s (mid=%s)", kind, topic, getattr(msg_info, "mid", None))
-        return True
+        metrics.SMS_RECEIVED.inc(kind=kind)
     except Exception as e:
         logging.error("[FIX] Publish to %s raised: %s", topic, e, exc_info=True)
+        metrics.PUBLISH_FAILURES.inc()
         return False
+    tracker = getattr(ctx, "publish_tracker", None)
+    if tracker is not None:
+        tracker.track(getattr(ctx, "index", 0), msg_info.mid, keys, on_delivered or _no_action)
+    elif on_delivered is not None:
+        on_delivered()
+    return True
+
+
+def _no_action() -> None:
+    pass
+
+
+def _journaling(ctx) -> bool:
+    """Received SMS go to the journal: MQTT is down, or journaled ones are not all published."""
+    journal = getattr(ctx, "received_journal", None)
+    if journal is None:
+        return False
+    return not getattr(ctx, "mqtt_connected", True) or len(journal) > 0
+
+
+def _journal_received(ctx, payload, kind: str, on_delivered=None) -> bool:
+    """Append one received SMS to ctx.received_journal; on_delivered runs once it is stored."""
+    journal = ctx.received_journal
+    try:
+        stored = journal.append(payload, kind)
+    except Exception as e:
+        logging.error("Unable to journal %s SMS: %s", kind, e)
+        return False
+    if not stored:
+        logging.warning(
+            "Received journal full (%d), %s SMS stays on the modem", journal.max_entries, kind
+        )
+        return False
+    logging.debug("Journaled %s SMS (%d pending)", kind, len(journal))
+    if on_delivered is not None:
+        on_delivered()
+    return True
+
+
+# Journaled SMS published per receive pass; the rest follow on the next pass
+JOURNAL_REPLAY_BATCH = 500
+
+
+def replay_received_journal(ctx) -> int:
+    """
+    Publish SMS journaled while MQTT was down, oldest first, back to back up to the inflight
+    window. A row is removed once the broker has it. Returns the number published.
+    """
+    journal = getattr(ctx, "received_journal", None)
+    if journal is None or not getattr(ctx, "mqtt_connected", True) or not len(journal):
+        return 0
+    prefix = ctx.config.prefix
+    published = 0
+    for row_id, payload, kind in journal.pending(JOURNAL_REPLAY_BATCH):
+        key = ("journal", row_id)
+        if _is_inflight(ctx, [key]):
+            continue
+        if not _inflight_room(ctx):
+            # Rows left behind: the poller stays fast and PUBACKs trigger the next pass
+            ctx.receive_window_full = True
+            break
+        remove = functools.partial(journal.remove, [row_id])
+        if not _publish_received(ctx, prefix, payload, kind, remove, [key], from_journal=True):
+            break
+        published += 1
+    if published:
+        logging.info("Replayed %d received SMS from the journal", published)
+    return published
+
+
+def on_mqtt_publish(client, userdata, mid, reason_code, properties):
+    """Callback for MQTT publish (paho-mqtt VERSION2); for QoS 1 the broker's PUBACK."""
+    tracker = getattr(userdata, "publish_tracker", None) if userdata else None
+    if tracker is not None:
+        tracker.ack(mid, failed=getattr(reason_code, "is_failure", False))
+
+
+def _is_inflight(ctx, keys) -> bool:
+    """True if any of keys was published and its PUBACK is still pending."""
+    tracker = getattr(ctx, "publish_tracker", None)
+    if tracker is None:
+        return False
+    owner = getattr(ctx, "index", 0)
+    return any(tracker.is_inflight(owner, key) for key in keys)
+
+
+def _run_acked(ctx) -> None:
+    """Run the on_delivered actions of acknowledged publishes (on the modem worker)."""
+    tracker = getattr(ctx, "publish_tracker", None)
+    if tracker is None:
+        return
+    owner = getattr(ctx, "index", 0)
+    tracker.expire(owner)
+    if tracker.take_released(owner):
+        # Refused or never acknowledged: still on the SIM and published again by a full scan
+        _rescan_next_pass(ctx)
+    actions = tracker.take_acked(owner)
+    for action in actions:
+        try:
+            action()
+        except Exception as e:
+            logging.error("Action after PUBACK failed: %s", e)
+    if actions and getattr(ctx, "receive_window_full", False):
+        # The window has room again: scan for what the last pass left on the SIM
+        ctx.receive_window_full = False
+        ctx.incoming_sms_pending = True
+
+
+def _await_acks(ctx, below: int = 1) -> None:
+    """Wait up to the ack timeout for fewer than `below` inflight publishes, then run acked."""
+    tracker = getattr(ctx, "publish_tracker", None)
+    if tracker is None:
+        return
+    tracker.wait(getattr(ctx, "index", 0), below)
+    _run_acked(ctx)
+
+
+def _window_open(ctx) -> bool:
+    """
+    Room for one more received SMS: always while journaling, else see _inflight_room. When
+    full, the SMS stays for a pass that runs once PUBACKs free the window (see _run_acked).
+    """
+    if _journaling(ctx) or _inflight_room(ctx):
+        return True
+    ctx.receive_window_full = True
+    return False
+
+
+def _inflight_room(ctx) -> bool:
+    """Room in the inflight window for one more received publish (never waits for acks)."""
+    tracker = getattr(ctx, "publish_tracker", None)
+    if tracker is None:
+        return True
+    return tracker.inflight(getattr(ctx, "index", 0)) < tracker.max_inflight
+
+
+def _delete_sms(ctx, location: int) -> None:
+    """Delete one SMS from modem storage and drop it from the incremental scanner."""
+    gammu_io.delete_sms(ctx.gammusm, 0, location)
+    scanner = getattr(ctx, "inbox_scanner", None)
+    if scanner is not None:
+        scanner.forget(location)
+    stored = getattr(ctx, "stored_locations", None)
+    if stored is not None:
+        stored.discard(location)
+
 
+def _rescan_next_pass(ctx) -> None:
+    """An SMS stays in storage for a retry: make the next incremental scan a full one."""
+    scanner = getattr(ctx, "inbox_scanner", None)
+    if scanner is not None:
+        scanner.invalidate()
 
-def loop_sms_receive(ctx) -> None:
-    """Fetch SMS from modem, publish to MQTT, update stuck state."""
+
+def _delete_handed_off(ctx, parts: list) -> None:
+    """
+    Delete the parts of an SMS already published (or taken by the reassembler). A part whose
+    delete fails is fingerprinted so later scans retry only the delete, not the publish.
+    """
+    fingerprints = getattr(ctx, "received_fingerprints", None)
+    for part in parts:
+        try:
+            _delete_sms(ctx, part["Location"])
+        except Exception as e:
+            logging.error("Unable to delete SMS at %s: %s", part["Location"], e)
+            _rescan_next_pass(ctx)
+            if fingerprints is not None:
+                fingerprints.add(sms_fingerprint(part))
+            continue
+        if fingerprints is not None:
+            fingerprints.discard(sms_fingerprint(part))
+
+
+def loop_sms_receive(ctx) -> int:
+    """Fetch SMS from modem, publish to MQTT, update stuck state. Returns count of new SMS read."""
+    started = time.monotonic()
+    try:
+        received = _loop_sms_receive(ctx)
+        check_storage(ctx)
+        return received
+    finally:
+        metrics.RECEIVE_LOOP_SECONDS.observe(
+            time.monotonic() - started, modem=getattr(ctx, "index", 0)
+        )
+
+
+def _loop_sms_receive(ctx) -> int:
     logging.debug("loop_sms_receive start")
+    _run_acked(ctx)
+    # SMS journaled while MQTT was down go out before anything read in this pass
+    replay_received_journal(ctx)
+    scanner = getattr(ctx, "inbox_scanner", None)
+    reassembler = getattr(ctx, "reassembler", None)
+    if scanner is not None:
+        allsms = scanner.scan(ctx.gammusm)
+        if allsms is None:
+            # Storage counters match known messages: nothing new, stuck state unchanged
+            if reassembler is not None:
+                publish_reassembled(ctx)
+            return 0
+    else:
+        allsms = gammu_io.fetch_sms_batch(ctx.gammusm)
     ctx.stuck_sms_detected = False
     ctx.last_stuck_sms.clear()
+    # SMS left in storage by an earlier pass (e.g. parts waiting on the SIM) are not new
+    locations = {sms[0]["Location"] for sms in allsms}
+    new_count = len(locations - (getattr(ctx, "stored_locations", None) or set()))
+    ctx.stored_locations = locations
 
-    allsms = gammu_io.fetch_sms_batch(ctx.gammusm)
-    if not allsms:
-        return
-
-    alllinkedsms = gammu_io.link_sms(allsms)
+    if reassembler is not None:
+        # Multipart parts move to memory and leave the SIM now; no LinkSMS over stored parts
+        alllinkedsms = _take_multipart_parts(ctx, allsms)
+        publish_reassembled(ctx)
+    elif not allsms:
+        return 0
+    else:
+        alllinkedsms = gammu_io.link_sms(allsms)
     prefix = ctx.config.prefix
+    fingerprints = getattr(ctx, "received_fingerprints", None)
 
     for sms in alllinkedsms:
+        if _is_inflight(ctx, [part["Location"] for part in sms]):
+            # Published, deleted once the broker acknowledges it
+            continue
+        if fingerprints is not None and fingerprints.seen_all(sms):
+            # Published on an earlier pass and only the delete failed: no second publish
+            logging.info(
+                "SMS at %s already published, retrying delete only",
+                [part["Location"] for part in sms],
+            )
+            _delete_handed_off(ctx, sms)
+            continue
         if sms[0]["UDH"]["Type"] == "NoUDH":
+            if not _window_open(ctx):
+                _rescan_next_pass(ctx)
+                continue
             message = {
                 "datetime": str(sms[0]["DateTime"]),
                 "number": sms[0]["Number"],
                 "text": sms[0]["Text"],
             }
-            payload = json.dumps(message, ensure_ascii=False)
-            if _publish_received(ctx, prefix, payload, "single"):
+            _tag_imsi(ctx, message)
+            payload = serialization.dumps("received", message)
+            delete = functools.partial(_delete_handed_off, ctx, sms)
+            if _publish_received(ctx, prefix, payload, "single", delete, [sms[0]["Location"]]):
                 logging.info("Received SMS: %s", payload)
-                try:
-                    gammu_io.delete_sms(ctx.gammusm, 0, sms[0]["Location"])
-                except Exception as e:
-                    logging.error("Unable to delete SMS: %s", e)
             else:
                 logging.warning("[FIX] Skipping delete: single SMS will be retried next loop")
+                _rescan_next_pass(ctx)
         elif sms[0]["UDH"]["AllParts"] != -1:
             if len(sms) == sms[0]["UDH"]["AllParts"]:
+                if not _window_open(ctx):
+                    _rescan_next_pass(ctx)
+                    continue
                 decodedsms = gammu_io.decode_sms(sms)
                 message = {
                     "datetime": str(sms[0]["DateTime"]),
                     "number": sms[0]["Number"],
                     "text": decodedsms["Entries"][0]["Buffer"],
                 }
-                payload = json.dumps(message, ensure_ascii=False)
-                if _publish_received(ctx, prefix, payload, "multipart"):
+                _tag_imsi(ctx, message)
+                payload = serialization.dumps("received", message)
+                delete = functools.partial(_delete_handed_off, ctx, sms)
+                locations = [part["Location"] for part in sms]
+                if _publish_received(ctx, prefix, payload, "multipart", delete, locations):
                     logging.info("Received multipart SMS: %s", payload)
-                    for part in sms:
-                        gammu_io.delete_sms(ctx.gammusm, 0, part["Location"])
                 else:
                     logging.warning("[FIX] Skipping delete: multipart SMS will be retried next loop")
+                    _rescan_next_pass(ctx)
             else:
                 ctx.stuck_sms_detected = True
                 ctx.last_stuck_sms.extend(sms)
@@ -229,7 +828,10 @@ def loop_sms_receive(ctx) -> None:
                         "datetime": str(sms[0].get("DateTime", "")),
                         "locations": [s["Location"] for s in sms],
                     }
-                    ctx.client.publish(f"{prefix}/stuck_status", json.dumps(payload))
+                    _tag_imsi(ctx, payload)
+                    ctx.client.publish(
+                        f"{prefix}/stuck_status", serialization.dumps("stuck_status", payload)
+                    )
                     logging.info(
                         "[FIX] Published stuck_status once for incomplete multipart (%s/%s), locations=%s",
                         len(sms),
@@ -245,12 +847,225 @@ def loop_sms_receive(ctx) -> None:
         else:
             logging.info("Unsupported SMS type")
             try:
-                gammu_io.delete_sms(ctx.gammusm, 0, sms[0]["Location"])
+                _delete_sms(ctx, sms[0]["Location"])
             except Exception as e:
                 logging.error("Unable to delete unsupported SMS: %s", e)
+                _rescan_next_pass(ctx)
 
     if not ctx.stuck_sms_detected:
         ctx.last_stuck_locations = None
+    return new_count
+
+
+def _take_multipart_parts(ctx, allsms: list) -> list:
+    """
+    Hand concatenated parts to ctx.reassembler and delete them from the modem.
+    Returns the remaining SMS (single or unsupported) for the normal receive path.
+    """
+    rest = []
+    fingerprints = getattr(ctx, "received_fingerprints", None)
+    for sms in allsms:
+        udh = sms[0]["UDH"]
+        if udh["Type"] == "NoUDH" or udh["AllParts"] == -1:
+            rest.append(sms)
+            continue
+        for part in sms:
+            if fingerprints is not None and fingerprints.seen_all([part]):
+                # Already in the reassembler (maybe published and dropped): only delete
+                _delete_handed_off(ctx, [part])
+                continue
+            try:
+                group = ctx.reassembler.add(part)
+            except Exception as e:
+                # Not journaled: leave it on the modem, next scan retries
+                logging.error("Unable to store multipart SMS part at %s: %s", part["Location"], e)
+                _rescan_next_pass(ctx)
+                continue
+            _delete_handed_off(ctx, [part])
+            if not ctx.reassembler.is_complete(group):
+                _publish_stuck_status(ctx, group)
+    return rest
+
+
+def _publish_stuck_status(ctx, group) -> None:
+    """stuck_status for an incomplete multipart held in memory (once per new part)."""
+    payload = {
+        "status": "stuck",
+        "received_parts": len(group.parts),
+        "expected_parts": group.all_parts,
+        "number": group.number,
+        "datetime": group.datetime,
+        "locations": list(group.locations),
+        "stored": "memory",
+    }
+    _tag_imsi(ctx, payload)
+    ctx.client.publish(
+        f"{ctx.config.prefix}/stuck_status", serialization.dumps("stuck_status", payload)
+    )
+    logging.info(
+        "Incomplete multipart SMS (%s/%s): waiting for parts in memory",
+        len(group.parts),
+        group.all_parts,
+    )
+
+
+def publish_reassembled(ctx, now: float = None, flush: bool = False) -> list:
+    """
+    Publish completed multipart SMS from ctx.reassembler, then incomplete ones past the
+    timeout (or all incomplete ones with flush=True) as partial text. Groups are dropped
+    only after a successful publish. Returns the modem locations of flushed partial groups.
+    """
+    reassembler = ctx.reassembler
+    prefix = ctx.config.prefix
+    for group in reassembler.complete():
+        if _is_inflight(ctx, [group.key]) or not _window_open(ctx):
+            continue
+        message = {
+            "datetime": group.datetime,
+            "number": group.number,
+            "text": reassembler.text(group),
+        }
+        _tag_imsi(ctx, message)
+        payload = serialization.dumps("received", message)
+        discard = functools.partial(reassembler.discard, group)
+        if _publish_received(ctx, prefix, payload, "multipart", discard, [group.key]):
+            logging.info("Received multipart SMS: %s", payload)
+        else:
+            logging.warning("Multipart SMS kept in memory, publish retried next loop")
+    flushed = []
+    for group in reassembler.incomplete() if flush else reassembler.expired(now):
+        if _is_inflight(ctx, [group.key]) or not _window_open(ctx):
+            continue
+        message = {
+            "datetime": group.datetime,
+            "number": group.number,
+            "text": reassembler.text(group),
+            "partial": True,
+            "received_parts": len(group.parts),
+            "expected_parts": group.all_parts,
+        }
+        _tag_imsi(ctx, message)
+        payload = serialization.dumps("received", message)
+        discard = functools.partial(reassembler.discard, group)
+        if _publish_received(ctx, prefix, payload, "partial multipart", discard, [group.key]):
+            logging.info("Published partial multipart SMS: %s", payload)
+            flushed.extend(group.locations)
+    ctx.stuck_sms_detected = bool(reassembler.incomplete())
+    return flushed
+
+
+def check_storage(ctx) -> None:
+    """
+    Feed ctx.storage_monitor when due and publish {prefix}/storage when a fill level changed.
+    Reuses the GetSMSStatus the incremental inbox scanner made during this pass, except under
+    pressure: that one predates the pass's deletes, so the counters are read again.
+    """
+    monitor = getattr(ctx, "storage_monitor", None)
+    if monitor is None or not monitor.due():
+        return
+    scanner = getattr(ctx, "inbox_scanner", None)
+    try:
+        if (
+            not monitor.pressure
+            and scanner is not None
+            and scanner.status_supported
+            and scanner.last_status
+        ):
+            status = scanner.last_status
+        else:
+            status = gammu_io.get_sms_status(ctx.gammusm)
+    except Exception as e:
+        if gammu_io.is_unsupported(e):
+            logging.warning("SMS storage status not supported, storage monitor off: %s", e)
+            ctx.storage_monitor = None
+        else:
+            logging.error("Unable to read SMS storage status: %s", e)
+        return
+    was_pressure = monitor.pressure
+    if not monitor.update(status):
+        return
+    if monitor.pressure != was_pressure:
+        if monitor.pressure:
+            logging.warning(
+                "SMS storage under pressure %s: draining at the fastest cadence", monitor.levels
+            )
+        else:
+            logging.info("SMS storage pressure cleared %s", monitor.levels)
+    payload = {**monitor.levels, "pressure": monitor.pressure}
+    _tag_imsi(ctx, payload)
+    ctx.client.publish(f"{ctx.config.prefix}/storage", serialization.dumps("storage", payload))
+
+
+def _storage_pressure(ctx) -> bool:
+    monitor = getattr(ctx, "storage_monitor", None)
+    return monitor is not None and monitor.pressure
+
+
+def poll_receive(ctx) -> None:
+    """
+    Polling-mode receive step: scan the inbox, then retune ctx.receive_poller. Under storage
+    pressure, or while journaled SMS are still being replayed, the poller stays at its
+    shortest interval.
+    """
+    received = loop_sms_receive(ctx)
+    journal = getattr(ctx, "received_journal", None)
+    backlog = getattr(ctx, "receive_window_full", False) or (
+        journal is not None and getattr(ctx, "mqtt_connected", True) and len(journal) > 0
+    )
+    ctx.receive_poller.record(received > 0 or backlog or _storage_pressure(ctx))
+
+
+def make_incoming_callback(ctx):
+    """Return Gammu incoming callback that flags ctx when the modem reports a new SMS."""
+
+    def on_incoming(sm, callback_type, data):
+        if callback_type == "SMS":
+            logging.debug("Incoming SMS notification: %s", data)
+            ctx.incoming_sms_pending = True
+
+    return on_incoming
+
+
+def enable_event_receive(ctx) -> bool:
+    """Switch modem to new-SMS notifications. Returns False if unsupported (stay on polling)."""
+    try:
+        enabled = gammu_io.enable_incoming_sms(ctx.gammusm, make_incoming_callback(ctx))
+    except Exception as e:
+        logging.error("Unable to enable incoming SMS notifications: %s", e)
+        enabled = False
+    if enabled:
+        # Drain anything that arrived before notifications were enabled
+        ctx.incoming_sms_pending = True
+        logging.info("Event-driven receive enabled")
+    else:
+        logging.warning("Event-driven receive unavailable, falling back to polling")
+    return enabled
+
+
+def receive_tick(ctx, now: float = None) -> bool:
+    """
+    Event-mode receive step: read modem notifications, then run loop_sms_receive only if
+    a new SMS was signalled, the fallback poll interval elapsed or storage is under pressure
+    (then every tick). Returns True if scanned.
+    """
+    now = time.time() if now is None else now
+    try:
+        gammu_io.read_device(ctx.gammusm)
+    except Exception as e:
+        logging.error("Unable to read modem notifications: %s", e)
+    fallback_due = (now - ctx.last_receive_scan) >= ctx.config.receive_fallback_poll_sec
+    fallback_due = fallback_due or _storage_pressure(ctx)
+    if not ctx.incoming_sms_pending and not fallback_due:
+        # Keep draining the received journal between scans once MQTT is back
+        _run_acked(ctx)
+        replay_received_journal(ctx)
+        return False
+    if not ctx.incoming_sms_pending:
+        logging.debug("Fallback receive poll")
+    ctx.incoming_sms_pending = False
+    ctx.last_receive_scan = now
+    loop_sms_receive(ctx)
+    return True
 
 
 # Minimum interval (seconds) between signal/battery/network publishes to avoid log spam
@@ -265,7 +1080,12 @@ def get_signal_info(ctx) -> None:
         last = getattr(ctx, "last_signal_publish_time", 0)
         now = time.time()
         if last == 0 or (now - last) >= STATUS_PUBLISH_INTERVAL_SEC:
-            ctx.client.publish(f"{ctx.config.prefix}/signal", json.dumps(signal_info))
+            publish_aliased(
+                ctx,
+                ctx.client,
+                f"{ctx.config.prefix}/signal",
+                serialization.dumps("signal", signal_info),
+            )
             ctx.old_signal_info = signal_info
             ctx.last_signal_publish_time = now
             logging.info("Signal info published")
@@ -277,7 +1097,9 @@ def get_battery_charge(ctx) -> None:
     try:
         battery_charge = gammu_io.get_battery_charge(ctx.gammusm)
         if battery_charge != ctx.old_battery_charge:
-            ctx.client.publish(f"{ctx.config.prefix}/battery", json.dumps(battery_charge))
+            ctx.client.publish(
+                f"{ctx.config.prefix}/battery", serialization.dumps("battery", battery_charge)
+            )
             ctx.old_battery_charge = battery_charge
             logging.info("Battery charge published")
     except Exception as e:
@@ -288,7 +1110,9 @@ def get_network_info(ctx) -> None:
     try:
         network_info = gammu_io.get_network_info(ctx.gammusm)
         if network_info != ctx.old_network_info:
-            ctx.client.publish(f"{ctx.config.prefix}/network", json.dumps(network_info))
+            ctx.client.publish(
+                f"{ctx.config.prefix}/network", serialization.dumps("network", network_info)
+            )
             ctx.old_network_info = network_info
             logging.info("Network info published")
     except Exception as e:
@@ -306,11 +1130,128 @@ def get_datetime(ctx) -> None:
         logging.error("Unable to check datetime: %s", e)
 
 
+STATUS_METRICS = {
+    "signal": get_signal_info,
+    "battery": get_battery_charge,
+    "network": get_network_info,
+    "datetime": get_datetime,
+}
+
+
+def status_metrics(config) -> list:
+    """Metrics to poll: signal always, battery/network with MOREINFO, datetime with HEARTBEAT."""
+    names = ["signal"]
+    if config.moreinfo:
+        names += ["battery", "network"]
+    if config.heartbeat:
+        names.append("datetime")
+    return names
+
+
+# Status metrics due while an earlier poll is still queued or running are offered again after
+STATUS_BUSY_RETRY_SEC = 1.0
+
+
+def poll_status(ctx, names: list = None) -> None:
+    """Poll the given status metrics (default: all enabled ones, see status_metrics)."""
+    for name in names if names is not None else status_metrics(ctx.config):
+        STATUS_METRICS[name](ctx)
+
+
+def publish_stats(ctx) -> None:
+    """Publish per-modem send rate and backlog, PDU cache and Gammu call timings to {prefix}/stats."""
+    modems = []
+    for mctx in getattr(ctx, "modems", None) or [ctx]:
+        limiter = getattr(mctx, "send_limiter", None)
+        scanner = getattr(mctx, "inbox_scanner", None)
+        reassembler = getattr(mctx, "reassembler", None)
+        poller = getattr(mctx, "receive_poller", None)
+        fingerprints = getattr(mctx, "received_fingerprints", None)
+        journal = getattr(mctx, "received_journal", None)
+        storage = getattr(mctx, "storage_monitor", None)
+        modems.append(
+            {
+                "index": getattr(mctx, "index", 0),
+                "imsi": getattr(mctx, "imsi", None),
+                "healthy": modem_pool.is_healthy(mctx),
+                "backlog": modem_pool.send_load(mctx),
+                "send_rate": limiter.stats() if limiter is not None else None,
+                "inbox_scan": scanner.stats() if scanner is not None else None,
+                "multipart": reassembler.stats() if reassembler is not None else None,
+                "receive_interval_sec": round(poller.interval, 3) if poller is not None else None,
+                "undeleted": fingerprints.stats() if fingerprints is not None else None,
+                "journal": journal.stats() if journal is not None else None,
+                "storage": storage.stats() if storage is not None else None,
+            }
+        )
+    store = getattr(ctx, "idempotency", None)
+    tracker = getattr(ctx, "publish_tracker", None)
+    stats = {
+        "modems": modems,
+        "pdu_cache": gammu_io.pdu_cache_stats(),
+        "gammu": gammu_io.call_stats(),
+        "idempotency": store.stats() if store is not None else None,
+        "received_publish": tracker.stats() if tracker is not None else None,
+    }
+    try:
+        publish_aliased(
+            ctx, ctx.client, f"{ctx.config.prefix}/stats", serialization.dumps("stats", stats)
+        )
+    except Exception as e:
+        logging.error("Unable to publish stats: %s", e)
+
+
+def bind_metrics(ctx) -> None:
+    """Point the scrape-time gauges (queue depth, outbox, SIM storage) at this runtime."""
+    modems = getattr(ctx, "modems", None) or [ctx]
+
+    def queue_depth():
+        return [({"modem": getattr(m, "index", 0)}, modem_pool.send_load(m)) for m in modems]
+
+    def storage(field_sim, field_phone):
+        def read():
+            out = []
+            for m in modems:
+                scanner = getattr(m, "inbox_scanner", None)
+                status = scanner.last_status if scanner is not None else None
+                if status:
+                    value = status.get(field_sim, 0) + status.get(field_phone, 0)
+                    out.append(({"modem": getattr(m, "index", 0)}, value))
+            return out
+
+        return read
+
+    metrics.QUEUE_DEPTH.set_function(queue_depth)
+    metrics.SIM_STORAGE_USED.set_function(storage("SIMUsed", "PhoneUsed"))
+    metrics.SIM_STORAGE_SIZE.set_function(storage("SIMSize", "PhoneSize"))
+
+    def storage_fill():
+        out = []
+        for m in modems:
+            monitor = getattr(m, "storage_monitor", None)
+            for memory, level in (monitor.levels if monitor is not None else {}).items():
+                out.append(({"modem": getattr(m, "index", 0), "memory": memory}, level["fill"]))
+        return out
+
+    metrics.SMS_STORAGE_FILL.set_function(storage_fill)
+    if getattr(ctx, "outbox", None) is not None:
+        metrics.OUTBOX_PENDING.set_function(ctx.outbox.count)
+
+
 def shutdown(signum=None, frame=None, ctx=None):
+    """
+    SIGINT/SIGTERM handler: publish connected=0, disconnect and ask the main loop to stop.
+    No SQLite work here: the handler may interrupt the main thread inside a store's lock;
+    stores are flushed once the main loop has returned.
+    """
     c = ctx if ctx is not None else _app_ctx[0]
     if c:
         c.client.publish(f"{c.config.prefix}/connected", "0", 0, True)
         c.client.disconnect()
+        c.stopping = True
+        wake = getattr(c, "wake", None)
+        if wake is not None:
+            wake.set()
         logging.debug("Shutdown: published 0 and disconnected")
     else:
         logging.warning("Shutdown called but no context set")
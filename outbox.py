@@ -0,0 +1,131 @@
+"""
+Durable outbound queue (SQLite) for accepted send requests.
+A request is written here before the MQTT callback returns, so the broker's PUBACK
+(QoS 1) follows durable enqueue; rows are removed after the modem attempt and any
+left over are replayed on startup. No MQTT, no Gammu.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    job_id TEXT,
+    number TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL,
+    request_id TEXT,
+    expires REAL
+)
+"""
+
+# Columns added after the first release, created on open in older outbox files
+_ADDED_COLUMNS = {"request_id": "TEXT", "expires": "REAL"}
+
+# Completed rows are deleted in batches: at most this many or this old before a commit
+DONE_BATCH_SIZE = 50
+
+
+class Outbox:
+    """
+    SQLite-backed queue in WAL mode with synchronous=FULL: add() returns only after its commit
+    is fsynced, so an enqueue acknowledged to the broker survives a power loss, not just a
+    process restart. Each add() is one transaction (one fsync) however many recipients it
+    carries; deletions of completed rows are buffered and committed every DONE_BATCH_SIZE rows
+    or flush_sec seconds. A crash between a send and that commit replays the send
+    (at-least-once).
+    """
+
+    def __init__(self, path: str, flush_sec: float = 1.0):
+        self.path = path
+        self.flush_sec = flush_sec
+        self._lock = threading.Lock()
+        self._done = []
+        self._last_flush = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(_SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")]
+        for column, sql_type in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} {sql_type}")
+        self._conn.commit()
+        logging.info("Outbox opened at %s (%d pending)", path, self.count())
+
+    def add(
+        self,
+        kind: str,
+        items: list,
+        job_id: str = None,
+        request_id: str = None,
+        expires: float = None,
+    ) -> list:
+        """
+        Durably enqueue [(number, text), ...] in one transaction. request_id is the /send
+        idempotency key, kept so a replay still answers duplicates; expires is the MQTT v5
+        message expiry as wall-clock time, so a replay does not send it late. Returns row ids
+        in order.
+        """
+        now = time.time()
+        ids = []
+        with self._lock:
+            with self._conn:
+                for number, text in items:
+                    cur = self._conn.execute(
+                        "INSERT INTO outbox"
+                        " (kind, job_id, number, text, created, request_id, expires)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (kind, job_id, number, text, now, request_id, expires),
+                    )
+                    ids.append(cur.lastrowid)
+        return ids
+
+    def done(self, row_id: int) -> None:
+        """Mark a row as attempted; deleted at the next batch flush."""
+        with self._lock:
+            self._done.append(row_id)
+            due = len(self._done) >= DONE_BATCH_SIZE
+        if due:
+            self.flush()
+
+    def flush_if_due(self) -> None:
+        """Commit buffered deletions if flush_sec has passed (called from the main loop)."""
+        if self._done and time.monotonic() - self._last_flush >= self.flush_sec:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            ids, self._done = self._done, []
+            self._last_flush = time.monotonic()
+            if not ids:
+                return
+            with self._conn:
+                self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def pending(self) -> list:
+        """
+        All rows not yet completed, oldest first:
+        (id, kind, job_id, number, text, request_id, expires).
+        """
+        with self._lock:
+            done = set(self._done)
+            rows = self._conn.execute(
+                "SELECT id, kind, job_id, number, text, request_id, expires"
+                " FROM outbox ORDER BY id"
+            ).fetchall()
+        return [r for r in rows if r[0] not in done]
+
+    def count(self) -> int:
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+            return total - len(self._done)
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
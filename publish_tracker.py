@@ -0,0 +1,126 @@
+"""
+Received-SMS publishes awaiting the broker's PUBACK. The receive loop publishes back to back
+up to a bounded inflight window per modem and registers each message id with what to do once
+the broker has it (delete the SIM locations, drop a reassembled group). paho's on_publish
+acknowledges ids from the network thread; the modem worker runs the acknowledged actions in
+one batch. Nothing is deleted before the broker acknowledged it. No MQTT, no Gammu calls.
+"""
+
+import collections
+import threading
+import time
+
+# Acks for ids not (yet) tracked: a PUBACK can beat track() right after publish() returns
+UNCLAIMED_ACKS = 256
+
+
+class PublishTracker:
+    """
+    Inflight received publishes for every modem on one MQTT client, keyed by message id.
+    owner is the modem index; keys (SIM locations, group keys) are what the receive loop must
+    not publish again while inflight. Entries older than max_age_sec are released without
+    running their action, so that message is published again (at-least-once).
+    """
+
+    def __init__(
+        self,
+        max_inflight: int = 20,
+        ack_timeout_sec: float = 5.0,
+        max_age_sec: float = 300.0,
+        clock=time.monotonic,
+    ):
+        self.max_inflight = max_inflight
+        self.ack_timeout_sec = ack_timeout_sec
+        self.max_age_sec = max_age_sec
+        self.clock = clock
+        self.acked_total = 0
+        self.failed_total = 0
+        self._cond = threading.Condition()
+        self._inflight = {}
+        self._keys = collections.defaultdict(set)
+        self._acked = collections.defaultdict(list)
+        self._released = set()
+        self._unclaimed = collections.deque(maxlen=UNCLAIMED_ACKS)
+
+    def track(self, owner: int, mid: int, keys, action) -> None:
+        """Run action (on the owner's worker) once mid is acknowledged."""
+        with self._cond:
+            if mid in self._unclaimed:
+                self._unclaimed.remove(mid)
+                self._acked[owner].append(action)
+                self.acked_total += 1
+                return
+            keys = frozenset(keys)
+            self._inflight[mid] = (owner, keys, action, self.clock())
+            self._keys[owner].update(keys)
+
+    def ack(self, mid: int, failed: bool = False) -> None:
+        """on_publish: mid reached the broker (failed: the broker refused it)."""
+        with self._cond:
+            entry = self._inflight.pop(mid, None)
+            if entry is None:
+                self._unclaimed.append(mid)
+                return
+            owner, keys, action, _ = entry
+            self._keys[owner].difference_update(keys)
+            if failed:
+                self.failed_total += 1
+                self._released.add(owner)
+            else:
+                self._acked[owner].append(action)
+                self.acked_total += 1
+            self._cond.notify_all()
+
+    def inflight(self, owner: int) -> int:
+        with self._cond:
+            return sum(1 for entry in self._inflight.values() if entry[0] == owner)
+
+    def is_inflight(self, owner: int, key) -> bool:
+        with self._cond:
+            return key in self._keys[owner]
+
+    def wait(self, owner: int, below: int = 1, timeout: float = None) -> None:
+        """Block until fewer than `below` of owner's publishes are inflight, or timeout."""
+        deadline = self.clock() + (self.ack_timeout_sec if timeout is None else timeout)
+        with self._cond:
+            while True:
+                inflight = [m for m, e in self._inflight.items() if e[0] == owner]
+                remaining = deadline - self.clock()
+                if len(inflight) < below or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self.expire(owner)
+
+    def expire(self, owner: int) -> None:
+        """Release owner's entries older than max_age_sec (published again, see class doc)."""
+        # ack() pops entries from paho's thread; wait() already holds the (reentrant) lock
+        with self._cond:
+            now = self.clock()
+            for mid, (entry_owner, keys, _, tracked) in list(self._inflight.items()):
+                if entry_owner == owner and now - tracked > self.max_age_sec:
+                    del self._inflight[mid]
+                    self._keys[owner].difference_update(keys)
+                    self.failed_total += 1
+                    self._released.add(owner)
+
+    def take_released(self, owner: int) -> bool:
+        """True if any of owner's entries was released unacknowledged since the last call."""
+        with self._cond:
+            if owner not in self._released:
+                return False
+            self._released.discard(owner)
+            return True
+
+    def take_acked(self, owner: int) -> list:
+        """Actions acknowledged since the last call, in ack order."""
+        with self._cond:
+            actions = self._acked.pop(owner, [])
+        return actions
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "inflight": len(self._inflight),
+                "acked": self.acked_total,
+                "failed": self.failed_total,
+            }
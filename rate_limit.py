@@ -0,0 +1,90 @@
+"""
+Send rate limiting: a token bucket per modem with optional AIMD tuning.
+Used on the modem worker thread in front of gammu_layer.send_sms: the worker holds sends
+back until wait_time() allows one (ModemWorker.hold); no MQTT, no Gammu.
+"""
+
+import logging
+import time
+
+# AIMD: halve the rate on a failed or slow send, add this share of the max rate per good send
+DECREASE_FACTOR = 0.5
+INCREASE_SHARE = 0.05
+
+
+class TokenBucket:
+    """
+    Token bucket: `burst` sends may go back to back, then sends are spaced to
+    `rate_per_min`. With adaptive=True the rate moves between min_rate_per_min and
+    rate_per_min: multiplicative decrease on errors or latency above latency_target_sec,
+    additive increase on fast successful sends.
+    """
+
+    def __init__(
+        self,
+        rate_per_min: float,
+        burst: int = 1,
+        adaptive: bool = False,
+        min_rate_per_min: float = None,
+        latency_target_sec: float = 10.0,
+        clock=time.monotonic,
+    ):
+        self.max_rate = float(rate_per_min)
+        self.rate = self.max_rate
+        self.burst = max(1, int(burst))
+        self.adaptive = adaptive
+        self.min_rate = float(min_rate_per_min) if min_rate_per_min else self.max_rate / 10
+        self.latency_target_sec = latency_target_sec
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._last = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate / 60.0)
+        self._last = now
+
+    def reserve(self) -> float:
+        """Take one token; return seconds the caller must wait before sending (0 if none)."""
+        self._refill()
+        self._tokens -= 1.0
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens * 60.0 / self.rate
+
+    def wait_time(self) -> float:
+        """Seconds until a send is allowed, without taking a token (0 if one is available)."""
+        self._refill()
+        if self._tokens >= 1.0:
+            return 0.0
+        return (1.0 - self._tokens) * 60.0 / self.rate
+
+    def acquire(self, sleep=time.sleep) -> float:
+        """Block until a send is allowed. Returns the time waited."""
+        wait = self.reserve()
+        if wait > 0:
+            sleep(wait)
+        return wait
+
+    def record(self, ok: bool, latency_sec: float) -> None:
+        """Feed a send outcome into adaptive tuning (no-op unless adaptive)."""
+        if not self.adaptive:
+            return
+        old = self.rate
+        if not ok or latency_sec > self.latency_target_sec:
+            self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+        else:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * INCREASE_SHARE)
+        if self.rate != old:
+            logging.debug("Send rate %.1f -> %.1f per minute", old, self.rate)
+
+    def stats(self) -> dict:
+        """Snapshot for the stats topic; read-only so it is safe from another thread."""
+        elapsed = self._clock() - self._last
+        tokens = min(self.burst, self._tokens + elapsed * self.rate / 60.0)
+        return {
+            "rate_per_min": round(self.rate, 2),
+            "max_rate_per_min": self.max_rate,
+            "tokens": round(max(tokens, 0.0), 2),
+            "burst": self.burst,
+        }
@@ -0,0 +1,164 @@
+"""
+Multipart SMS reassembly in memory.
+Parts are keyed by sender + UDH reference and held here (with an optional SQLite journal for
+crash safety) so they can be deleted from SIM storage as soon as they are read. Groups that
+never complete expire after a timeout. No MQTT, no Gammu calls.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parts (
+    key TEXT NOT NULL,
+    part INTEGER NOT NULL,
+    all_parts INTEGER NOT NULL,
+    number TEXT NOT NULL,
+    datetime TEXT NOT NULL,
+    text TEXT NOT NULL,
+    location INTEGER,
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (key, part)
+)
+"""
+
+
+def part_key(part: dict) -> str:
+    """Group key of a concatenated SMS part: sender, UDH reference and part count."""
+    udh = part["UDH"]
+    ref = udh.get("ID16bit", -1)
+    if ref == -1:
+        ref = udh.get("ID8bit", -1)
+    return f"{part.get('Number', '')}|{ref}|{udh['AllParts']}"
+
+
+class Reassembler:
+    """
+    Groups concatenated SMS parts until all arrive. add() journals a part before returning, so
+    the caller may delete it from the modem right after. Completed text is the parts' decoded
+    Text joined in part order (what Gammu's DecodeSMS yields for concatenated text).
+    """
+
+    def __init__(self, journal_path: str = None, timeout_sec: float = 3600.0):
+        self.journal_path = journal_path
+        self.timeout_sec = timeout_sec
+        self.groups = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if journal_path:
+            self._conn = sqlite3.connect(journal_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # FULL: the part is deleted from the SIM right after add(), so it must survive
+            # power loss once committed
+            self._conn.execute("PRAGMA synchronous=FULL")
+            self._conn.execute(_SCHEMA)
+            self._conn.commit()
+            self._load()
+
+    def _load(self) -> None:
+        rows = self._conn.execute(
+            "SELECT key, part, all_parts, number, datetime, text, location, first_seen FROM parts"
+        ).fetchall()
+        for key, part, all_parts, number, dt, text, location, first_seen in rows:
+            group = self._group(key, all_parts, number, dt, first_seen)
+            group.parts[part] = text
+            if location is not None:
+                group.locations.append(location)
+        if self.groups:
+            logging.info(
+                "Restored %d incomplete multipart SMS from %s", len(self.groups), self.journal_path
+            )
+
+    def _group(self, key, all_parts, number, dt, first_seen) -> SimpleNamespace:
+        group = self.groups.get(key)
+        if group is None:
+            group = SimpleNamespace(
+                key=key,
+                number=number,
+                datetime=dt,
+                all_parts=all_parts,
+                first_seen=first_seen,
+                parts={},
+                locations=[],
+            )
+            self.groups[key] = group
+        return group
+
+    def add(self, part: dict, now: float = None) -> SimpleNamespace:
+        """Store one part (journaled first when a journal is configured). Returns its group."""
+        now = time.time() if now is None else now
+        key = part_key(part)
+        udh = part["UDH"]
+        number = part.get("Number", "unknown")
+        dt = str(part.get("DateTime", ""))
+        location = part.get("Location")
+        with self._lock:
+            group = self.groups.get(key)
+            first_seen = group.first_seen if group is not None else now
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO parts"
+                        " (key, part, all_parts, number, datetime, text, location, first_seen)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            key,
+                            udh["PartNumber"],
+                            udh["AllParts"],
+                            number,
+                            dt,
+                            part.get("Text") or "",
+                            location,
+                            first_seen,
+                        ),
+                    )
+            group = self._group(key, udh["AllParts"], number, dt, first_seen)
+            if udh["PartNumber"] == 1:
+                group.datetime = dt
+            group.parts[udh["PartNumber"]] = part.get("Text") or ""
+            if location is not None and location not in group.locations:
+                group.locations.append(location)
+        return group
+
+    def is_complete(self, group: SimpleNamespace) -> bool:
+        return len(group.parts) >= group.all_parts
+
+    def text(self, group: SimpleNamespace) -> str:
+        return "".join(group.parts[n] for n in sorted(group.parts))
+
+    def complete(self) -> list:
+        with self._lock:
+            return [g for g in self.groups.values() if self.is_complete(g)]
+
+    def incomplete(self) -> list:
+        with self._lock:
+            return [g for g in self.groups.values() if not self.is_complete(g)]
+
+    def expired(self, now: float = None) -> list:
+        """Incomplete groups whose first part is older than timeout_sec."""
+        now = time.time() if now is None else now
+        return [g for g in self.incomplete() if now - g.first_seen >= self.timeout_sec]
+
+    def discard(self, group: SimpleNamespace) -> None:
+        """Forget a group once its text (full or partial) has been delivered."""
+        with self._lock:
+            self.groups.pop(group.key, None)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM parts WHERE key = ?", (group.key,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "groups": len(self.groups),
+                "parts": sum(len(g.parts) for g in self.groups.values()),
+            }
+
+    def close(self) -> None:
+        """Close the journal. A later add() raises instead of keeping a part in memory only."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
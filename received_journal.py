@@ -0,0 +1,84 @@
+"""
+Store-and-forward journal (SQLite) for received SMS while MQTT is down.
+The receive loop keeps draining the modem: each payload is appended here and the SMS deleted
+from the SIM, then the journal is replayed oldest first once MQTT is back. A row is removed
+only after the broker has it. No MQTT, no Gammu.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS received (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    created REAL NOT NULL
+)
+"""
+
+
+class ReceivedJournal:
+    """
+    Append-only queue of serialized /received payloads in WAL mode with synchronous=FULL
+    (the SMS is deleted from the SIM right after append, so a commit must survive power
+    loss), capped at max_entries rows. When full, append() refuses and the SMS stays on the SIM.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.refused = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM received").fetchone()[0]
+        logging.info("Received journal opened at %s (%d pending)", path, self._count)
+
+    def append(self, payload, kind: str) -> bool:
+        """Durably store one payload. Returns False (nothing stored) when the journal is full."""
+        with self._lock:
+            if self._count >= self.max_entries:
+                self.refused += 1
+                return False
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO received (kind, payload, created) VALUES (?, ?, ?)",
+                    (kind, payload, time.time()),
+                )
+            self._count += 1
+        return True
+
+    def pending(self, limit: int = None) -> list:
+        """Oldest rows first: (id, payload, kind)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, payload, kind FROM received ORDER BY id LIMIT ?",
+                (-1 if limit is None else limit,),
+            ).fetchall()
+
+    def remove(self, ids: list) -> None:
+        """Drop rows the broker has acknowledged."""
+        with self._lock:
+            with self._conn:
+                cur = self._conn.executemany(
+                    "DELETE FROM received WHERE id = ?", [(i,) for i in ids]
+                )
+            self._count -= cur.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": self._count, "refused": self.refused}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
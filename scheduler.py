@@ -0,0 +1,75 @@
+"""
+Periodic job scheduling for the main loop: a min-heap of next due times.
+Each job has its own interval and jitter so status metrics are polled only as often as
+needed and do not all hit the modem on the same tick. No MQTT, no Gammu.
+"""
+
+import heapq
+import random
+import time
+
+
+class PollScheduler:
+    """
+    Jobs are named; due(now) returns the names whose time has come and reschedules each at
+    now + interval * (1 ± jitter). jitter is a fraction of the interval (0.1 = ±10%).
+    """
+
+    def __init__(self, rand=random.random):
+        self._rand = rand
+        self._heap = []
+        self._jobs = {}
+
+    def add(self, name: str, interval_sec: float, jitter: float = 0.0, now: float = None) -> None:
+        """Register a job, first due within one jitter window of now (spreads the start)."""
+        now = time.time() if now is None else now
+        self._jobs[name] = (float(interval_sec), float(jitter))
+        first = now + interval_sec * jitter * self._rand()
+        heapq.heappush(self._heap, (first, name))
+
+    def _next_time(self, name: str, now: float) -> float:
+        interval, jitter = self._jobs[name]
+        return now + interval * (1.0 + jitter * (2.0 * self._rand() - 1.0))
+
+    def peek(self, now: float = None) -> list:
+        """Names due at now, without rescheduling them (due() does that once they run)."""
+        now = time.time() if now is None else now
+        return [name for due_at, name in sorted(self._heap) if due_at <= now]
+
+    def due(self, now: float = None) -> list:
+        now = time.time() if now is None else now
+        names = []
+        while self._heap and self._heap[0][0] <= now:
+            _, name = heapq.heappop(self._heap)
+            names.append(name)
+            heapq.heappush(self._heap, (self._next_time(name, now), name))
+        return names
+
+    def next_due(self):
+        """Time of the earliest job, or None if nothing is scheduled."""
+        return self._heap[0][0] if self._heap else None
+
+    def intervals(self) -> dict:
+        return {name: interval for name, (interval, _) in self._jobs.items()}
+
+
+class AdaptiveInterval:
+    """
+    Poll interval that drops to min_sec when a poll finds something and grows by
+    `backoff` per idle poll up to max_sec: fast while messages (or multipart parts) are
+    arriving, quiet when nothing happens.
+    """
+
+    def __init__(self, min_sec: float, max_sec: float, backoff: float = 2.0):
+        self.min_sec = float(min_sec)
+        self.max_sec = max(float(max_sec), self.min_sec)
+        self.backoff = max(float(backoff), 1.0)
+        self.interval = self.min_sec
+
+    def record(self, active: bool) -> float:
+        """Feed one poll outcome; returns the interval until the next poll."""
+        if active:
+            self.interval = self.min_sec
+        else:
+            self.interval = min(self.max_sec, self.interval * self.backoff)
+        return self.interval
@@ -0,0 +1,86 @@
+"""
+Payload encoding for published topics: JSON (default) or a compact binary format,
+MessagePack or CBOR (optional dependencies: msgpack, cbor2). The format is set per
+deployment (PAYLOAD_FORMAT) and can be overridden per topic suffix (PAYLOAD_FORMAT_TOPICS),
+e.g. binary only on the high-volume received and sent topics. No MQTT.
+"""
+
+import json
+
+FORMATS = ("json", "msgpack", "cbor")
+# Python module that provides each binary format
+FORMAT_MODULES = {"msgpack": "msgpack", "cbor": "cbor2"}
+
+
+def _json_dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _json_loads(payload):
+    return json.loads(payload, strict=False)
+
+
+def codec(fmt: str) -> tuple:
+    """(dumps, loads) for fmt. Raises ValueError if unknown or its library is not installed."""
+    if fmt == "json":
+        return _json_dumps, _json_loads
+    if fmt == "msgpack":
+        try:
+            import msgpack
+        except ImportError:
+            raise ValueError("PAYLOAD_FORMAT msgpack needs the msgpack package") from None
+        return msgpack.packb, msgpack.unpackb
+    if fmt == "cbor":
+        try:
+            import cbor2
+        except ImportError:
+            raise ValueError("PAYLOAD_FORMAT cbor needs the cbor2 package") from None
+        return cbor2.dumps, cbor2.loads
+    raise ValueError(f"Unknown payload format {fmt!r}, use one of {FORMATS}")
+
+
+def parse_topic_formats(value: str) -> dict:
+    """'received=msgpack,sent=cbor' -> {'received': 'msgpack', 'sent': 'cbor'}."""
+    formats = {}
+    for item in filter(None, (s.strip() for s in (value or "").split(","))):
+        suffix, sep, fmt = item.partition("=")
+        fmt = fmt.strip().lower()
+        if not sep or not suffix.strip() or fmt not in FORMATS:
+            raise ValueError(f"Invalid PAYLOAD_FORMAT_TOPICS entry {item!r} (topic=format)")
+        formats[suffix.strip().strip("/")] = fmt
+    return formats
+
+
+class Serializer:
+    """Encodes payloads by topic suffix (the part after {prefix}/)."""
+
+    def __init__(self, default: str = "json", topics: dict = None):
+        self.default = default
+        self.topics = dict(topics or {})
+        self._default_dumps = codec(default)[0]
+        self._dumps = {suffix: codec(fmt)[0] for suffix, fmt in self.topics.items()}
+
+    def format_for(self, suffix: str) -> str:
+        return self.topics.get(suffix, self.default)
+
+    def dumps(self, suffix: str, data):
+        """Encoded payload: str for JSON, bytes for binary formats."""
+        return self._dumps.get(suffix, self._default_dumps)(data)
+
+
+_serializer = Serializer()
+
+
+def configure(default: str = "json", topics: dict = None) -> None:
+    """Select the process-wide payload formats (call once at startup)."""
+    global _serializer
+    _serializer = Serializer(default, topics)
+
+
+def format_for(suffix: str) -> str:
+    return _serializer.format_for(suffix)
+
+
+def dumps(suffix: str, data):
+    """Encode data for the topic {prefix}/{suffix}."""
+    return _serializer.dumps(suffix, data)
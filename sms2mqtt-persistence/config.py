@@ -20,6 +20,8 @@ def load_config() -> dict[str, Any]:
     mqtt_use_tls = get_env("USETLS", "").lower() in ("true", "1", "yes")
     mqtt_client_id = get_env("CLIENTID", "sms2mqtt-persistence")
 
+    payload_format = get_env("PAYLOAD_FORMAT", "auto").lower()
+
     pg_host = get_env("PGHOST")
     pg_port = int(get_env("PGPORT", "5432") or "5432")
     pg_database = get_env("PGDATABASE")
@@ -40,6 +42,11 @@ def load_config() -> dict[str, Any]:
     if not pg_password:
         missing.append("PGPASSWORD")
 
+    if payload_format not in ("auto", "json", "msgpack", "cbor"):
+        raise SystemExit(
+            f"Invalid PAYLOAD_FORMAT {payload_format!r}: use auto, json, msgpack or cbor."
+        )
+
     if missing:
         raise SystemExit(
             f"Missing required env: {', '.join(missing)}. "
@@ -63,6 +70,7 @@ def load_config() -> dict[str, Any]:
             "user": pg_user,
             "password": pg_password,
         },
+        "payload_format": payload_format,
         "log_level": get_env("LOG_LEVEL", "INFO"),
     }
 
@@ -117,6 +117,7 @@ def run_mqtt_loop(config: dict, logger: logging.Logger) -> None:
     reconnect_attempt = 0
     db_config = config["db"]
     device_id = mq["prefix"]
+    payload_format = config.get("payload_format", "auto")
 
     try:
         while True:
@@ -146,7 +147,7 @@ def run_mqtt_loop(config: dict, logger: logging.Logger) -> None:
             except queue.Empty:
                 continue
 
-            row = payload_to_row(topic, payload, device_id)
+            row = payload_to_row(topic, payload, device_id, payload_format)
             if row is None:
                 logger.error(
                     "Parse failed for topic=%s payload=%s",
@@ -8,6 +8,9 @@ from typing import Any
 
 logger = logging.getLogger(__name__)
 
+# PAYLOAD_FORMAT of the bridge; "auto" detects it from the first byte of each payload
+PAYLOAD_FORMATS = ("auto", "json", "msgpack", "cbor")
+
 
 def parse_received(payload: dict) -> dict[str, Any] | None:
     """Build row dict for received topic. Returns None if payload invalid."""
@@ -48,22 +51,51 @@ def parse_sent(payload: dict) -> dict[str, Any] | None:
         return None
 
 
+def detect_format(payload_bytes: bytes) -> str:
+    """
+    Payload format from its first byte; bridge payloads are always maps (objects).
+    MessagePack maps start with 0x80-0x8f, 0xde or 0xdf; CBOR maps with 0xa0-0xbf.
+    """
+    if not payload_bytes:
+        return "json"
+    first = payload_bytes[0]
+    if 0x80 <= first <= 0x8F or first in (0xDE, 0xDF):
+        return "msgpack"
+    if 0xA0 <= first <= 0xBF:
+        return "cbor"
+    return "json"
+
+
+def decode_payload(payload_bytes: bytes, payload_format: str = "auto") -> Any:
+    """Decode a JSON, MessagePack or CBOR payload. Raises on invalid input."""
+    if payload_format == "auto":
+        payload_format = detect_format(payload_bytes)
+    if payload_format == "msgpack":
+        import msgpack
+
+        return msgpack.unpackb(payload_bytes)
+    if payload_format == "cbor":
+        import cbor2
+
+        return cbor2.loads(payload_bytes)
+    return json.loads(payload_bytes.decode("utf-8"), strict=False)
+
+
 def payload_to_row(
-    topic: str, payload_bytes: bytes, device_id: str | None
+    topic: str, payload_bytes: bytes, device_id: str | None, payload_format: str = "auto"
 ) -> dict[str, Any] | None:
     """
-    Decode UTF-8, parse JSON, detect direction from topic suffix, return row dict or None.
-    On parse error returns None (caller may log and optionally insert with result='parse_error').
+    Decode the payload (JSON, MessagePack or CBOR), detect direction from topic suffix,
+    return row dict or None. On parse error returns None (caller may log and optionally
+    insert with result='parse_error').
     """
     try:
-        raw = payload_bytes.decode("utf-8")
+        data = decode_payload(payload_bytes, payload_format)
     except Exception as e:
-        logger.debug("Payload decode failed: %s", e)
+        logger.debug("Payload parse failed (%s): %s", payload_format, e)
         return None
-    try:
-        data = json.loads(raw, strict=False)
-    except Exception as e:
-        logger.debug("Payload JSON parse failed: %s", e)
+    if not isinstance(data, dict):
+        logger.debug("Payload is not an object: %r", type(data))
         return None
 
     if topic.endswith("/received"):
@@ -8,7 +8,8 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from persist import parse_received, parse_sent, payload_to_row
+import pytest
+from persist import detect_format, parse_received, parse_sent, payload_to_row
 
 
 def test_parse_received_valid():
@@ -115,3 +116,21 @@ def test_payload_to_row_missing_fields_returns_none():
     topic = "sms2mqtt/received"
     payload_bytes = json.dumps({}).encode("utf-8")
     assert payload_to_row(topic, payload_bytes, device_id="x") is None
+
+
+def test_detect_format_from_first_byte():
+    assert detect_format(b'{"number": "+7"}') == "json"
+    assert detect_format(b"\x82\xa6number") == "msgpack"
+    assert detect_format(b"\xa2fnumber") == "cbor"
+
+
+@pytest.mark.parametrize("module, dumps", [("msgpack", "packb"), ("cbor2", "dumps")])
+def test_payload_to_row_binary_formats(module, dumps):
+    codec = pytest.importorskip(module)
+    payload = {"datetime": "2025-02-24 12:00:00", "number": "+7999", "text": "Привет"}
+    payload_bytes = getattr(codec, dumps)(payload)
+    row = payload_to_row("sms2mqtt/received", payload_bytes, device_id="sms2mqtt")
+    assert row is not None
+    assert row["text"] == "Привет"
+    # Explicit format must match the payload
+    assert payload_to_row("sms2mqtt/received", payload_bytes, "x", payload_format="json") is None
@@ -3,19 +3,56 @@ SMS-to-MQTT bridge: entry point and wiring.
 Builds config and context, initializes Gammu and MQTT, runs main loop.
 """
 
+import asyncio
 import logging
 import os
 import signal
 import tempfile
+import threading
 import time
+from datetime import datetime
 from types import SimpleNamespace
 
 import gammu
 import paho.mqtt.client as mqtt
 
+import async_runtime
 import gammu_layer as gammu_io
+import metrics
+import modem_sim
 import mqtt_layer
+import serialization
+from fingerprints import FingerprintCache
+from idempotency import IdempotencyStore
+from inbox_scan import InboxScanner
 from logic import parse_log_level
+from modem_worker import ModemWorker
+from outbox import Outbox
+from publish_tracker import PublishTracker
+from rate_limit import TokenBucket
+from reassembly import Reassembler
+from received_journal import ReceivedJournal
+from scheduler import AdaptiveInterval, PollScheduler
+from storage_monitor import StorageMonitor
+from topic_alias import TopicAliases
+
+RECEIVE_MODES = ("poll", "event")
+INBOX_SCAN_MODES = ("incremental", "full")
+MULTIPART_MODES = ("memory", "storage")
+RUNTIMES = ("threaded", "asyncio")
+SMS_STORAGES = ("SM", "ME")
+MQTT_VERSIONS = ("3.1.1", "5")
+# Event receive mode: how often modem notifications are read (bounds new-SMS latency)
+EVENT_TICK_SEC = 0.05
+# Longest the timer loop sleeps when nothing is due; events wake it earlier
+MAX_TIMER_WAIT_SEC = 60.0
+# paho reconnect backoff bounds (network thread reconnects on its own)
+MQTT_RECONNECT_MIN_DELAY_SEC = 1
+MQTT_RECONNECT_MAX_DELAY_SEC = 60
+# Default poll interval per status metric (override with <METRIC>_POLL_SEC)
+STATUS_POLL_DEFAULTS = {"signal": 15.0, "battery": 60.0, "network": 30.0, "datetime": 30.0}
+# Default jitter as a fraction of the interval (override with <METRIC>_POLL_JITTER)
+STATUS_POLL_JITTER = 0.1
 
 
 def build_config_from_env() -> SimpleNamespace:
@@ -23,6 +60,14 @@ def build_config_from_env() -> SimpleNamespace:
     logging.debug("Building config from env")
     device = os.getenv("DEVICE", "/dev/mobile")
     pincode = os.getenv("PIN")
+    # DEVICES: comma-separated modem paths for a multi-modem pool; overrides DEVICE
+    devices = [d.strip() for d in os.getenv("DEVICES", "").split(",") if d.strip()] or [device]
+    # PIN may be one value for all modems or comma-separated in DEVICES order
+    pins = [p.strip() or None for p in pincode.split(",")] if pincode else [None]
+    if len(pins) == 1:
+        pins = pins * len(devices)
+    elif len(pins) != len(devices):
+        raise ValueError(f"PIN has {len(pins)} values but DEVICES has {len(devices)} modems")
     gammuoption = os.getenv("GAMMUOPTION", "")
     moreinfo = bool(os.getenv("MOREINFO"))
     heartbeat = bool(os.getenv("HEARTBEAT"))
@@ -33,6 +78,11 @@ def build_config_from_env() -> SimpleNamespace:
     user = os.getenv("USER")
     password = os.getenv("PASSWORD")
     use_tls = str(os.getenv("USETLS", "")).lower() in ("true", "1", "yes")
+    mqtt_version = os.getenv("MQTT_VERSION", "3.1.1").strip()
+    if mqtt_version not in MQTT_VERSIONS:
+        logging.warning("Unknown MQTT_VERSION %r, using 3.1.1", mqtt_version)
+        mqtt_version = "3.1.1"
+    mqtt_shared_group = os.getenv("MQTT_SHARED_GROUP", "").strip() or None
     try:
         _max = os.getenv("SMS_MAX_TEXT_LENGTH", "").strip()
         max_text_length = int(_max) if _max else None
@@ -40,9 +90,172 @@ def build_config_from_env() -> SimpleNamespace:
             max_text_length = None
     except ValueError:
         max_text_length = None
+    try:
+        pdu_cache_size = int(os.getenv("PDU_CACHE_SIZE", "128"))
+        if pdu_cache_size < 0:
+            pdu_cache_size = 0
+    except ValueError:
+        pdu_cache_size = 128
+    try:
+        bulk_max_recipients = int(os.getenv("BULK_MAX_RECIPIENTS", "10000"))
+        if bulk_max_recipients <= 0:
+            bulk_max_recipients = 10000
+    except ValueError:
+        bulk_max_recipients = 10000
+    try:
+        bulk_progress_every = int(os.getenv("BULK_PROGRESS_EVERY", "100"))
+        if bulk_progress_every < 0:
+            bulk_progress_every = 100
+    except ValueError:
+        bulk_progress_every = 100
+    try:
+        send_rate_per_min = float(os.getenv("SEND_RATE_PER_MIN", "0") or 0)
+        send_rate_per_min = max(send_rate_per_min, 0.0)
+    except ValueError:
+        send_rate_per_min = 0.0
+    try:
+        send_burst = int(os.getenv("SEND_BURST", "1") or 1)
+        send_burst = max(send_burst, 1)
+    except ValueError:
+        send_burst = 1
+    send_rate_adaptive = str(os.getenv("SEND_RATE_ADAPTIVE", "")).lower() in ("true", "1", "yes")
+    try:
+        send_rate_min_per_min = float(os.getenv("SEND_RATE_MIN_PER_MIN", "0") or 0) or None
+    except ValueError:
+        send_rate_min_per_min = None
+    try:
+        send_latency_target_sec = float(os.getenv("SEND_LATENCY_TARGET_SEC", "10") or 10)
+    except ValueError:
+        send_latency_target_sec = 10.0
+    try:
+        stats_interval_sec = float(os.getenv("STATS_INTERVAL_SEC", "60") or 0)
+        stats_interval_sec = max(stats_interval_sec, 0.0)
+    except ValueError:
+        stats_interval_sec = 60.0
+    outbox_path = os.getenv("OUTBOX_PATH", "").strip() or None
+    try:
+        outbox_flush_sec = float(os.getenv("OUTBOX_FLUSH_SEC", "1") or 1)
+    except ValueError:
+        outbox_flush_sec = 1.0
+    try:
+        idempotency_max_keys = max(int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000") or 0), 0)
+    except ValueError:
+        idempotency_max_keys = 10000
+    try:
+        idempotency_ttl_sec = float(os.getenv("IDEMPOTENCY_TTL_SEC", "86400") or 86400)
+    except ValueError:
+        idempotency_ttl_sec = 86400.0
+    idempotency_path = os.getenv("IDEMPOTENCY_PATH", "").strip() or None
+    try:
+        received_fingerprint_max = max(int(os.getenv("RECEIVED_FINGERPRINT_MAX", "1000") or 0), 0)
+    except ValueError:
+        received_fingerprint_max = 1000
+    try:
+        received_fingerprint_ttl_sec = float(
+            os.getenv("RECEIVED_FINGERPRINT_TTL_SEC", "86400") or 86400
+        )
+    except ValueError:
+        received_fingerprint_ttl_sec = 86400.0
+    try:
+        received_inflight_max = max(int(os.getenv("RECEIVED_INFLIGHT_MAX", "20") or 0), 0)
+    except ValueError:
+        received_inflight_max = 20
+    try:
+        received_ack_timeout_sec = float(os.getenv("RECEIVED_ACK_TIMEOUT_SEC", "5") or 5)
+    except ValueError:
+        received_ack_timeout_sec = 5.0
+    received_journal_path = os.getenv("RECEIVED_JOURNAL_PATH", "").strip() or None
+    try:
+        received_journal_max = max(int(os.getenv("RECEIVED_JOURNAL_MAX", "10000") or 0), 1)
+    except ValueError:
+        received_journal_max = 10000
+    try:
+        storage_poll_sec = max(float(os.getenv("STORAGE_POLL_SEC", "60") or 0), 0.0)
+    except ValueError:
+        storage_poll_sec = 60.0
+    try:
+        storage_pressure_threshold = float(os.getenv("STORAGE_PRESSURE_THRESHOLD", "0.8"))
+        if not 0 < storage_pressure_threshold <= 1:
+            storage_pressure_threshold = 0.8
+    except ValueError:
+        storage_pressure_threshold = 0.8
+    sms_storage = os.getenv("SMS_STORAGE", "").strip().upper() or None
+    if sms_storage is not None and sms_storage not in SMS_STORAGES:
+        logging.warning("Unknown SMS_STORAGE %r, leaving the modem's setting", sms_storage)
+        sms_storage = None
+    receive_mode = os.getenv("RECEIVE_MODE", "poll").strip().lower()
+    if receive_mode not in RECEIVE_MODES:
+        logging.warning("Unknown RECEIVE_MODE %r, using poll", receive_mode)
+        receive_mode = "poll"
+    try:
+        receive_fallback_poll_sec = float(os.getenv("RECEIVE_FALLBACK_POLL_SEC", "30"))
+        if receive_fallback_poll_sec <= 0:
+            receive_fallback_poll_sec = 30.0
+    except ValueError:
+        receive_fallback_poll_sec = 30.0
+    inbox_scan = os.getenv("INBOX_SCAN", "incremental").strip().lower()
+    if inbox_scan not in INBOX_SCAN_MODES:
+        logging.warning("Unknown INBOX_SCAN %r, using incremental", inbox_scan)
+        inbox_scan = "incremental"
+    try:
+        inbox_full_rescan_sec = float(os.getenv("INBOX_FULL_RESCAN_SEC", "300"))
+        if inbox_full_rescan_sec <= 0:
+            inbox_full_rescan_sec = 300.0
+    except ValueError:
+        inbox_full_rescan_sec = 300.0
+    multipart_reassembly = os.getenv("MULTIPART_REASSEMBLY", "memory").strip().lower()
+    if multipart_reassembly not in MULTIPART_MODES:
+        logging.warning("Unknown MULTIPART_REASSEMBLY %r, using memory", multipart_reassembly)
+        multipart_reassembly = "memory"
+    try:
+        multipart_timeout_sec = float(os.getenv("MULTIPART_TIMEOUT_SEC", "3600"))
+        if multipart_timeout_sec <= 0:
+            multipart_timeout_sec = 3600.0
+    except ValueError:
+        multipart_timeout_sec = 3600.0
+    # Unset: journal in the temp dir (writable in the container); empty: no journal
+    multipart_journal = os.getenv("MULTIPART_JOURNAL")
+    if multipart_journal is None:
+        multipart_journal = os.path.join(tempfile.gettempdir(), "sms2mqtt-multipart.db")
+    multipart_journal = multipart_journal.strip() or None
+    try:
+        receive_poll_min_sec = float(os.getenv("RECEIVE_POLL_MIN_SEC", "0.25"))
+        if receive_poll_min_sec <= 0:
+            receive_poll_min_sec = 0.25
+    except ValueError:
+        receive_poll_min_sec = 0.25
+    try:
+        receive_poll_max_sec = float(os.getenv("RECEIVE_POLL_MAX_SEC", "5"))
+        receive_poll_max_sec = max(receive_poll_max_sec, receive_poll_min_sec)
+    except ValueError:
+        receive_poll_max_sec = 5.0
+    try:
+        receive_poll_backoff = float(os.getenv("RECEIVE_POLL_BACKOFF", "2"))
+        receive_poll_backoff = max(receive_poll_backoff, 1.0)
+    except ValueError:
+        receive_poll_backoff = 2.0
+    runtime = os.getenv("RUNTIME", "threaded").strip().lower()
+    if runtime not in RUNTIMES:
+        logging.warning("Unknown RUNTIME %r, using threaded", runtime)
+        runtime = "threaded"
+    try:
+        metrics_port = int(os.getenv("METRICS_PORT", "0") or 0)
+    except ValueError:
+        metrics_port = 0
+    metrics_addr = os.getenv("METRICS_ADDR", "0.0.0.0").strip() or "0.0.0.0"
+    payload_format = os.getenv("PAYLOAD_FORMAT", "json").strip().lower()
+    if payload_format not in serialization.FORMATS:
+        logging.warning("Unknown PAYLOAD_FORMAT %r, using json", payload_format)
+        payload_format = "json"
+    payload_format_topics = serialization.parse_topic_formats(
+        os.getenv("PAYLOAD_FORMAT_TOPICS", "")
+    )
+    status_polls = _status_polls()
     config = SimpleNamespace(
-        device=device,
+        device=devices[0],
         pincode=pincode,
+        devices=devices,
+        pincodes=pins,
         gammuoption=gammuoption,
         moreinfo=moreinfo,
         heartbeat=heartbeat,
@@ -53,22 +266,88 @@ def build_config_from_env() -> SimpleNamespace:
         user=user,
         password=password,
         use_tls=use_tls,
+        mqtt_version=mqtt_version,
+        mqtt_shared_group=mqtt_shared_group,
         max_text_length=max_text_length,
+        pdu_cache_size=pdu_cache_size,
+        bulk_max_recipients=bulk_max_recipients,
+        bulk_progress_every=bulk_progress_every,
+        send_rate_per_min=send_rate_per_min,
+        send_burst=send_burst,
+        send_rate_adaptive=send_rate_adaptive,
+        send_rate_min_per_min=send_rate_min_per_min,
+        send_latency_target_sec=send_latency_target_sec,
+        stats_interval_sec=stats_interval_sec,
+        outbox_path=outbox_path,
+        outbox_flush_sec=outbox_flush_sec,
+        idempotency_max_keys=idempotency_max_keys,
+        idempotency_ttl_sec=idempotency_ttl_sec,
+        idempotency_path=idempotency_path,
+        received_fingerprint_max=received_fingerprint_max,
+        received_fingerprint_ttl_sec=received_fingerprint_ttl_sec,
+        received_inflight_max=received_inflight_max,
+        received_ack_timeout_sec=received_ack_timeout_sec,
+        received_journal_path=received_journal_path,
+        received_journal_max=received_journal_max,
+        storage_poll_sec=storage_poll_sec,
+        storage_pressure_threshold=storage_pressure_threshold,
+        sms_storage=sms_storage,
+        receive_mode=receive_mode,
+        receive_fallback_poll_sec=receive_fallback_poll_sec,
+        inbox_scan=inbox_scan,
+        inbox_full_rescan_sec=inbox_full_rescan_sec,
+        multipart_reassembly=multipart_reassembly,
+        multipart_timeout_sec=multipart_timeout_sec,
+        multipart_journal=multipart_journal,
+        receive_poll_min_sec=receive_poll_min_sec,
+        receive_poll_max_sec=receive_poll_max_sec,
+        receive_poll_backoff=receive_poll_backoff,
+        status_polls=status_polls,
+        runtime=runtime,
+        metrics_port=metrics_port,
+        metrics_addr=metrics_addr,
+        payload_format=payload_format,
+        payload_format_topics=payload_format_topics,
     )
     logging.debug("Config keys: %s", [k for k in dir(config) if not k.startswith("_")])
     return config
 
 
-def build_runtime_context(config: SimpleNamespace) -> SimpleNamespace:
-    """Build runtime context. client and gammusm set by caller."""
-    logging.debug("Building runtime context")
-    ctx = SimpleNamespace(
-        config=config,
-        client=None,
+def _status_polls() -> dict:
+    """{metric: (interval_sec, jitter)} from <METRIC>_POLL_SEC / <METRIC>_POLL_JITTER."""
+    polls = {}
+    for name, default in STATUS_POLL_DEFAULTS.items():
+        try:
+            interval = float(os.getenv(f"{name.upper()}_POLL_SEC", str(default)))
+            if interval <= 0:
+                interval = default
+        except ValueError:
+            interval = default
+        try:
+            jitter = float(os.getenv(f"{name.upper()}_POLL_JITTER", str(STATUS_POLL_JITTER)))
+            jitter = min(max(jitter, 0.0), 1.0)
+        except ValueError:
+            jitter = STATUS_POLL_JITTER
+        polls[name] = (interval, jitter)
+    return polls
+
+
+def _modem_state(index: int) -> dict:
+    """Per-modem fields shared by the runtime context (modem 0) and extra pool modems."""
+    return dict(
+        index=index,
         gammusm=None,
-        mqtt_connected=True,
-        reconnect_delay_sec=2.0,
-        last_reconnect_attempt=0.0,
+        worker=None,
+        send_limiter=None,
+        imsi=None,
+        tag_imsi=False,
+        event_receive=False,
+        inbox_scanner=None,
+        reassembler=None,
+        receive_poller=None,
+        received_fingerprints=None,
+        received_journal=None,
+        storage_monitor=None,
         stuck_sms_detected=False,
         last_stuck_sms=[],
         last_stuck_locations=None,
@@ -77,11 +356,271 @@ def build_runtime_context(config: SimpleNamespace) -> SimpleNamespace:
         old_network_info="",
         old_time=time.time(),
         last_signal_publish_time=0.0,
+        incoming_sms_pending=False,
+        last_receive_scan=0.0,
+        last_event_tick=0.0,
+        send_failures=0,
+        last_send_failure=0.0,
     )
+
+
+def build_mqtt_client(config: SimpleNamespace) -> mqtt.Client:
+    """paho client for MQTT_VERSION (3.1.1 or 5). Callbacks and TLS are set by the caller."""
+    protocol = mqtt.MQTTv5 if config.mqtt_version == "5" else mqtt.MQTTv311
+    return mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, config.client_id, protocol=protocol)
+
+
+def build_runtime_context(config: SimpleNamespace) -> SimpleNamespace:
+    """Build runtime context. client, gammusm and worker set by caller. ctx is also modem 0."""
+    logging.debug("Building runtime context")
+    ctx = SimpleNamespace(
+        config=config,
+        client=None,
+        mqtt_connected=True,
+        stopping=False,
+        wake=threading.Event(),
+        last_stats_publish=time.time(),
+        outbox=None,
+        topic_aliases=None,
+        idempotency=None,
+        publish_tracker=None,
+        modems=[],
+        **_modem_state(0),
+    )
+    ctx.modems.append(ctx)
     logging.info("Context initialized")
     return ctx
 
 
+def build_modem_context(ctx: SimpleNamespace, index: int) -> SimpleNamespace:
+    """Context for an additional pool modem: shares config/client/outbox with ctx, own modem state."""
+    return SimpleNamespace(
+        config=ctx.config,
+        client=ctx.client,
+        mqtt_connected=ctx.mqtt_connected,
+        outbox=ctx.outbox,
+        topic_aliases=ctx.topic_aliases,
+        idempotency=ctx.idempotency,
+        publish_tracker=ctx.publish_tracker,
+        **_modem_state(index),
+    )
+
+
+def init_modem(config: SimpleNamespace, index: int):
+    """
+    Write this modem's gammurc, init Gammu and return (state machine, IMSI).
+    A DEVICE of the form sim:<scenario.json> gets a simulated modem instead. With SMS_STORAGE
+    the modem is told where to store new SMS before Gammu opens it.
+    """
+    if modem_sim.is_simulated(config.devices[index]):
+        gammusm = modem_sim.open_device(config.devices[index])
+    else:
+        # Use writable dir (e.g. /tmp): container runs as non-root and /app is not writable
+        name = "gammurc" if len(config.devices) == 1 else f"gammurc-{index}"
+        gammurc_path = os.path.join(tempfile.gettempdir(), name)
+        logging.debug("[FIX] Writing gammurc to writable path: %s", gammurc_path)
+        gammu_io.write_gammurc(gammurc_path, config.devices[index], config.gammuoption)
+        if config.sms_storage:
+            route_incoming_storage(config.devices[index], config.sms_storage)
+        gammusm = gammu_io.init_state_machine(gammurc_path, config.pincodes[index])
+    imsi = gammusm.GetSIMIMSI()
+    logging.info(
+        "Modem %d (%s): Manufacturer: %s IMEI: %s SIMIMSI: %s",
+        index,
+        config.devices[index],
+        gammusm.GetManufacturer(),
+        gammusm.GetIMEI(),
+        imsi,
+    )
+    if config.heartbeat:
+        gammusm.SetDateTime(datetime.now())
+    return gammusm, imsi
+
+
+def route_incoming_storage(device: str, memory: str) -> None:
+    """Ask the modem to store new SMS in memory (SMS_STORAGE); a refusal is logged, not fatal."""
+    try:
+        routed = gammu_io.set_incoming_storage(device, memory)
+    except Exception as e:
+        logging.error("Unable to route incoming SMS to %s on %s: %s", memory, device, e)
+        return
+    if routed:
+        logging.info("Incoming SMS on %s routed to %s storage", device, memory)
+    else:
+        logging.warning("Modem on %s refused routing incoming SMS to %s", device, memory)
+
+
+def build_send_limiter(config: SimpleNamespace):
+    """Token bucket for one modem, or None when SEND_RATE_PER_MIN is unset (unlimited)."""
+    if not config.send_rate_per_min:
+        return None
+    return TokenBucket(
+        config.send_rate_per_min,
+        burst=config.send_burst,
+        adaptive=config.send_rate_adaptive,
+        min_rate_per_min=config.send_rate_min_per_min,
+        latency_target_sec=config.send_latency_target_sec,
+    )
+
+
+def build_reassembler(config: SimpleNamespace, index: int) -> Reassembler:
+    """In-memory multipart reassembler for one modem; each modem gets its own journal file."""
+    journal = config.multipart_journal
+    if journal and index > 0:
+        journal = f"{journal}-{index}"
+    return Reassembler(journal, timeout_sec=config.multipart_timeout_sec)
+
+
+def build_received_journal(config: SimpleNamespace, index: int) -> ReceivedJournal:
+    """Store-and-forward journal of received SMS for one modem; each modem gets its own file."""
+    path = config.received_journal_path
+    if index > 0:
+        path = f"{path}-{index}"
+    return ReceivedJournal(path, max_entries=config.received_journal_max)
+
+
+def configure_modem(config: SimpleNamespace, mctx: SimpleNamespace) -> None:
+    """
+    Per-modem send limiter, inbox scanner, multipart reassembler, receive poller,
+    fingerprints of received SMS whose delete failed, received journal and storage monitor.
+    """
+    mctx.send_limiter = build_send_limiter(config)
+    if config.inbox_scan == "incremental":
+        mctx.inbox_scanner = InboxScanner(config.inbox_full_rescan_sec)
+    if config.multipart_reassembly == "memory":
+        mctx.reassembler = build_reassembler(config, mctx.index)
+    mctx.receive_poller = AdaptiveInterval(
+        config.receive_poll_min_sec, config.receive_poll_max_sec, config.receive_poll_backoff
+    )
+    if config.received_fingerprint_max:
+        mctx.received_fingerprints = FingerprintCache(
+            config.received_fingerprint_max, config.received_fingerprint_ttl_sec
+        )
+    if config.received_journal_path:
+        mctx.received_journal = build_received_journal(config, mctx.index)
+    if config.storage_poll_sec:
+        mctx.storage_monitor = StorageMonitor(
+            config.storage_pressure_threshold, config.storage_poll_sec
+        )
+
+
+def build_status_scheduler(config: SimpleNamespace, now: float = None) -> PollScheduler:
+    """Scheduler with one job per enabled status metric."""
+    scheduler = PollScheduler()
+    for name in mqtt_layer.status_metrics(config):
+        interval, jitter = config.status_polls[name]
+        scheduler.add(name, interval, jitter, now=now)
+    return scheduler
+
+
+def schedule_receive(mctx: SimpleNamespace, now: float, wake: threading.Event = None) -> None:
+    """
+    Queue this modem's next inbox step on its worker (skipped if one is still pending).
+    `wake` is set when the step finishes so the timer loop picks up a changed poll interval.
+    Event-mode ticks run at most every EVENT_TICK_SEC.
+    """
+    if mctx.event_receive:
+        if now - getattr(mctx, "last_event_tick", 0.0) < EVENT_TICK_SEC:
+            return
+        mctx.last_event_tick = now
+        future = mctx.worker.submit_once("receive", mqtt_layer.receive_tick, mctx, now)
+    elif now - mctx.last_receive_scan >= mctx.receive_poller.interval:
+        mctx.last_receive_scan = now
+        future = mctx.worker.submit_once("receive", mqtt_layer.poll_receive, mctx)
+    else:
+        return
+    if future is not None and wake is not None:
+        future.add_done_callback(lambda _f: wake.set())
+
+
+def receive_due(mctx: SimpleNamespace, now: float) -> float:
+    """When this modem's next inbox step is due."""
+    if mctx.event_receive:
+        return getattr(mctx, "last_event_tick", 0.0) + EVENT_TICK_SEC
+    return mctx.last_receive_scan + mctx.receive_poller.interval
+
+
+def timer_step(ctx: SimpleNamespace, status_scheduler: PollScheduler, now: float) -> float:
+    """
+    Run the periodic jobs due at `now` (inbox scans, status polls, outbox flush, stats).
+    Returns seconds until the next one is due. MQTT I/O runs on paho's network thread.
+    """
+    config = ctx.config
+    deadlines = []
+    # Each modem drains its own inbox on its own worker, concurrently; with a received
+    # journal it keeps draining while MQTT is down
+    for mctx in ctx.modems:
+        if ctx.mqtt_connected or getattr(mctx, "received_journal", None) is not None:
+            schedule_receive(mctx, now, ctx.wake)
+            deadlines.append(receive_due(mctx, now))
+    if ctx.mqtt_connected:
+        # Status topics describe the primary modem only. While an earlier poll is still queued
+        # or running, due metrics stay due and are offered again shortly
+        due_metrics = status_scheduler.peek(now)
+        if due_metrics and not ctx.worker.submit_once(
+            "status", mqtt_layer.poll_status, ctx, due_metrics
+        ):
+            deadlines.append(now + mqtt_layer.STATUS_BUSY_RETRY_SEC)
+        else:
+            status_scheduler.due(now)
+            if status_scheduler.next_due() is not None:
+                deadlines.append(status_scheduler.next_due())
+    if ctx.outbox is not None:
+        ctx.outbox.flush_if_due()
+        deadlines.append(now + config.outbox_flush_sec)
+    if config.stats_interval_sec:
+        if now - ctx.last_stats_publish >= config.stats_interval_sec:
+            ctx.last_stats_publish = now
+            mqtt_layer.publish_stats(ctx)
+        deadlines.append(ctx.last_stats_publish + config.stats_interval_sec)
+    if not deadlines:
+        return MAX_TIMER_WAIT_SEC
+    return min(max(min(deadlines) - now, 0.0), MAX_TIMER_WAIT_SEC)
+
+
+def run_threaded(ctx: SimpleNamespace, status_scheduler: PollScheduler) -> None:
+    """Default runtime: paho network thread for MQTT, main thread runs timer_step."""
+    config = ctx.config
+    client = ctx.client
+    client.reconnect_delay_set(MQTT_RECONNECT_MIN_DELAY_SEC, MQTT_RECONNECT_MAX_DELAY_SEC)
+    client.connect(config.host, config.port)
+    ctx.mqtt_connected = True
+    # paho's network thread reads /send as it arrives and reconnects with backoff on its own
+    client.loop_start()
+    mqtt_layer.replay_outbox(ctx, client)
+
+    if config.receive_mode == "event":
+        for mctx in ctx.modems:
+            mctx.event_receive = mctx.worker.submit(
+                "control", mqtt_layer.enable_event_receive, mctx
+            ).result()
+    # Main thread only runs timers: sleep until the next job is due or an event wakes us
+    while not ctx.stopping:
+        ctx.wake.clear()
+        wait = timer_step(ctx, status_scheduler, time.time())
+        ctx.wake.wait(wait)
+
+
+def close_stores(ctx: SimpleNamespace) -> None:
+    """
+    After the main loop has stopped: stop every modem worker (queued jobs are cancelled),
+    then flush and close the outbox and the other SQLite files. If a worker is still inside
+    a modem call, the files are left open: what they committed is already on disk.
+    """
+    workers = [mctx.worker for mctx in ctx.modems if getattr(mctx, "worker", None) is not None]
+    if not all([worker.stop() for worker in workers]):
+        logging.warning("Modem worker still running, SQLite files left open")
+        return
+    if ctx.outbox is not None:
+        ctx.outbox.close()
+    if ctx.idempotency is not None:
+        ctx.idempotency.close()
+    for mctx in ctx.modems:
+        for store in (mctx.reassembler, mctx.received_journal):
+            if store is not None:
+                store.close()
+
+
 # Re-export for tests and backward compatibility
 from logic import normalize_number, validate_send_payload  # noqa: E402, F401
 from mqtt_layer import (  # noqa: E402, F401
@@ -94,8 +633,6 @@ from mqtt_layer import (  # noqa: E402, F401
 mqtt_connected = mqtt_layer._compat_mqtt_connected
 
 if __name__ == "__main__":
-    from datetime import datetime
-
     log_level = parse_log_level(os.getenv("LOG_LEVEL", "INFO"))
     logging.basicConfig(format="%(asctime)s: %(message)s", level=log_level, datefmt="%H:%M:%S")
 
@@ -121,65 +658,60 @@ if __name__ == "__main__":
     signal.signal(signal.SIGINT, mqtt_layer.shutdown)
     signal.signal(signal.SIGTERM, mqtt_layer.shutdown)
 
-    # Use writable dir (e.g. /tmp): container runs as non-root and /app is not writable
-    gammurc_path = os.path.join(tempfile.gettempdir(), "gammurc")
-    logging.debug("[FIX] Writing gammurc to writable path: %s", gammurc_path)
-    gammu_io.write_gammurc(gammurc_path, config.device, config.gammuoption)
-    gammusm = gammu_io.init_state_machine(gammurc_path, config.pincode)
-
+    gammu_io.configure_pdu_cache(config.pdu_cache_size)
+    serialization.configure(config.payload_format, config.payload_format_topics)
     version_tuple = gammu.Version()
-    logging.info(
-        "Gammu runtime: v%s Python-gammu: v%s Manufacturer: %s IMEI: %s SIMIMSI: %s",
-        version_tuple[0],
-        version_tuple[1],
-        gammusm.GetManufacturer(),
-        gammusm.GetIMEI(),
-        gammusm.GetSIMIMSI(),
-    )
-    if config.heartbeat:
-        gammusm.SetDateTime(datetime.now())
-    logging.info("Gammu initialized")
+    logging.info("Gammu runtime: v%s Python-gammu: v%s", version_tuple[0], version_tuple[1])
+    initialized = [init_modem(config, i) for i in range(len(config.devices))]
+    logging.info("Gammu initialized (%d modem(s))", len(initialized))
 
-    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, config.client_id)
+    client = build_mqtt_client(config)
     client.username_pw_set(config.user, config.password)
     mqtt_layer.setup_mqtt_ssl(client, config.use_tls)
 
     ctx = build_runtime_context(config)
     ctx.client = client
-    ctx.gammusm = gammusm
+    if config.mqtt_version == "5":
+        ctx.topic_aliases = TopicAliases(f"{config.prefix}/{t}" for t in mqtt_layer.ALIASED_TOPICS)
+    if config.outbox_path:
+        ctx.outbox = Outbox(config.outbox_path, flush_sec=config.outbox_flush_sec)
+    if config.received_inflight_max:
+        ctx.publish_tracker = PublishTracker(
+            config.received_inflight_max, config.received_ack_timeout_sec
+        )
+        # paho's own limit covers every modem's window (default 20 for the whole client)
+        client.max_inflight_messages_set(max(20, config.received_inflight_max * len(initialized)))
+    if config.idempotency_max_keys:
+        ctx.idempotency = IdempotencyStore(
+            config.idempotency_max_keys, config.idempotency_ttl_sec, config.idempotency_path
+        )
+    ctx.modems.extend(build_modem_context(ctx, i) for i in range(1, len(initialized)))
+    # From here on every Gammu call runs on its modem's worker; the main thread only runs MQTT
+    for mctx, (gammusm, imsi) in zip(ctx.modems, initialized):
+        mctx.gammusm = gammusm
+        mctx.imsi = imsi
+        mctx.tag_imsi = len(ctx.modems) > 1
+        configure_modem(config, mctx)
+        mctx.worker = ModemWorker(name=f"modem-{mctx.index}")
+        if mctx.send_limiter is not None:
+            # Sends wait for the rate limit in the worker's queue, not asleep on the worker
+            mctx.worker.hold(("send", "bulk"), mctx.send_limiter.wait_time)
+        mctx.worker.start()
     mqtt_layer._app_ctx[0] = ctx
+    mqtt_layer.bind_metrics(ctx)
+    if config.metrics_port:
+        metrics.start_http_server(config.metrics_port, config.metrics_addr)
 
     client.user_data_set(ctx)
     client.on_connect = mqtt_layer.on_mqtt_connect
     client.on_disconnect = mqtt_layer.on_mqtt_disconnect
     client.on_message = mqtt_layer.on_mqtt_message
+    client.on_publish = mqtt_layer.on_mqtt_publish
     client.will_set(f"{config.prefix}/connected", "0", 0, True)
-    client.connect(config.host, config.port)
-    ctx.mqtt_connected = True
-
-    reconnect_attempt = 0
-    while True:
-        time.sleep(1)
-        if not ctx.mqtt_connected:
-            now = time.time()
-            if now - ctx.last_reconnect_attempt >= ctx.reconnect_delay_sec:
-                reconnect_attempt += 1
-                ctx.last_reconnect_attempt = now
-                logging.debug("Reconnecting to MQTT (attempt %d)", reconnect_attempt)
-                try:
-                    client.reconnect()
-                    logging.info("Reconnected to MQTT")
-                    reconnect_attempt = 0
-                except Exception as e:
-                    logging.error("MQTT reconnect failed: %s", e)
-                    ctx.reconnect_delay_sec = min(ctx.reconnect_delay_sec * 2, 60.0)
-            client.loop()
-            continue
-        mqtt_layer.loop_sms_receive(ctx)
-        mqtt_layer.get_signal_info(ctx)
-        if config.moreinfo:
-            mqtt_layer.get_battery_charge(ctx)
-            mqtt_layer.get_network_info(ctx)
-        if config.heartbeat:
-            mqtt_layer.get_datetime(ctx)
-        client.loop()
+    status_scheduler = build_status_scheduler(config)
+    if config.runtime == "asyncio":
+        asyncio.run(async_runtime.run(ctx, status_scheduler, EVENT_TICK_SEC))
+    else:
+        run_threaded(ctx, status_scheduler)
+    close_stores(ctx)
+    logging.info("Stopped")
@@ -0,0 +1,55 @@
+"""
+SMS storage occupancy for one modem: fill level per memory (SM = SIM, ME = phone) from
+GetSMSStatus counters. Past a threshold the modem is under storage pressure, and the receive
+loop drains it at its fastest cadence until the level drops again. No MQTT, no Gammu calls.
+"""
+
+import time
+
+# GetSMSStatus counters per memory: (used, size)
+MEMORIES = {"SM": ("SIMUsed", "SIMSize"), "ME": ("PhoneUsed", "PhoneSize")}
+
+
+class StorageMonitor:
+    """
+    Last known fill level per memory. update() is fed a GetSMSStatus dict at most every
+    interval_sec (every receive pass while under pressure, see due()).
+    """
+
+    def __init__(self, threshold: float = 0.8, interval_sec: float = 60.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.interval_sec = interval_sec
+        self.clock = clock
+        self.levels = {}
+        self.pressure = False
+        self.pressure_events = 0
+        self.last_check = None
+
+    def due(self) -> bool:
+        if self.last_check is None or self.pressure:
+            return True
+        return self.clock() - self.last_check >= self.interval_sec
+
+    def update(self, status: dict) -> bool:
+        """Record one GetSMSStatus result. Returns True if any level or the pressure changed."""
+        self.last_check = self.clock()
+        levels = {}
+        for memory, (used_key, size_key) in MEMORIES.items():
+            size = status.get(size_key, 0)
+            if size > 0:
+                used = status.get(used_key, 0)
+                levels[memory] = {"used": used, "size": size, "fill": round(used / size, 3)}
+        pressure = any(level["fill"] >= self.threshold for level in levels.values())
+        if pressure and not self.pressure:
+            self.pressure_events += 1
+        changed = levels != self.levels or pressure != self.pressure
+        self.levels = levels
+        self.pressure = pressure
+        return changed
+
+    def stats(self) -> dict:
+        return {
+            "fill": {memory: level["fill"] for memory, level in self.levels.items()},
+            "pressure": self.pressure,
+            "pressure_events": self.pressure_events,
+        }
@@ -0,0 +1,175 @@
+"""Tests for the asyncio runtime: socket bridge registration and coroutine jobs."""
+
+import asyncio
+import socket
+import sys
+import unittest
+from concurrent.futures import Future
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import async_runtime  # noqa: E402
+import mqtt_layer  # noqa: E402
+from scheduler import AdaptiveInterval, PollScheduler  # noqa: E402
+
+
+def _done(result=None):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class TestMqttSocketBridge(unittest.TestCase):
+    def test_reader_writer_follow_paho_callbacks(self):
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            client = MagicMock()
+            client.loop_misc.return_value = 0
+            bridge = async_runtime.MqttSocketBridge(loop, client)
+            a, b = socket.socketpair()
+            try:
+                bridge.on_socket_open(client, None, a)
+                bridge.on_socket_register_write(client, None, a)
+                await asyncio.sleep(0.05)
+                client.loop_write.assert_called()
+                b.send(b"x")
+                await asyncio.sleep(0.05)
+                client.loop_read.assert_called()
+                self.assertIsNotNone(bridge.misc)
+                bridge.on_socket_close(client, None, a)
+                await asyncio.sleep(0)
+                self.assertIsNone(bridge.misc)
+                self.assertFalse(loop.remove_reader(a))
+            finally:
+                a.close()
+                b.close()
+
+        asyncio.run(scenario())
+
+
+class TestJobs(unittest.TestCase):
+    def test_receive_loop_polls_at_adaptive_interval(self):
+        mctx = SimpleNamespace(
+            event_receive=False,
+            last_receive_scan=0.0,
+            receive_poller=AdaptiveInterval(0.25, 5),
+            worker=MagicMock(),
+        )
+        mctx.worker.submit_once.return_value = _done(1)
+        ctx = SimpleNamespace(mqtt_connected=True)
+        sleeps = []
+
+        async def fake_sleep(sec):
+            sleeps.append(sec)
+            if len(sleeps) == 2:
+                raise asyncio.CancelledError
+
+        async def scenario():
+            with patch.object(async_runtime.asyncio, "sleep", fake_sleep):
+                with self.assertRaises(asyncio.CancelledError):
+                    await async_runtime.receive_loop(ctx, mctx, 0.05)
+
+        asyncio.run(scenario())
+        mctx.worker.submit_once.assert_called_with("receive", mqtt_layer.poll_receive, mctx)
+        self.assertEqual(sleeps, [0.25, 0.25])
+
+    def test_receive_loop_survives_failed_job(self):
+        mctx = SimpleNamespace(
+            event_receive=False,
+            last_receive_scan=0.0,
+            receive_poller=AdaptiveInterval(0.25, 5),
+            worker=MagicMock(),
+        )
+        failed = Future()
+        failed.set_exception(RuntimeError("ERR_TIMEOUT"))
+        mctx.worker.submit_once.side_effect = [failed, _done(0)]
+        sleeps = []
+
+        async def fake_sleep(sec):
+            sleeps.append(sec)
+            if len(sleeps) == 2:
+                raise asyncio.CancelledError
+
+        async def scenario():
+            with patch.object(async_runtime.asyncio, "sleep", fake_sleep):
+                with self.assertRaises(asyncio.CancelledError):
+                    await async_runtime.receive_loop(
+                        SimpleNamespace(mqtt_connected=True), mctx, 0.05
+                    )
+
+        asyncio.run(scenario())
+        self.assertEqual(mctx.worker.submit_once.call_count, 2)
+
+    def test_status_loop_submits_due_metrics(self):
+        ctx = SimpleNamespace(mqtt_connected=True, worker=MagicMock())
+        ctx.worker.submit_once.return_value = _done()
+        scheduler = PollScheduler(rand=lambda: 0.0)
+        scheduler.add("signal", 15, now=0.0)
+
+        async def fake_sleep(sec):
+            raise asyncio.CancelledError
+
+        async def scenario():
+            with patch.object(async_runtime.asyncio, "sleep", fake_sleep):
+                with self.assertRaises(asyncio.CancelledError):
+                    await async_runtime.status_loop(ctx, scheduler)
+
+        asyncio.run(scenario())
+        ctx.worker.submit_once.assert_called_once_with(
+            "status", mqtt_layer.poll_status, ctx, ["signal"]
+        )
+
+    def test_status_loop_keeps_metrics_due_while_busy(self):
+        ctx = SimpleNamespace(mqtt_connected=True, worker=MagicMock())
+        ctx.worker.submit_once.side_effect = [None, _done()]
+        scheduler = PollScheduler(rand=lambda: 0.0)
+        scheduler.add("signal", 15, now=0.0)
+        sleeps = []
+
+        async def fake_sleep(sec):
+            sleeps.append(sec)
+            if len(sleeps) == 2:
+                raise asyncio.CancelledError
+
+        async def scenario():
+            with patch.object(async_runtime.asyncio, "sleep", fake_sleep):
+                with self.assertRaises(asyncio.CancelledError):
+                    await async_runtime.status_loop(ctx, scheduler)
+
+        asyncio.run(scenario())
+        self.assertEqual(sleeps[0], mqtt_layer.STATUS_BUSY_RETRY_SEC)
+        self.assertEqual(
+            [c[0][3] for c in ctx.worker.submit_once.call_args_list], [["signal"], ["signal"]]
+        )
+        self.assertGreater(scheduler.next_due(), 0.0)
+
+    def test_reconnect_backoff(self):
+        ctx = SimpleNamespace(mqtt_connected=False, client=MagicMock())
+        ctx.client.reconnect.side_effect = OSError("refused")
+        sleeps = []
+
+        async def fake_sleep(sec):
+            sleeps.append(sec)
+            if len(sleeps) == 4:
+                raise asyncio.CancelledError
+
+        async def scenario():
+            with patch.object(async_runtime.asyncio, "sleep", fake_sleep):
+                with self.assertRaises(asyncio.CancelledError):
+                    await async_runtime.reconnect_loop(ctx)
+
+        asyncio.run(scenario())
+        self.assertEqual(sleeps, [1.0, 2.0, 4.0, 8.0])
+        self.assertEqual(ctx.client.reconnect.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
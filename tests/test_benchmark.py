@@ -0,0 +1,55 @@
+"""Smoke tests for the bridge benchmark: fake modem round trip and baseline comparison."""
+
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks"))
+
+import bench_bridge  # noqa: E402
+
+import gammu_layer  # noqa: E402
+
+
+class TestBenchBridge(unittest.TestCase):
+    def setUp(self):
+        stand_in = bench_bridge._gammu_stand_in()
+        for module in (gammu_layer, bench_bridge):
+            patcher = patch.object(module, "gammu", stand_in)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_send_and_receive_paths_run_against_fake_modem(self):
+        ctx = bench_bridge.build_bridge({})
+        self.assertEqual(len(bench_bridge.run_send(ctx, 20, 200)), 20)
+        self.assertEqual(ctx.gammusm.sent, 40)
+
+        ctx = bench_bridge.build_bridge({})
+        latencies = bench_bridge.run_receive(ctx, 20, batch=7, multipart_every=3)
+        self.assertEqual(len(latencies), 20)
+        self.assertEqual(ctx.gammusm.storage, {})
+
+    def test_compare_flags_regressions_beyond_tolerance(self):
+        def result(rate, p95, peak):
+            return {"msgs_per_sec": rate, "latency_ms": {"p95": p95}, "alloc_peak_kb": peak}
+
+        baseline = {"params": {"messages": 10}, "send": result(1000, 1.0, 50)}
+        current = {"params": {"messages": 10}, "send": result(900, 1.1, 70)}
+        regressions = bench_bridge.compare(current, baseline, 0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("alloc peak kB", regressions[0])
+        current["params"] = {"messages": 20}
+        self.assertEqual(bench_bridge.compare(current, baseline, 0.2), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""Tests for event-driven receive: incoming SMS callback, fallback poll, unsupported modem."""
+
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+
+
+class FakeStateMachine:
+    """Minimal StateMachine: stores the incoming callback and fires queued events on ReadDevice."""
+
+    def __init__(self, supports_sms_events=True):
+        self.supports_sms_events = supports_sms_events
+        self.callback = None
+        self.events = []
+        self.read_calls = 0
+
+    def SetIncomingCallback(self, callback):
+        self.callback = callback
+
+    def SetIncomingSMS(self, Enable=True):
+        if not self.supports_sms_events:
+            raise RuntimeError("ERR_NOTSUPPORTED")
+
+    def ReadDevice(self, Wait=False):
+        self.read_calls += 1
+        while self.events:
+            callback_type, data = self.events.pop(0)
+            self.callback(self, callback_type, data)
+        return 0
+
+
+def _ctx(sm, fallback_sec=30.0):
+    return SimpleNamespace(
+        config=SimpleNamespace(prefix="test", receive_fallback_poll_sec=fallback_sec),
+        client=MagicMock(),
+        gammusm=sm,
+        incoming_sms_pending=False,
+        last_receive_scan=0.0,
+    )
+
+
+class TestEventReceive(unittest.TestCase):
+    def test_enable_drains_once_then_waits_for_notification(self):
+        sm = FakeStateMachine()
+        ctx = _ctx(sm)
+        self.assertTrue(mqtt_layer.enable_event_receive(ctx))
+
+        with patch.object(mqtt_layer, "loop_sms_receive") as receive:
+            # Initial drain right after enabling
+            self.assertTrue(mqtt_layer.receive_tick(ctx, now=100.0))
+            # Idle: modem is read but no folder scan
+            self.assertFalse(mqtt_layer.receive_tick(ctx, now=100.05))
+            self.assertFalse(mqtt_layer.receive_tick(ctx, now=100.10))
+            self.assertEqual(receive.call_count, 1)
+
+            sm.events.append(("SMS", {"Folder": 0, "Location": 3}))
+            self.assertTrue(mqtt_layer.receive_tick(ctx, now=100.15))
+            self.assertEqual(receive.call_count, 2)
+        self.assertEqual(sm.read_calls, 4)
+
+    def test_non_sms_events_are_ignored(self):
+        sm = FakeStateMachine()
+        ctx = _ctx(sm)
+        mqtt_layer.enable_event_receive(ctx)
+        ctx.incoming_sms_pending = False
+        ctx.last_receive_scan = 100.0
+        sm.events.append(("Call", {"Status": "IncomingCall"}))
+
+        with patch.object(mqtt_layer, "loop_sms_receive") as receive:
+            self.assertFalse(mqtt_layer.receive_tick(ctx, now=101.0))
+        receive.assert_not_called()
+
+    def test_fallback_poll_runs_after_interval(self):
+        sm = FakeStateMachine()
+        ctx = _ctx(sm, fallback_sec=30.0)
+        ctx.last_receive_scan = 100.0
+
+        with patch.object(mqtt_layer, "loop_sms_receive") as receive:
+            self.assertFalse(mqtt_layer.receive_tick(ctx, now=129.0))
+            self.assertTrue(mqtt_layer.receive_tick(ctx, now=130.0))
+        receive.assert_called_once_with(ctx)
+        self.assertEqual(ctx.last_receive_scan, 130.0)
+
+    def test_unsupported_modem_returns_false(self):
+        ctx = _ctx(FakeStateMachine(supports_sms_events=False))
+        self.assertFalse(mqtt_layer.enable_event_receive(ctx))
+        self.assertFalse(ctx.incoming_sms_pending)
+
+
+if __name__ == "__main__":
+    unittest.main()
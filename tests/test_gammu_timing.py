@@ -0,0 +1,83 @@
+"""Tests for per-call Gammu timing: decorator, pluggable recorder, quantiles, stats/control."""
+
+import json
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+# Mock heavy deps so mqtt_layer can be imported without gammu (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import gammu_layer  # noqa: E402
+import metrics  # noqa: E402
+import mqtt_layer  # noqa: E402
+
+
+class TestTimedCalls(unittest.TestCase):
+    def tearDown(self):
+        gammu_layer.set_call_recorder(gammu_layer._record_call)
+
+    def test_recorder_gets_op_duration_and_outcome(self):
+        calls = []
+        gammu_layer.set_call_recorder(lambda op, sec, ok: calls.append((op, ok)))
+        sm = MagicMock()
+        gammu_layer.delete_sms(sm, 0, 3)
+        sm.GetSignalQuality.side_effect = RuntimeError("timeout")
+        with self.assertRaises(RuntimeError):
+            gammu_layer.get_signal_quality(sm)
+        self.assertEqual(calls, [("delete_sms", True), ("get_signal_quality", False)])
+
+    def test_disabled_recorder_skips_timing(self):
+        gammu_layer.set_call_recorder(None)
+        before = metrics.GAMMU_CALL_SECONDS.count(op="read_device")
+        gammu_layer.read_device(MagicMock())
+        self.assertEqual(metrics.GAMMU_CALL_SECONDS.count(op="read_device"), before)
+
+    def test_call_stats_counts_errors(self):
+        sm = MagicMock()
+        sm.GetBatteryCharge.side_effect = [{"BatteryPercent": 90}, RuntimeError("x")]
+        gammu_layer.get_battery_charge(sm)
+        with self.assertRaises(RuntimeError):
+            gammu_layer.get_battery_charge(sm)
+        stats = gammu_layer.call_stats()["get_battery_charge"]
+        self.assertGreaterEqual(stats["count"], 2)
+        self.assertGreaterEqual(stats["errors"], 1)
+        self.assertIsNotNone(stats["p99"])
+
+
+class TestQuantile(unittest.TestCase):
+    def test_interpolates_within_bucket(self):
+        h = metrics.Histogram("test_quantile_seconds", "test", buckets=(1.0, 2.0, 4.0))
+        self.assertIsNone(h.quantile(0.5, op="a"))
+        for value in (0.5, 1.5, 1.5, 3.0):
+            h.observe(value, op="a")
+        self.assertEqual(h.quantile(0.25, op="a"), 1.0)
+        self.assertEqual(h.quantile(0.5, op="a"), 1.5)
+        self.assertEqual(h.quantile(1.0, op="a"), 4.0)
+        h.observe(100.0, op="a")
+        self.assertEqual(h.quantile(0.99, op="a"), 4.0)
+        self.assertEqual(h.label_values("op"), ["a"])
+
+
+class TestGammuStatsAction(unittest.TestCase):
+    def test_control_action_publishes_timings(self):
+        gammu_layer.delete_sms(MagicMock(), 0, 1)
+        ctx = SimpleNamespace(config=SimpleNamespace(prefix="test"))
+        client = MagicMock()
+        msg = SimpleNamespace(topic="test/control", payload=b'{"action": "gammu_stats"}')
+        mqtt_layer.on_mqtt_message(client, ctx, msg)
+        topic, payload = client.publish.call_args[0]
+        self.assertEqual(topic, "test/control_response")
+        body = json.loads(payload)
+        self.assertEqual(body["result"], "gammu_stats")
+        self.assertIn("delete_sms", body["gammu"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""Tests for idempotency keys on /send: store bounds, persistence, duplicate handling."""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+from idempotency import IdempotencyStore  # noqa: E402
+from logic import parse_send_request  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestIdempotencyStore(unittest.TestCase):
+    def test_duplicate_gets_recorded_results(self):
+        store = IdempotencyStore()
+        self.assertIsNone(store.begin("a", 2))
+        self.assertEqual(store.begin("a", 2), [])
+        store.record("a", {"number": "1"})
+        store.record("a", {"number": "2"})
+        self.assertEqual([r["number"] for r in store.begin("a", 2)], ["1", "2"])
+        self.assertEqual(store.stats(), {"keys": 1, "hits": 2})
+
+    def test_ttl_and_lru_bounds(self):
+        clock = Clock()
+        store = IdempotencyStore(max_keys=2, ttl_sec=60, clock=clock)
+        store.begin("a", 1)
+        store.begin("b", 1)
+        store.begin("a", 1)  # a is now most recently used
+        store.begin("c", 1)
+        self.assertIsNone(store.begin("b", 1))
+        clock.now += 61
+        self.assertIsNone(store.begin("a", 1))
+
+    def test_completed_keys_survive_restart(self):
+        fd, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        self.addCleanup(os.unlink, path)
+        store = IdempotencyStore(path=path)
+        store.begin("done", 1)
+        store.record("done", {"result": "success"})
+        store.begin("sending", 1)
+        store.close()
+        store = IdempotencyStore(path=path)
+        self.assertEqual(store.begin("done", 1), [{"result": "success"}])
+        self.assertIsNone(store.begin("sending", 1))
+        store.close()
+
+
+class TestDuplicateSend(unittest.TestCase):
+    def test_parse_id(self):
+        self.assertEqual(parse_send_request(b'{"number": "1", "text": "x", "ID": 7}').id, "7")
+        request = parse_send_request(b'{"number": "1", "text": "x", "id": ""}')
+        self.assertIn("id", request.error["result"])
+
+    def test_redelivered_request_is_answered_without_sending(self):
+        ctx = SimpleNamespace(
+            config=SimpleNamespace(prefix="sms2mqtt"), idempotency=IdempotencyStore()
+        )
+        client = MagicMock()
+        msg = SimpleNamespace(
+            topic="sms2mqtt/send", payload=b'{"number": "+7900", "text": "Hi", "id": "otp-1"}'
+        )
+        with patch.object(mqtt_layer, "send_one") as send_one:
+            mqtt_layer.on_mqtt_message(client, ctx, msg)
+            mqtt_layer.on_mqtt_message(client, ctx, msg)
+        send_one.assert_called_once()
+        first, second = [json.loads(c[0][1]) for c in client.publish.call_args_list]
+        self.assertEqual((first["id"], first["result"]), ("otp-1", "success"))
+        self.assertEqual(second, dict(first, duplicate=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+"""Tests for incremental inbox scanning: status pre-check, probing new locations, fallbacks."""
+
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import gammu_layer  # noqa: E402
+import mqtt_layer  # noqa: E402
+from inbox_scan import InboxScanner  # noqa: E402
+
+
+class FakeEmpty(Exception):
+    pass
+
+
+class FakeModem:
+    """Storage as {location: sms}; counts calls the way a serial link would pay for them."""
+
+    def __init__(self, size=10):
+        self.size = size
+        self.storage = {}
+        self.walks = 0
+        self.reads = 0
+
+    def put(self, location, text="hi"):
+        self.storage[location] = [
+            {"Location": location, "Text": text, "Number": "+1", "UDH": {"Type": "NoUDH"}}
+        ]
+
+    def GetSMSStatus(self):
+        return {"SIMUsed": len(self.storage), "SIMSize": self.size, "PhoneUsed": 0, "PhoneSize": 0}
+
+    def GetSMS(self, Folder, Location):
+        self.reads += 1
+        if Location not in self.storage:
+            raise FakeEmpty()
+        return self.storage[Location]
+
+    def GetNextSMS(self, Folder, Start=False, Location=None):
+        self.walks += 1
+        locations = sorted(self.storage)
+        if not Start:
+            locations = [loc for loc in locations if loc > Location]
+        if not locations:
+            raise FakeEmpty()
+        return self.storage[locations[0]]
+
+    def DeleteSMS(self, Folder, Location):
+        del self.storage[Location]
+
+
+class TestInboxScanner(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(gammu_layer, "gammu", SimpleNamespace(ERR_EMPTY=FakeEmpty))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sm = FakeModem()
+        self.scanner = InboxScanner(full_rescan_sec=1000)
+
+    def test_first_scan_walks_then_unchanged_counters_skip(self):
+        self.sm.put(100001)
+        self.assertEqual(len(self.scanner.scan(self.sm, now=1)), 1)
+        walks = self.sm.walks
+        self.assertIsNone(self.scanner.scan(self.sm, now=2))
+        self.assertEqual(self.sm.walks, walks)
+        self.assertEqual(self.scanner.stats()["skipped"], 1)
+
+    def test_new_sms_read_by_probe_without_walk(self):
+        self.sm.put(100001, "stuck part")
+        self.scanner.scan(self.sm, now=1)
+        walks = self.sm.walks
+        self.sm.put(100002, "new")
+        allsms = self.scanner.scan(self.sm, now=2)
+        self.assertEqual(self.sm.walks, walks)
+        self.assertEqual(self.sm.reads, 1)
+        self.assertEqual(sorted(s[0]["Location"] for s in allsms), [100001, 100002])
+
+    def test_forget_keeps_counts_in_sync(self):
+        self.sm.put(100001)
+        self.scanner.scan(self.sm, now=1)
+        self.sm.DeleteSMS(0, 100001)
+        self.scanner.forget(100001)
+        self.assertIsNone(self.scanner.scan(self.sm, now=2))
+
+    def test_unexpected_drop_or_unfound_new_sms_fall_back_to_walk(self):
+        self.sm.put(100001)
+        self.sm.put(100002)
+        self.scanner.scan(self.sm, now=1)
+        self.sm.DeleteSMS(0, 100002)
+        self.assertEqual(len(self.scanner.scan(self.sm, now=2)), 1)
+        self.assertEqual(self.scanner.stats()["full_scans"], 2)
+        # New SMS in a folder never seen before: probing misses, full walk finds it
+        self.sm.put(300001)
+        allsms = self.scanner.scan(self.sm, now=3)
+        self.assertEqual(sorted(s[0]["Location"] for s in allsms), [100001, 300001])
+        self.assertEqual(self.scanner.stats()["full_scans"], 3)
+
+    def test_periodic_full_rescan(self):
+        self.scanner.scan(self.sm, now=1)
+        self.assertEqual(self.scanner.scan(self.sm, now=2000), [])
+        self.assertEqual(self.scanner.stats()["full_scans"], 2)
+
+    def test_status_unsupported_uses_full_walks(self):
+        self.sm.GetSMSStatus = MagicMock(side_effect=RuntimeError("not supported"))
+        self.scanner.scan(self.sm, now=1)
+        self.scanner.scan(self.sm, now=2)
+        self.assertEqual(self.scanner.stats()["full_scans"], 2)
+        self.sm.GetSMSStatus.assert_called_once()
+
+
+class TestLoopSmsReceiveWithScanner(unittest.TestCase):
+    def test_skip_keeps_stuck_state_and_deletes_update_scanner(self):
+        scanner = MagicMock()
+        ctx = SimpleNamespace(
+            config=SimpleNamespace(prefix="test"),
+            gammusm=MagicMock(),
+            client=MagicMock(),
+            inbox_scanner=scanner,
+            stuck_sms_detected=True,
+            last_stuck_sms=[{"Location": 5}],
+        )
+        scanner.scan.return_value = None
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            mqtt_layer.loop_sms_receive(ctx)
+            gio.fetch_sms_batch.assert_not_called()
+        self.assertTrue(ctx.stuck_sms_detected)
+        self.assertEqual(ctx.last_stuck_sms, [{"Location": 5}])
+
+        sms = [
+            {"Location": 7, "UDH": {"Type": "NoUDH"}, "DateTime": "", "Number": "1", "Text": "x"}
+        ]
+        scanner.scan.return_value = [sms]
+        ctx.client.publish.return_value = SimpleNamespace(rc=0)
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.link_sms.return_value = [sms]
+            mqtt_layer.loop_sms_receive(ctx)
+            gio.delete_sms.assert_called_once_with(ctx.gammusm, 0, 7)
+        scanner.forget.assert_called_once_with(7)
+        self.assertFalse(ctx.stuck_sms_detected)
+
+    def test_failed_publish_is_retried_on_the_next_pass(self):
+        fake_gammu = SimpleNamespace(ERR_EMPTY=FakeEmpty, LinkSMS=lambda allsms: allsms)
+        sm = FakeModem()
+        sm.put(100001)
+        sm.storage[100001][0]["DateTime"] = ""
+        ctx = SimpleNamespace(
+            config=SimpleNamespace(prefix="test"),
+            gammusm=sm,
+            client=MagicMock(),
+            inbox_scanner=InboxScanner(full_rescan_sec=1000),
+            stuck_sms_detected=False,
+            last_stuck_sms=[],
+        )
+        ctx.client.publish.side_effect = [SimpleNamespace(rc=4), SimpleNamespace(rc=0, mid=1)]
+        with patch.object(gammu_layer, "gammu", fake_gammu):
+            mqtt_layer.loop_sms_receive(ctx)
+            self.assertIn(100001, sm.storage)
+            mqtt_layer.loop_sms_receive(ctx)
+        self.assertEqual(ctx.client.publish.call_count, 2)
+        self.assertEqual(sm.storage, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
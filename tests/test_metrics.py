@@ -0,0 +1,97 @@
+"""Tests for metrics: text exposition, histogram buckets, /metrics endpoint, instrumentation."""
+
+import sys
+import unittest
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import metrics  # noqa: E402
+import mqtt_layer  # noqa: E402
+
+
+class TestMetricTypes(unittest.TestCase):
+    def test_histogram_is_cumulative_when_rendered(self):
+        h = metrics.Histogram("test_hist_seconds", "test", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            h.observe(value, op="x")
+        text = metrics.render()
+        self.assertIn('test_hist_seconds_bucket{op="x",le="0.1"} 2', text)
+        self.assertIn('test_hist_seconds_bucket{op="x",le="1.0"} 3', text)
+        self.assertIn('test_hist_seconds_bucket{op="x",le="+Inf"} 4', text)
+        self.assertIn('test_hist_seconds_count{op="x"} 4', text)
+        self.assertIn("# TYPE test_hist_seconds histogram", text)
+
+    def test_counter_and_callback_gauge(self):
+        c = metrics.Counter("test_things_total", "test")
+        c.inc(modem=0)
+        c.inc(2, modem=0)
+        self.assertEqual(c.value(modem=0), 3)
+        g = metrics.Gauge("test_depth", "test")
+        g.set_function(lambda: [({"modem": 1}, 7)])
+        text = metrics.render()
+        self.assertIn('test_things_total{modem="0"} 3', text)
+        self.assertIn('test_depth{modem="1"} 7', text)
+
+    def test_http_endpoint(self):
+        server = metrics.start_http_server(0, "127.0.0.1")
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as resp:
+                body = resp.read().decode()
+                self.assertIn("text/plain", resp.headers["Content-Type"])
+            self.assertIn("# TYPE sms2mqtt_sms_sent_total counter", body)
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/other")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_send_outcomes_counted_per_modem(self):
+        ctx = SimpleNamespace(gammusm=MagicMock(), index=5, send_failures=0, last_send_failure=0.0)
+        sent = metrics.SMS_SENT.value(modem=5)
+        failed = metrics.SMS_SEND_FAILED.value(modem=5)
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            mqtt_layer.send_one(ctx, "1", "x")
+            gio.send_sms.side_effect = RuntimeError("no network")
+            with self.assertRaises(RuntimeError):
+                mqtt_layer.send_one(ctx, "1", "x")
+        self.assertEqual(metrics.SMS_SENT.value(modem=5), sent + 1)
+        self.assertEqual(metrics.SMS_SEND_FAILED.value(modem=5), failed + 1)
+
+    def test_publish_failures_and_receive_duration(self):
+        ctx = SimpleNamespace(client=MagicMock(), worker=object(), index=6)
+        ctx.client.publish.return_value = SimpleNamespace(rc=4)
+        before = metrics.PUBLISH_FAILURES.value()
+        self.assertFalse(mqtt_layer._publish_received(ctx, "test", "{}", "single"))
+        self.assertEqual(metrics.PUBLISH_FAILURES.value(), before + 1)
+
+        ctx.gammusm = MagicMock()
+        ctx.stuck_sms_detected = False
+        ctx.last_stuck_sms = []
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = []
+            mqtt_layer.loop_sms_receive(ctx)
+        self.assertEqual(metrics.RECEIVE_LOOP_SECONDS.count(modem=6), 1)
+
+    def test_reconnects_counted_after_first_connect(self):
+        ctx = SimpleNamespace(config=SimpleNamespace(prefix="test"), outbox=None)
+        before = metrics.MQTT_RECONNECTS.value()
+        mqtt_layer.on_mqtt_connect(MagicMock(), ctx, None, 0, None)
+        mqtt_layer.on_mqtt_connect(MagicMock(), ctx, None, 0, None)
+        self.assertEqual(metrics.MQTT_RECONNECTS.value(), before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
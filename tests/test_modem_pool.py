@@ -0,0 +1,122 @@
+"""Tests for the multi-modem pool: least-loaded pick, health, per-recipient fan-out, IMSI tagging."""
+
+import json
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so sms2mqtt can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import modem_pool  # noqa: E402
+import mqtt_layer  # noqa: E402
+import sms2mqtt  # noqa: E402
+
+
+def _modem(index, load=0, alive=True, failures=0, last_failure=0.0):
+    worker = MagicMock()
+    worker.is_alive.return_value = alive
+    worker.pending.return_value = load
+    return SimpleNamespace(
+        index=index, worker=worker, send_failures=failures, last_send_failure=last_failure
+    )
+
+
+class TestPickModem(unittest.TestCase):
+    def test_least_loaded_wins(self):
+        modems = [_modem(0, load=3), _modem(1, load=1), _modem(2, load=2)]
+        self.assertIs(modem_pool.pick_modem(modems), modems[1])
+
+    def test_tie_goes_to_lowest_index(self):
+        modems = [_modem(0, load=1), _modem(1, load=1)]
+        self.assertIs(modem_pool.pick_modem(modems), modems[0])
+
+    def test_unhealthy_modems_skipped(self):
+        failing = _modem(0, load=0, failures=3, last_failure=1000.0)
+        dead = _modem(1, load=0, alive=False)
+        busy = _modem(2, load=5)
+        self.assertIs(modem_pool.pick_modem([failing, dead, busy], now=1010.0), busy)
+
+    def test_failing_modem_retried_after_cooldown(self):
+        failing = _modem(0, load=0, failures=3, last_failure=1000.0)
+        busy = _modem(1, load=5)
+        now = 1000.0 + modem_pool.UNHEALTHY_RETRY_SEC
+        self.assertIs(modem_pool.pick_modem([failing, busy], now=now), failing)
+
+    def test_all_unhealthy_falls_back_to_least_loaded(self):
+        modems = [_modem(0, load=2, alive=False), _modem(1, load=1, alive=False)]
+        self.assertIs(modem_pool.pick_modem(modems), modems[1])
+
+    def test_record_send_result_resets_on_success(self):
+        m = _modem(0)
+        for _ in range(3):
+            modem_pool.record_send_result(m, False, now=50.0)
+        self.assertEqual(m.send_failures, 3)
+        self.assertFalse(modem_pool.is_healthy(m, now=51.0))
+        modem_pool.record_send_result(m, True)
+        self.assertEqual(m.send_failures, 0)
+
+
+class TestPoolContext(unittest.TestCase):
+    def test_devices_and_pins_from_env(self):
+        env = {"DEVICES": "/dev/a, /dev/b", "PIN": "1111,2222"}
+        with patch.dict(os.environ, env, clear=False):
+            config = sms2mqtt.build_config_from_env()
+        self.assertEqual(config.devices, ["/dev/a", "/dev/b"])
+        self.assertEqual(config.pincodes, ["1111", "2222"])
+        self.assertEqual(config.device, "/dev/a")
+
+    def test_single_pin_shared_by_all_devices(self):
+        with patch.dict(os.environ, {"DEVICES": "/dev/a,/dev/b", "PIN": "1234"}, clear=False):
+            config = sms2mqtt.build_config_from_env()
+        self.assertEqual(config.pincodes, ["1234", "1234"])
+
+    def test_mismatched_pin_count_rejected(self):
+        with patch.dict(os.environ, {"DEVICES": "/dev/a,/dev/b,/dev/c", "PIN": "1,2"}, clear=False):
+            with self.assertRaises(ValueError):
+                sms2mqtt.build_config_from_env()
+
+    def test_modem_contexts_have_independent_state(self):
+        config = SimpleNamespace(prefix="test")
+        ctx = sms2mqtt.build_runtime_context(config)
+        extra = sms2mqtt.build_modem_context(ctx, 1)
+        ctx.modems.append(extra)
+        self.assertIs(ctx.modems[0], ctx)
+        self.assertIs(extra.config, ctx.config)
+        self.assertIsNot(extra.last_stuck_sms, ctx.last_stuck_sms)
+        self.assertEqual(extra.index, 1)
+
+    def test_fan_out_spreads_recipients_and_tags_imsi(self):
+        config = SimpleNamespace(prefix="test", max_text_length=None)
+        ctx = sms2mqtt.build_runtime_context(config)
+        ctx.modems.append(sms2mqtt.build_modem_context(ctx, 1))
+        for mctx, imsi in zip(ctx.modems, ("250010000000001", "250010000000002")):
+            mctx.gammusm = MagicMock(name=f"sm-{imsi}")
+            mctx.imsi = imsi
+            mctx.tag_imsi = True
+        client = MagicMock()
+        msg = SimpleNamespace(topic="test/send", payload=b'{"number": "1;2;3;4", "text": "Hi"}')
+
+        # Alternate picks: each recipient is routed on its own
+        picks = iter([ctx.modems[0], ctx.modems[1], ctx.modems[0], ctx.modems[1]])
+        with (
+            patch.object(mqtt_layer.modem_pool, "pick_modem", side_effect=lambda m: next(picks)),
+            patch.object(mqtt_layer, "gammu_io") as gio,
+        ):
+            mqtt_layer.on_mqtt_message(client, ctx, msg)
+
+        used = [c[0][0] for c in gio.send_sms.call_args_list]
+        self.assertEqual(used, [ctx.gammusm, ctx.modems[1].gammusm] * 2)
+        feedback = [json.loads(c[0][1]) for c in client.publish.call_args_list]
+        self.assertEqual([f["imsi"] for f in feedback], ["250010000000001", "250010000000002"] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""Tests for the simulated modem: storage capacity, multipart arrival, failures, events."""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import gammu_layer  # noqa: E402
+import modem_sim  # noqa: E402
+import mqtt_layer  # noqa: E402
+from reassembly import Reassembler  # noqa: E402
+
+
+class FakeGammuError(Exception):
+    pass
+
+
+class FakeEmpty(FakeGammuError):
+    pass
+
+
+class FakeTimeout(FakeGammuError):
+    pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _modem(**scenario):
+    path = None
+    if scenario:
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(scenario, f)
+    try:
+        loaded = modem_sim.load_scenario(path or "")
+    finally:
+        if path:
+            os.unlink(path)
+    clock = Clock()
+    return modem_sim.SimulatedModem(loaded, clock=clock, sleep=clock.sleep), clock
+
+
+class TestSimulatedModem(unittest.TestCase):
+    def setUp(self):
+        fake_gammu = SimpleNamespace(ERR_EMPTY=FakeEmpty, ERR_TIMEOUT=FakeTimeout)
+        for module in (gammu_layer, modem_sim):
+            patcher = patch.object(module, "gammu", fake_gammu)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_full_storage_keeps_messages_queued(self):
+        sm, clock = _modem(sim_size=2, incoming=[{"interval_sec": 1, "count": 3}])
+        clock.now = 5
+        status = gammu_layer.get_sms_status(sm)
+        self.assertEqual((status["SIMUsed"], status["SIMSize"]), (2, 2))
+        self.assertEqual(sm.stats()["queued"], 1)
+        batch = gammu_layer.fetch_sms_batch(sm)
+        self.assertEqual([s[0]["Text"] for s in batch], ["Simulated SMS 1", "Simulated SMS 2"])
+        gammu_layer.delete_sms(sm, 0, batch[0][0]["Location"])
+        self.assertEqual(gammu_layer.get_sms_status(sm)["SIMUsed"], 2)
+        self.assertEqual(sm.stats()["queued"], 0)
+
+    def test_latency_per_command(self):
+        sm, clock = _modem(latency={"default": 0.1, "SendSMS": 2.0})
+        gammu_layer.get_signal_quality(sm)
+        sm.SendSMS({})
+        self.assertAlmostEqual(clock.now, 2.1)
+
+    def test_send_failures(self):
+        sm, _ = _modem(seed=1, send_failure_rate=1.0)
+        with self.assertRaises(FakeTimeout):
+            sm.SendSMS({})
+        self.assertEqual(sm.stats()["send_failures"], 1)
+
+    def test_multipart_reverse_order_and_loss(self):
+        incoming = [{"interval_sec": 10, "count": 1, "parts": 3, "order": "reverse"}]
+        sm, clock = _modem(incoming=incoming)
+        clock.now = 10
+        parts = [s[0]["UDH"]["PartNumber"] for s in gammu_layer.fetch_sms_batch(sm)]
+        self.assertEqual(parts, [3, 2, 1])
+
+        incoming[0]["loss"] = 1.0
+        sm, clock = _modem(seed=3, incoming=incoming)
+        clock.now = 10
+        self.assertEqual(gammu_layer.fetch_sms_batch(sm), [])
+        self.assertEqual(sm.stats()["parts_lost"], 3)
+
+    def test_new_sms_notifications(self):
+        sm, clock = _modem(incoming=[{"interval_sec": 1, "count": 2}])
+        ctx = SimpleNamespace(gammusm=sm, incoming_sms_pending=False)
+        self.assertTrue(gammu_layer.enable_incoming_sms(sm, mqtt_layer.make_incoming_callback(ctx)))
+        clock.now = 2
+        gammu_layer.read_device(sm)
+        self.assertTrue(ctx.incoming_sms_pending)
+
+    def test_bridge_receive_reassembles_gapped_parts(self):
+        incoming = [
+            {"interval_sec": 5, "count": 1, "parts": 2, "order": "shuffle", "part_gap_sec": 3}
+        ]
+        sm, clock = _modem(seed=7, incoming=incoming)
+        ctx = SimpleNamespace(
+            gammusm=sm,
+            client=MagicMock(),
+            config=SimpleNamespace(prefix="sms2mqtt"),
+            reassembler=Reassembler(),
+            worker=object(),
+            stuck_sms_detected=False,
+            last_stuck_sms=[],
+        )
+        ctx.client.publish.return_value = SimpleNamespace(rc=0, mid=1)
+        clock.now = 1
+        self.assertEqual(mqtt_layer.loop_sms_receive(ctx), 1)
+        self.assertTrue(ctx.stuck_sms_detected)
+        clock.now = 4
+        mqtt_layer.loop_sms_receive(ctx)
+        topics = [c[0][0] for c in ctx.client.publish.call_args_list]
+        self.assertEqual(topics, ["sms2mqtt/stuck_status", "sms2mqtt/received"])
+        self.assertEqual(sm.storage, {})
+
+    def test_simulated_device_skips_gammurc(self):
+        import sms2mqtt
+
+        config = SimpleNamespace(devices=["sim:"], pincodes=[None], heartbeat=False)
+        with patch.object(sms2mqtt.gammu_io, "write_gammurc") as write:
+            sm, imsi = sms2mqtt.init_modem(config, 0)
+        write.assert_not_called()
+        self.assertIsInstance(sm, modem_sim.SimulatedModem)
+        self.assertTrue(imsi.startswith("00101"))
+
+
+if __name__ == "__main__":
+    unittest.main()
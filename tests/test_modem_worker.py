@@ -0,0 +1,126 @@
+"""Tests for the modem worker thread: priority order, futures, dedupe, MQTT callbacks only enqueue."""
+
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+from modem_worker import ModemWorker  # noqa: E402
+
+
+class TestModemWorker(unittest.TestCase):
+    def setUp(self):
+        self.worker = ModemWorker(name="test-modem")
+
+    def tearDown(self):
+        self.worker.stop()
+
+    def test_future_carries_result_and_exception(self):
+        self.worker.start()
+        ok = self.worker.submit("send", lambda a, b: a + b, 2, 3)
+        self.assertEqual(ok.result(timeout=2), 5)
+
+        def boom():
+            raise RuntimeError("modem gone")
+
+        failed = self.worker.submit("send", boom)
+        with self.assertRaises(RuntimeError):
+            failed.result(timeout=2)
+
+    def test_higher_priority_runs_first(self):
+        order = []
+        gate = threading.Event()
+        # Queue everything before the thread starts so ordering is decided by priority only
+        self.worker.submit("status", order.append, "status")
+        self.worker.submit("receive", order.append, "receive")
+        self.worker.submit("send", order.append, "send-1")
+        self.worker.submit("send", order.append, "send-2")
+        last = self.worker.submit("control", order.append, "control")
+        self.worker.submit("status", gate.set)
+        self.worker.start()
+        last.result(timeout=2)
+        self.assertTrue(gate.wait(2))
+        self.assertEqual(order, ["control", "send-1", "send-2", "receive", "status"])
+
+    def test_submit_once_skips_while_queued(self):
+        first = self.worker.submit_once("receive", lambda: "scan")
+        self.assertIsNotNone(first)
+        self.assertIsNone(self.worker.submit_once("receive", lambda: "scan"))
+        self.worker.start()
+        self.assertEqual(first.result(timeout=2), "scan")
+
+    def test_stop_cancels_queued_commands(self):
+        started, gate = threading.Event(), threading.Event()
+        self.worker.start()
+        running = self.worker.submit("send", lambda: started.set() or gate.wait(2))
+        self.assertTrue(started.wait(2))
+        queued = self.worker.submit("status", lambda: "status")
+        self.worker.hold(("bulk",), lambda: 60.0)
+        held = self.worker.submit("bulk", lambda: "bulk")
+        stopper = threading.Thread(target=self.worker.stop)
+        stopper.start()
+        gate.set()
+        stopper.join(5)
+        self.assertTrue(running.result(timeout=2))
+        self.assertTrue(queued.cancelled())
+        self.assertTrue(held.cancelled())
+        self.assertEqual(self.worker.pending("status") + self.worker.pending("bulk"), 0)
+
+    def test_held_send_lets_other_kinds_run(self):
+        allowed = threading.Event()
+        order = []
+        self.worker.hold(("send",), lambda: 0.0 if allowed.is_set() else 0.05)
+        sent = self.worker.submit("send", order.append, "send")
+        self.worker.start()
+        self.worker.submit("receive", order.append, "receive").result(timeout=2)
+        self.assertEqual(order, ["receive"])
+        self.assertEqual(self.worker.qsize(), 1)
+        allowed.set()
+        sent.result(timeout=2)
+        self.assertEqual(order, ["receive", "send"])
+        again = self.worker.submit_once("receive", lambda: "scan")
+        self.assertIsNotNone(again)
+        again.result(timeout=2)
+
+
+class TestOnMqttMessageEnqueues(unittest.TestCase):
+    def test_send_runs_on_worker_not_in_callback(self):
+        worker = ModemWorker(name="test-modem")
+        ctx = SimpleNamespace(
+            config=SimpleNamespace(prefix="test", max_text_length=None),
+            gammusm=MagicMock(),
+            worker=worker,
+            send_failures=0,
+            last_send_failure=0.0,
+        )
+        client = MagicMock()
+        msg = SimpleNamespace(topic="test/send", payload=b'{"number": "+7900;+7901", "text": "Hi"}')
+
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            mqtt_layer.on_mqtt_message(client, ctx, msg)
+            # Worker not started yet: callback returned without touching the modem
+            gio.send_sms.assert_not_called()
+            self.assertEqual(worker.qsize(), 2)
+
+            worker.start()
+            done = worker.submit("status", lambda: None)
+            done.result(timeout=2)
+            worker.stop()
+
+        self.assertEqual(gio.send_sms.call_count, 2)
+        sent_topics = [c[0][0] for c in client.publish.call_args_list]
+        self.assertEqual(sent_topics, ["test/sent", "test/sent"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""Tests for opt-in MQTT v5: topic aliases, message expiry, response topics, shared groups."""
+
+import json
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+import sms2mqtt  # noqa: E402
+from topic_alias import TopicAliases  # noqa: E402
+
+
+def _ctx(**kwargs):
+    return SimpleNamespace(
+        config=SimpleNamespace(prefix="sms2mqtt", mqtt_shared_group=None), **kwargs
+    )
+
+
+def _msg(payload: bytes, **properties):
+    return SimpleNamespace(
+        topic="sms2mqtt/send", payload=payload, properties=SimpleNamespace(**properties)
+    )
+
+
+class TestTopicAliases(unittest.TestCase):
+    def test_announce_then_alias_only(self):
+        aliases = TopicAliases(["p/sent", "p/stats"], maximum=1)
+        self.assertEqual(aliases.resolve("p/sent"), ("p/sent", 1))
+        self.assertEqual(aliases.resolve("p/sent"), ("", 1))
+        # Broker maximum reached, and topics outside the table never get one
+        self.assertEqual(aliases.resolve("p/stats"), ("p/stats", None))
+        self.assertEqual(aliases.resolve("p/received"), ("p/received", None))
+
+    def test_reset_on_new_connection(self):
+        aliases = TopicAliases(["p/sent"], maximum=5)
+        aliases.resolve("p/sent")
+        aliases.reset(0)
+        self.assertEqual(aliases.resolve("p/sent"), ("p/sent", None))
+
+
+class TestMqttV5Publish(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(mqtt_layer, "mqtt", MagicMock())
+        self.mqtt = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mqtt.Properties.side_effect = lambda packet_type: SimpleNamespace()
+
+    def test_connack_maximum_enables_aliases(self):
+        ctx = _ctx(topic_aliases=TopicAliases(["sms2mqtt/sent"]))
+        client = MagicMock()
+        mqtt_layer.on_mqtt_connect(client, ctx, {}, 0, SimpleNamespace(TopicAliasMaximum=10))
+        mqtt_layer.publish_aliased(ctx, client, "sms2mqtt/sent", "a")
+        mqtt_layer.publish_aliased(ctx, client, "sms2mqtt/sent", "b")
+        (topic1, _), kw1 = client.publish.call_args_list[-2]
+        (topic2, _), kw2 = client.publish.call_args_list[-1]
+        self.assertEqual((topic1, kw1["properties"].TopicAlias), ("sms2mqtt/sent", 1))
+        self.assertEqual((topic2, kw2["properties"].TopicAlias), ("", 1))
+
+    def test_expired_request_is_not_sent(self):
+        client = MagicMock()
+        payload = b'{"number": "+7900", "text": "Code 1234"}'
+        with patch.object(mqtt_layer, "send_one") as send_one:
+            mqtt_layer.on_mqtt_message(client, _ctx(), _msg(payload, MessageExpiryInterval=0))
+            mqtt_layer.on_mqtt_message(client, _ctx(), _msg(payload, MessageExpiryInterval=60))
+        self.assertEqual(send_one.call_count, 1)
+        results = [json.loads(c[0][1])["result"] for c in client.publish.call_args_list]
+        self.assertEqual(results, ["error : expired", "success"])
+
+    def test_reply_on_response_topic_with_correlation_data(self):
+        client = MagicMock()
+        msg = _msg(
+            b'{"number": "+7900", "text": "Hi"}', ResponseTopic="app/replies", CorrelationData=b"42"
+        )
+        with patch.object(mqtt_layer, "send_one"):
+            mqtt_layer.on_mqtt_message(client, _ctx(), msg)
+        (sent_topic, _), _ = client.publish.call_args_list[0]
+        (reply_topic, payload), kwargs = client.publish.call_args_list[1]
+        self.assertEqual((sent_topic, reply_topic), ("sms2mqtt/sent", "app/replies"))
+        self.assertEqual(kwargs["properties"].CorrelationData, b"42")
+        self.assertEqual(json.loads(payload)["number"], "+7900")
+
+    def test_shared_group_subscribes_send_topics_only(self):
+        ctx = _ctx()
+        ctx.config.mqtt_shared_group = "bridges"
+        client = MagicMock()
+        mqtt_layer.on_mqtt_connect(client, ctx, {}, 0, None)
+        topics = [c[0][0] for c in client.subscribe.call_args_list]
+        self.assertEqual(
+            topics,
+            [
+                "$share/bridges/sms2mqtt/send",
+                "$share/bridges/sms2mqtt/send_bulk",
+                "sms2mqtt/control",
+            ],
+        )
+
+
+class TestMqttVersionConfig(unittest.TestCase):
+    def test_unknown_version_falls_back_to_311(self):
+        with patch.dict(os.environ, {"MQTT_VERSION": "4"}):
+            self.assertEqual(sms2mqtt.build_config_from_env().mqtt_version, "3.1.1")
+        with patch.dict(os.environ, {"MQTT_VERSION": "5", "MQTT_SHARED_GROUP": "g"}):
+            config = sms2mqtt.build_config_from_env()
+        self.assertEqual((config.mqtt_version, config.mqtt_shared_group), ("5", "g"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+"""Tests for the durable outbox: enqueue before send, batched completion, replay after restart."""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+from idempotency import IdempotencyStore  # noqa: E402
+from outbox import Outbox  # noqa: E402
+
+
+class TestOutbox(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "outbox.sqlite3")
+
+    def test_add_is_visible_after_reopen(self):
+        box = Outbox(self.path)
+        ids = box.add("send", [("1", "a"), ("2", "b")])
+        box.close()
+
+        reopened = Outbox(self.path)
+        rows = reopened.pending()
+        self.assertEqual([r[0] for r in rows], ids)
+        self.assertEqual([(r[3], r[4]) for r in rows], [("1", "a"), ("2", "b")])
+        reopened.close()
+
+    def test_done_is_batched_but_hidden_from_pending(self):
+        box = Outbox(self.path, flush_sec=3600)
+        ids = box.add("bulk", [("1", "a"), ("2", "a")], job_id="j")
+        box.done(ids[0])
+        # Not committed yet, but no longer pending or counted
+        self.assertEqual([r[0] for r in box.pending()], [ids[1]])
+        self.assertEqual(box.count(), 1)
+        box.flush_if_due()  # not due
+        self.assertEqual(box._done, [ids[0]])
+        box.close()  # close flushes
+        self.assertEqual([r[0] for r in Outbox(self.path).pending()], [ids[1]])
+
+    def test_enqueue_is_fully_synced(self):
+        box = Outbox(self.path)
+        self.addCleanup(box.close)
+        # 2 = FULL: the row is on disk before the broker gets its PUBACK
+        self.assertEqual(box._conn.execute("PRAGMA synchronous").fetchone()[0], 2)
+
+    def test_outbox_without_request_id_column_is_migrated(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute(
+            "CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL,"
+            " job_id TEXT, number TEXT NOT NULL, text TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO outbox (kind, number, text, created) VALUES ('send', '1', 'a', 0)"
+        )
+        conn.commit()
+        conn.close()
+        box = Outbox(self.path)
+        box.add("send", [("2", "b")], request_id="r1")
+        self.assertEqual([(r[3], r[5]) for r in box.pending()], [("1", None), ("2", "r1")])
+        box.close()
+
+
+class TestOutboxSendPath(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "outbox.sqlite3")
+
+    def _ctx(self, outbox):
+        return SimpleNamespace(
+            config=SimpleNamespace(prefix="test", max_text_length=None),
+            gammusm=MagicMock(),
+            outbox=outbox,
+            send_failures=0,
+            last_send_failure=0.0,
+        )
+
+    def test_send_is_enqueued_before_modem_and_removed_after(self):
+        box = Outbox(self.path)
+        ctx = self._ctx(box)
+        seen_pending = []
+
+        def fake_send(sm, number, text):
+            seen_pending.append([r[3] for r in box.pending()])
+
+        msg = SimpleNamespace(topic="test/send", payload=b'{"number": "1;2", "text": "Hi"}')
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.send_sms.side_effect = fake_send
+            mqtt_layer.on_mqtt_message(MagicMock(), ctx, msg)
+
+        self.assertEqual(seen_pending, [["1", "2"], ["2"]])
+        box.flush()
+        self.assertEqual(box.pending(), [])
+
+    def test_failed_send_still_completes_row(self):
+        box = Outbox(self.path)
+        ctx = self._ctx(box)
+        msg = SimpleNamespace(topic="test/send", payload=b'{"number": "1", "text": "Hi"}')
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.send_sms.side_effect = RuntimeError("modem")
+            mqtt_layer.on_mqtt_message(MagicMock(), ctx, msg)
+        self.assertEqual(box.count(), 0)
+
+    def test_replay_sends_leftovers_and_resumes_bulk_job(self):
+        box = Outbox(self.path)
+        box.add("send", [("1", "single")])
+        box.add("bulk", [("2", "bulk"), ("3", "bulk")], job_id="j9")
+        box.close()
+
+        box = Outbox(self.path)
+        ctx = self._ctx(box)
+        client = MagicMock()
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            replayed = mqtt_layer.replay_outbox(ctx, client)
+
+        self.assertEqual(replayed, 3)
+        self.assertEqual([c[0][1] for c in gio.send_sms.call_args_list], ["1", "2", "3"])
+        self.assertEqual(box.count(), 0)
+        results = [
+            json.loads(c[0][1])
+            for c in client.publish.call_args_list
+            if c[0][0] == "test/send_bulk_result"
+        ]
+        self.assertEqual(len(results), 1)
+        self.assertTrue(results[0]["resumed"])
+        self.assertEqual(results[0]["sent"], 2)
+
+    def test_replay_keeps_idempotency_key(self):
+        box = Outbox(self.path)
+        box.add("send", [("1", "Hi"), ("2", "Hi")], request_id="r1")
+        box.add("send", [("3", "Done")], request_id="r2")
+        box.close()
+
+        box = Outbox(self.path)
+        ctx = self._ctx(box)
+        ctx.idempotency = IdempotencyStore()
+        ctx.idempotency.begin("r2", 1)
+        ctx.idempotency.record("r2", {"result": "success", "number": "3"})
+        client = MagicMock()
+        msg = SimpleNamespace(
+            topic="test/send", payload=b'{"number": "1;2", "text": "Hi", "id": "r1"}'
+        )
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            mqtt_layer.replay_outbox(ctx, client)
+            # The original message redelivered after the restart
+            mqtt_layer.on_mqtt_message(client, ctx, msg)
+
+        self.assertEqual([c[0][1] for c in gio.send_sms.call_args_list], ["1", "2"])
+        self.assertEqual(box.count(), 0)
+        sent = [json.loads(c[0][1]) for c in client.publish.call_args_list]
+        self.assertEqual([s["id"] for s in sent], ["r1"] * 4)
+        self.assertEqual([s.get("duplicate") for s in sent], [None, None, True, True])
+
+    def test_replay_keeps_message_expiry(self):
+        box = Outbox(self.path)
+        ctx = self._ctx(box)
+        msg = SimpleNamespace(
+            topic="test/send",
+            payload=b'{"number": "1", "text": "OTP 1234"}',
+            properties=SimpleNamespace(MessageExpiryInterval=60),
+        )
+        with patch.object(mqtt_layer, "run_on_modem"):
+            # Accepted, then the bridge stops before the modem gets to it
+            mqtt_layer.on_mqtt_message(MagicMock(), ctx, msg)
+        self.assertAlmostEqual(box.pending()[0][6], time.time() + 60, delta=5)
+        box.add("send", [("2", "OTP 5678")], expires=time.time() - 1)
+        box.close()
+
+        box = Outbox(self.path)
+        ctx = self._ctx(box)
+        client = MagicMock()
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            mqtt_layer.replay_outbox(ctx, client)
+        self.assertEqual([c[0][1] for c in gio.send_sms.call_args_list], ["1"])
+        results = {
+            json.loads(c[0][1])["number"]: json.loads(c[0][1])["result"]
+            for c in client.publish.call_args_list
+        }
+        self.assertEqual(results, {"1": "success", "2": "error : expired"})
+        self.assertEqual(box.count(), 0)
+
+    def test_send_subscription_uses_qos_1_with_outbox(self):
+        client = MagicMock()
+        ctx = self._ctx(Outbox(self.path))
+        mqtt_layer.on_mqtt_connect(client, ctx, None, 0, None)
+        qos = {c[0][0]: c[1].get("qos") for c in client.subscribe.call_args_list}
+        self.assertEqual(qos["test/send"], 1)
+        self.assertEqual(qos["test/send_bulk"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Tests for the encode-once PDU template cache used by gammu_layer.send_sms."""
+
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so gammu_layer can be imported without gammu (e.g. in CI)
+sys.modules.setdefault("gammu", MagicMock())
+
+import gammu_layer  # noqa: E402
+
+
+def _fake_encode(smsinfo):
+    """Two-part template per text, like EncodeSMS for a long message."""
+    text = smsinfo["Entries"][0]["Buffer"]
+    return [{"Text": text, "Part": 1}, {"Text": text, "Part": 2}]
+
+
+class TestPduCache(unittest.TestCase):
+    def setUp(self):
+        gammu_layer.configure_pdu_cache(2)
+        patcher = patch.object(gammu_layer, "gammu")
+        self.gammu = patcher.start()
+        self.gammu.EncodeSMS.side_effect = _fake_encode
+        self.addCleanup(patcher.stop)
+        self.addCleanup(gammu_layer.configure_pdu_cache, 128)
+
+    def test_fan_out_encodes_once_and_patches_number(self):
+        sm = MagicMock()
+        for number in ("+7900", "+7901", "+7902"):
+            gammu_layer.send_sms(sm, number, "Alert")
+
+        self.assertEqual(self.gammu.EncodeSMS.call_count, 1)
+        sent = [c[0][0] for c in sm.SendSMS.call_args_list]
+        self.assertEqual([m["Number"] for m in sent], ["+7900"] * 2 + ["+7901"] * 2 + ["+7902"] * 2)
+        self.assertTrue(all(m["SMSC"] == {"Location": 1} for m in sent))
+        self.assertEqual(gammu_layer.pdu_cache_stats()["hits"], 2)
+        self.assertEqual(gammu_layer.pdu_cache_stats()["misses"], 1)
+
+    def test_cached_template_not_mutated(self):
+        sm = MagicMock()
+        gammu_layer.send_sms(sm, "+7900", "Alert")
+        template = gammu_layer._pdu_cache.get("Alert")
+        self.assertNotIn("Number", template[0])
+
+    def test_each_multipart_send_gets_fresh_concat_reference(self):
+        def encode(smsinfo):
+            return [
+                {
+                    "Text": "x",
+                    "UDH": {"Type": "ConcatenatedMessages", "Text": bytes(t), "ID8bit": 7},
+                }
+                for t in ([5, 0, 3, 7, 2, 1], [5, 0, 3, 7, 2, 2])
+            ]
+
+        self.gammu.EncodeSMS.side_effect = encode
+        sm = MagicMock()
+        gammu_layer.send_sms(sm, "+7900", "Long")
+        gammu_layer.send_sms(sm, "+7901", "Long")
+        udhs = [c[0][0]["UDH"] for c in sm.SendSMS.call_args_list]
+        refs = [u["Text"][3] for u in udhs]
+        self.assertEqual([u["ID8bit"] for u in udhs], refs)
+        self.assertEqual(refs[0], refs[1])
+        self.assertEqual(refs[2], refs[3])
+        self.assertNotEqual(refs[0], refs[2])
+        self.assertEqual([u["Text"][5] for u in udhs], [1, 2, 1, 2])
+        self.assertEqual(gammu_layer._pdu_cache.get("Long")[0]["UDH"]["Text"][3], 7)
+
+    def test_concat_reference_16bit(self):
+        part = {"UDH": {"Type": "ConcatenatedMessages16bit", "Text": bytes([6, 8, 4, 0, 7, 2, 1])}}
+        patched = gammu_layer.with_concat_reference(part, 0x1234)
+        self.assertEqual(patched["UDH"]["Text"], bytes([6, 8, 4, 0x12, 0x34, 2, 1]))
+        self.assertEqual(patched["UDH"]["ID16bit"], 0x1234)
+
+    def test_lru_evicts_least_recently_used(self):
+        sm = MagicMock()
+        gammu_layer.send_sms(sm, "1", "a")
+        gammu_layer.send_sms(sm, "1", "b")
+        gammu_layer.send_sms(sm, "1", "a")  # a is now most recent
+        gammu_layer.send_sms(sm, "1", "c")  # evicts b
+        gammu_layer.send_sms(sm, "1", "a")
+        gammu_layer.send_sms(sm, "1", "b")
+        stats = gammu_layer.pdu_cache_stats()
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(self.gammu.EncodeSMS.call_count, 4)
+        self.assertEqual(stats["hits"], 2)
+
+    def test_size_zero_disables_cache(self):
+        gammu_layer.configure_pdu_cache(0)
+        sm = MagicMock()
+        gammu_layer.send_sms(sm, "1", "a")
+        gammu_layer.send_sms(sm, "2", "a")
+        self.assertEqual(self.gammu.EncodeSMS.call_count, 2)
+        self.assertEqual(gammu_layer.pdu_cache_stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""Tests for the received publish pipeline: inflight window, delete after PUBACK."""
+
+import sys
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+from publish_tracker import PublishTracker  # noqa: E402
+
+
+def _sms(location):
+    return [
+        {
+            "UDH": {"Type": "NoUDH"},
+            "DateTime": "2026-02-25 12:00:00",
+            "Number": "900",
+            "Text": f"Test {location}",
+            "Location": location,
+        }
+    ]
+
+
+def _ctx(max_inflight=20):
+    ctx = SimpleNamespace(
+        config=SimpleNamespace(prefix="test"),
+        client=MagicMock(),
+        gammusm=MagicMock(),
+        stuck_sms_detected=False,
+        last_stuck_sms=[],
+        last_stuck_locations=None,
+        publish_tracker=PublishTracker(max_inflight, ack_timeout_sec=0),
+    )
+    mids = iter(range(1, 100))
+    ctx.client.publish.side_effect = lambda *a, **kw: MagicMock(rc=0, mid=next(mids))
+    return ctx
+
+
+class TestPublishTracker(unittest.TestCase):
+    def test_ack_before_track_is_claimed(self):
+        tracker = PublishTracker()
+        tracker.ack(7)
+        tracker.track(0, 7, [1], "delete 1")
+        self.assertEqual(tracker.inflight(0), 0)
+        self.assertEqual(tracker.take_acked(0), ["delete 1"])
+
+    def test_refused_publish_releases_keys_without_action(self):
+        tracker = PublishTracker()
+        tracker.track(0, 1, [5], "delete 5")
+        self.assertTrue(tracker.is_inflight(0, 5))
+        tracker.ack(1, failed=True)
+        self.assertFalse(tracker.is_inflight(0, 5))
+        self.assertEqual(tracker.take_acked(0), [])
+        self.assertEqual(tracker.stats(), {"inflight": 0, "acked": 0, "failed": 1})
+        self.assertEqual([tracker.take_released(0), tracker.take_released(0)], [True, False])
+
+    def test_expire_releases_old_entries_under_the_lock(self):
+        now = [0.0]
+        tracker = PublishTracker(max_age_sec=10, clock=lambda: now[0])
+        tracker.track(0, 1, [5], "delete 5")
+        tracker.track(0, 2, [6], "delete 6")
+        now[0] = 11.0
+        with tracker._cond:
+            # Reentrant, as when wait() expires entries
+            tracker.expire(0)
+        tracker.ack(2)
+        self.assertEqual(tracker.inflight(0), 0)
+        self.assertEqual(tracker.take_acked(0), [])
+        self.assertTrue(tracker.take_released(0))
+
+
+class TestReceivePipeline(unittest.TestCase):
+    def test_delete_waits_for_puback_and_is_not_republished(self):
+        ctx = _ctx()
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = [_sms(1), _sms(2)]
+            gio.link_sms.side_effect = lambda allsms: allsms
+            mqtt_layer.loop_sms_receive(ctx)
+            gio.delete_sms.assert_not_called()
+            mqtt_layer.loop_sms_receive(ctx)
+            self.assertEqual(ctx.client.publish.call_count, 2)
+
+            mqtt_layer.on_mqtt_publish(ctx.client, ctx, 1, 0, None)
+            mqtt_layer.on_mqtt_publish(ctx.client, ctx, 2, 0, None)
+            gio.fetch_sms_batch.return_value = []
+            mqtt_layer.loop_sms_receive(ctx)
+        deleted = [c[0][2] for c in gio.delete_sms.call_args_list]
+        self.assertEqual(deleted, [1, 2])
+        self.assertEqual(ctx.client.publish.call_count, 2)
+
+    def test_inflight_window_bounds_publishes_per_pass(self):
+        ctx = _ctx(max_inflight=2)
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = [_sms(1), _sms(2), _sms(3)]
+            gio.link_sms.side_effect = lambda allsms: allsms
+            mqtt_layer.loop_sms_receive(ctx)
+        self.assertEqual(ctx.client.publish.call_count, 2)
+        self.assertEqual(ctx.publish_tracker.inflight(0), 2)
+
+    def test_full_window_does_not_wait_and_rescans_after_acks(self):
+        ctx = _ctx(max_inflight=1)
+        ctx.publish_tracker.ack_timeout_sec = 60
+        ctx.incoming_sms_pending = False
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = [_sms(1), _sms(2)]
+            gio.link_sms.side_effect = lambda allsms: allsms
+            started = time.monotonic()
+            mqtt_layer.loop_sms_receive(ctx)
+            self.assertLess(time.monotonic() - started, 1)
+            self.assertFalse(ctx.incoming_sms_pending)
+            mqtt_layer.on_mqtt_publish(ctx.client, ctx, 1, 0, None)
+            mqtt_layer._run_acked(ctx)
+        self.assertEqual([c[0][2] for c in gio.delete_sms.call_args_list], [1])
+        self.assertTrue(ctx.incoming_sms_pending)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Tests for the per-modem send token bucket, AIMD tuning and the stats topic."""
+
+import json
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+from rate_limit import TokenBucket  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, sec):
+        self.now += sec
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_spaced_to_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate_per_min=30, burst=3, clock=clock)
+        waits = [bucket.acquire(sleep=clock.sleep) for _ in range(5)]
+        self.assertEqual(waits[:3], [0.0, 0.0, 0.0])
+        # 30/min = one token every 2 s
+        self.assertAlmostEqual(waits[3], 2.0)
+        self.assertAlmostEqual(waits[4], 2.0)
+        self.assertAlmostEqual(clock.now, 4.0)
+
+    def test_wait_time_does_not_take_tokens(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate_per_min=30, burst=1, clock=clock)
+        self.assertEqual(bucket.wait_time(), 0.0)
+        self.assertEqual(bucket.wait_time(), 0.0)
+        bucket.acquire(sleep=clock.sleep)
+        self.assertAlmostEqual(bucket.wait_time(), 2.0)
+        clock.now = 1.5
+        self.assertAlmostEqual(bucket.wait_time(), 0.5)
+
+    def test_idle_refills_up_to_burst_only(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate_per_min=60, burst=2, clock=clock)
+        bucket.acquire(sleep=clock.sleep)
+        bucket.acquire(sleep=clock.sleep)
+        clock.now += 3600
+        waits = [bucket.acquire(sleep=clock.sleep) for _ in range(3)]
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 1.0)
+
+    def test_adaptive_decreases_on_error_and_slow_sends(self):
+        bucket = TokenBucket(
+            rate_per_min=20, adaptive=True, min_rate_per_min=4, latency_target_sec=5
+        )
+        bucket.record(False, 1.0)
+        self.assertEqual(bucket.rate, 10)
+        bucket.record(True, 9.0)
+        self.assertEqual(bucket.rate, 5)
+        bucket.record(False, 1.0)
+        self.assertEqual(bucket.rate, 4)
+
+    def test_adaptive_recovers_additively_to_max(self):
+        bucket = TokenBucket(rate_per_min=20, adaptive=True, min_rate_per_min=4)
+        bucket.record(False, 1.0)
+        for _ in range(9):
+            bucket.record(True, 1.0)
+        self.assertAlmostEqual(bucket.rate, 19.0)
+        bucket.record(True, 1.0)
+        bucket.record(True, 1.0)
+        self.assertEqual(bucket.rate, 20)
+
+    def test_non_adaptive_ignores_outcomes(self):
+        bucket = TokenBucket(rate_per_min=20)
+        bucket.record(False, 99.0)
+        self.assertEqual(bucket.rate, 20)
+
+
+class TestSendPathUsesLimiter(unittest.TestCase):
+    def test_send_one_acquires_and_records(self):
+        limiter = MagicMock()
+        limiter.acquire.return_value = 0.0
+        ctx = SimpleNamespace(
+            gammusm=MagicMock(), send_limiter=limiter, send_failures=0, last_send_failure=0.0
+        )
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.send_sms.side_effect = [None, RuntimeError("CMS ERROR")]
+            mqtt_layer.send_one(ctx, "1", "a")
+            with self.assertRaises(RuntimeError):
+                mqtt_layer.send_one(ctx, "2", "b")
+        self.assertEqual(limiter.acquire.call_count, 2)
+        outcomes = [c[0][0] for c in limiter.record.call_args_list]
+        self.assertEqual(outcomes, [True, False])
+        self.assertEqual(ctx.send_failures, 1)
+
+    def test_publish_stats_reports_rate_and_backlog(self):
+        worker = MagicMock()
+        worker.is_alive.return_value = True
+        worker.pending.side_effect = lambda kind: {"send": 2, "bulk": 40}[kind]
+        ctx = SimpleNamespace(
+            config=SimpleNamespace(prefix="test"),
+            client=MagicMock(),
+            index=0,
+            imsi="250010000000001",
+            worker=worker,
+            send_limiter=TokenBucket(rate_per_min=12, burst=2),
+            send_failures=0,
+            last_send_failure=0.0,
+        )
+        mqtt_layer.publish_stats(ctx)
+        topic, payload = ctx.client.publish.call_args[0]
+        self.assertEqual(topic, "test/stats")
+        stats = json.loads(payload)
+        (modem,) = stats["modems"]
+        self.assertEqual(modem["backlog"], 42)
+        self.assertEqual(modem["send_rate"]["rate_per_min"], 12)
+        self.assertIn("hits", stats["pdu_cache"])
+
+
+if __name__ == "__main__":
+    unittest.main()
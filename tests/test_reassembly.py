@@ -0,0 +1,151 @@
+"""Tests for in-memory multipart reassembly: immediate delete, journal restore, expiry."""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+from reassembly import Reassembler, part_key  # noqa: E402
+
+
+def _part(location, number, all_parts, text, ref=7, sender="+100"):
+    return {
+        "Location": location,
+        "Number": sender,
+        "DateTime": "2026-01-01 10:00:00",
+        "Text": text,
+        "UDH": {
+            "Type": "ConcatenatedMessages",
+            "ID8bit": ref,
+            "ID16bit": -1,
+            "PartNumber": number,
+            "AllParts": all_parts,
+        },
+    }
+
+
+class TestReassembler(unittest.TestCase):
+    def test_groups_by_sender_and_reference(self):
+        r = Reassembler()
+        self.assertNotEqual(part_key(_part(1, 1, 2, "a")), part_key(_part(2, 1, 2, "a", ref=8)))
+        self.assertNotEqual(
+            part_key(_part(1, 1, 2, "a")), part_key(_part(2, 1, 2, "a", sender="+200"))
+        )
+        g = r.add(_part(1, 2, 2, "world"))
+        self.assertFalse(r.is_complete(g))
+        g = r.add(_part(2, 1, 2, "hello "))
+        self.assertTrue(r.is_complete(g))
+        self.assertEqual(r.text(g), "hello world")
+        r.discard(g)
+        self.assertEqual(r.stats(), {"groups": 0, "parts": 0})
+
+    def test_journal_restores_incomplete_groups(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "multipart.db")
+            r = Reassembler(path)
+            r.add(_part(1, 1, 3, "a"), now=100.0)
+            r.add(_part(2, 2, 3, "b"), now=105.0)
+            r.close()
+
+            restored = Reassembler(path, timeout_sec=50)
+            (group,) = restored.incomplete()
+            self.assertEqual(sorted(group.parts), [1, 2])
+            self.assertEqual(group.first_seen, 100.0)
+            self.assertEqual(restored.expired(now=149.0), [])
+            self.assertEqual(restored.expired(now=150.0), [group])
+            restored.discard(group)
+            restored.close()
+            self.assertEqual(Reassembler(path).stats()["groups"], 0)
+
+    def test_journal_commits_are_fully_synced(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            r = Reassembler(os.path.join(tmp, "multipart.db"))
+            self.addCleanup(r.close)
+            # 2 = FULL: journaled parts survive power loss once deleted from the SIM
+            self.assertEqual(r._conn.execute("PRAGMA synchronous").fetchone()[0], 2)
+
+    def test_add_after_close_raises(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            r = Reassembler(os.path.join(tmp, "multipart.db"))
+            r.close()
+            # Not kept in memory only: the caller leaves the part on the SIM
+            with self.assertRaises(sqlite3.ProgrammingError):
+                r.add(_part(1, 1, 2, "a"))
+
+
+class TestLoopSmsReceiveWithReassembler(unittest.TestCase):
+    def _ctx(self, timeout_sec=3600.0):
+        client = MagicMock()
+        client.publish.return_value = SimpleNamespace(rc=0)
+        return SimpleNamespace(
+            config=SimpleNamespace(prefix="test"),
+            gammusm=MagicMock(),
+            client=client,
+            reassembler=Reassembler(timeout_sec=timeout_sec),
+            stuck_sms_detected=False,
+            last_stuck_sms=[],
+            last_stuck_locations=None,
+        )
+
+    def _published(self, ctx, suffix):
+        return [
+            json.loads(c[0][1])
+            for c in ctx.client.publish.call_args_list
+            if c[0][0] == f"test/{suffix}"
+        ]
+
+    def test_parts_deleted_on_arrival_and_published_when_complete(self):
+        ctx = self._ctx()
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = [[_part(1, 1, 2, "hello ")]]
+            mqtt_layer.loop_sms_receive(ctx)
+            gio.delete_sms.assert_called_once_with(ctx.gammusm, 0, 1)
+            gio.link_sms.assert_not_called()
+            self.assertTrue(ctx.stuck_sms_detected)
+            self.assertEqual(self._published(ctx, "received"), [])
+            (stuck,) = self._published(ctx, "stuck_status")
+            self.assertEqual(stuck["stored"], "memory")
+
+            gio.fetch_sms_batch.return_value = [[_part(2, 2, 2, "world")]]
+            mqtt_layer.loop_sms_receive(ctx)
+        (received,) = self._published(ctx, "received")
+        self.assertEqual(received["text"], "hello world")
+        self.assertFalse(ctx.stuck_sms_detected)
+
+    def test_expired_fragment_published_as_partial(self):
+        ctx = self._ctx(timeout_sec=0)
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = [[_part(1, 1, 3, "only this")]]
+            mqtt_layer.loop_sms_receive(ctx)
+        (received,) = self._published(ctx, "received")
+        self.assertTrue(received["partial"])
+        self.assertEqual((received["received_parts"], received["expected_parts"]), (1, 3))
+        self.assertEqual(ctx.reassembler.stats()["groups"], 0)
+
+    def test_delete_stuck_sms_flushes_memory_groups(self):
+        ctx = self._ctx()
+        ctx.reassembler.add(_part(4, 1, 2, "half"))
+        client = MagicMock()
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            mqtt_layer.delete_stuck_sms(ctx, client)
+            gio.delete_sms.assert_not_called()
+        response = json.loads(client.publish.call_args[0][1])
+        self.assertEqual(response, {"result": "deleted", "deleted_locations": [4]})
+        self.assertTrue(self._published(ctx, "received")[0]["partial"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Tests for received-SMS fingerprints: no republish when only the delete failed."""
+
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+from fingerprints import FingerprintCache, sms_fingerprint  # noqa: E402
+from reassembly import Reassembler  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _sms(location=1, text="Test", **udh):
+    return {
+        "UDH": {"Type": "NoUDH", "AllParts": -1, **udh},
+        "DateTime": "2026-02-25 12:00:00",
+        "Number": "900",
+        "Text": text,
+        "Location": location,
+    }
+
+
+def _ctx(**kwargs):
+    ctx = SimpleNamespace(
+        config=SimpleNamespace(prefix="test"),
+        client=MagicMock(),
+        gammusm=MagicMock(),
+        stuck_sms_detected=False,
+        last_stuck_sms=[],
+        last_stuck_locations=None,
+        received_fingerprints=FingerprintCache(),
+        **kwargs,
+    )
+    ctx.client.publish.return_value = MagicMock(rc=0, mid=1)
+    return ctx
+
+
+class TestFingerprintCache(unittest.TestCase):
+    def test_key_covers_sender_time_text_and_location(self):
+        keys = {sms_fingerprint(s) for s in (_sms(), _sms(location=2), _sms(text="Other"))}
+        self.assertEqual(len(keys), 3)
+
+    def test_bounded_by_size_and_ttl(self):
+        clock = Clock()
+        cache = FingerprintCache(max_size=2, ttl_sec=10, clock=clock)
+        for fp in ("a", "b", "c"):
+            cache.add(fp)
+        self.assertEqual([cache.seen(fp) for fp in ("a", "b", "c")], [False, True, True])
+        clock.now = 11
+        self.assertFalse(cache.seen("c"))
+
+
+class TestReceiveDeleteRetry(unittest.TestCase):
+    def test_failed_delete_is_retried_without_republish(self):
+        ctx = _ctx()
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = [[_sms()]]
+            gio.link_sms.return_value = [[_sms()]]
+            gio.delete_sms.side_effect = [RuntimeError("busy"), RuntimeError("busy"), None]
+            for _ in range(3):
+                mqtt_layer.loop_sms_receive(ctx)
+        self.assertEqual(ctx.client.publish.call_count, 1)
+        self.assertEqual(gio.delete_sms.call_count, 3)
+        self.assertEqual(ctx.received_fingerprints.stats(), {"held": 0, "suppressed": 2})
+
+    def test_reassembler_part_not_added_again_after_failed_delete(self):
+        ctx = _ctx(reassembler=Reassembler())
+        parts = [_sms(10, "a", Type="ConcatenatedMessages", AllParts=2, PartNumber=1, ID8bit=5)]
+        parts.append(_sms(11, "b", Type="ConcatenatedMessages", AllParts=2, PartNumber=2, ID8bit=5))
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = [[p] for p in parts]
+            gio.delete_sms.side_effect = [None, RuntimeError("busy"), None]
+            mqtt_layer.loop_sms_receive(ctx)
+            gio.fetch_sms_batch.return_value = [[parts[1]]]
+            mqtt_layer.loop_sms_receive(ctx)
+        topics = [c[0][0] for c in ctx.client.publish.call_args_list]
+        self.assertEqual(topics.count("test/received"), 1)
+        self.assertEqual(ctx.reassembler.stats()["groups"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
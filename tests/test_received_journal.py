@@ -0,0 +1,173 @@
+"""Tests for the received journal: draining the modem while MQTT is down, replay on reconnect."""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+import sms2mqtt  # noqa: E402
+from publish_tracker import PublishTracker  # noqa: E402
+from received_journal import ReceivedJournal  # noqa: E402
+from scheduler import AdaptiveInterval, PollScheduler  # noqa: E402
+
+
+def _sms(location):
+    return [
+        {
+            "UDH": {"Type": "NoUDH"},
+            "DateTime": "2026-02-25 12:00:00",
+            "Number": "900",
+            "Text": f"Test {location}",
+            "Location": location,
+        }
+    ]
+
+
+def _journal_path(test):
+    fd, path = tempfile.mkstemp(suffix=".sqlite3")
+    os.close(fd)
+    test.addCleanup(os.unlink, path)
+    return path
+
+
+def _ctx(journal, tracker=None):
+    ctx = SimpleNamespace(
+        config=SimpleNamespace(prefix="test"),
+        client=MagicMock(),
+        gammusm=MagicMock(),
+        mqtt_connected=False,
+        stuck_sms_detected=False,
+        last_stuck_sms=[],
+        last_stuck_locations=None,
+        received_journal=journal,
+        publish_tracker=tracker,
+    )
+    mids = iter(range(1, 100))
+    ctx.client.publish.side_effect = lambda *a, **kw: MagicMock(rc=0, mid=next(mids))
+    return ctx
+
+
+def _received_texts(ctx):
+    return [c[0][1] for c in ctx.client.publish.call_args_list if c[0][0] == "test/received"]
+
+
+class TestReceivedJournal(unittest.TestCase):
+    def test_cap_refuses_and_rows_survive_restart(self):
+        path = _journal_path(self)
+        journal = ReceivedJournal(path, max_entries=2)
+        self.assertTrue(journal.append("a", "single"))
+        self.assertTrue(journal.append(b"b", "multipart"))
+        self.assertFalse(journal.append("c", "single"))
+        journal.close()
+        journal = ReceivedJournal(path, max_entries=2)
+        rows = journal.pending()
+        self.assertEqual([(r[1], r[2]) for r in rows], [("a", "single"), (b"b", "multipart")])
+        journal.remove([rows[0][0]])
+        self.assertEqual(journal.stats(), {"pending": 1, "refused": 0})
+        journal.close()
+
+    def test_commits_are_fully_synced(self):
+        journal = ReceivedJournal(_journal_path(self))
+        self.addCleanup(journal.close)
+        # 2 = FULL: appended rows survive power loss once the SMS is gone from the SIM
+        self.assertEqual(journal._conn.execute("PRAGMA synchronous").fetchone()[0], 2)
+
+
+class TestStoreAndForward(unittest.TestCase):
+    def test_disconnected_drains_modem_into_journal(self):
+        ctx = _ctx(ReceivedJournal(_journal_path(self)))
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = [_sms(1), _sms(2)]
+            gio.link_sms.side_effect = lambda allsms: allsms
+            mqtt_layer.loop_sms_receive(ctx)
+        self.assertEqual(_received_texts(ctx), [])
+        self.assertEqual([c[0][2] for c in gio.delete_sms.call_args_list], [1, 2])
+        self.assertEqual(len(ctx.received_journal), 2)
+
+    def test_full_journal_leaves_sms_on_modem(self):
+        ctx = _ctx(ReceivedJournal(_journal_path(self), max_entries=1))
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = [_sms(1), _sms(2)]
+            gio.link_sms.side_effect = lambda allsms: allsms
+            mqtt_layer.loop_sms_receive(ctx)
+        self.assertEqual([c[0][2] for c in gio.delete_sms.call_args_list], [1])
+
+    def test_replay_in_order_before_new_sms_and_removed_after_puback(self):
+        ctx = _ctx(ReceivedJournal(_journal_path(self)), PublishTracker(ack_timeout_sec=0))
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.link_sms.side_effect = lambda allsms: allsms
+            gio.fetch_sms_batch.return_value = [_sms(1), _sms(2)]
+            mqtt_layer.loop_sms_receive(ctx)
+
+            ctx.mqtt_connected = True
+            gio.fetch_sms_batch.return_value = [_sms(3)]
+            mqtt_layer.loop_sms_receive(ctx)
+            # Journaled SMS still awaiting PUBACK: the new one queues behind them
+            self.assertEqual(len(_received_texts(ctx)), 2)
+            self.assertEqual(len(ctx.received_journal), 3)
+
+            for mid in (1, 2):
+                mqtt_layer.on_mqtt_publish(ctx.client, ctx, mid, 0, None)
+            gio.fetch_sms_batch.return_value = []
+            mqtt_layer.loop_sms_receive(ctx)
+            mqtt_layer.on_mqtt_publish(ctx.client, ctx, 3, 0, None)
+            mqtt_layer.loop_sms_receive(ctx)
+        texts = [json.loads(t)["text"] for t in _received_texts(ctx)]
+        self.assertEqual(texts, ["Test 1", "Test 2", "Test 3"])
+        self.assertEqual(len(ctx.received_journal), 0)
+
+    def test_polling_replays_at_window_rate(self):
+        ctx = _ctx(ReceivedJournal(_journal_path(self)), PublishTracker(20, ack_timeout_sec=0))
+        for i in range(60):
+            ctx.received_journal.append(json.dumps({"text": f"Test {i}"}), "single")
+        ctx.mqtt_connected = True
+        ctx.receive_poller = AdaptiveInterval(0.25, 5)
+        acked = 0
+        intervals = []
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = []
+            while len(ctx.received_journal) and len(intervals) < 10:
+                mqtt_layer.poll_receive(ctx)
+                intervals.append(ctx.receive_poller.interval)
+                for mid in range(acked + 1, ctx.client.publish.call_count + 1):
+                    mqtt_layer.on_mqtt_publish(ctx.client, ctx, mid, 0, None)
+                acked = ctx.client.publish.call_count
+        # Window-limited passes count as activity; back-off starts once the journal is drained
+        self.assertEqual(intervals, [0.25, 0.25, 0.25, 0.5])
+        self.assertEqual(len(ctx.received_journal), 0)
+
+
+class TestTimerWhileDisconnected(unittest.TestCase):
+    def test_receive_keeps_running_with_journal(self):
+        ctx = SimpleNamespace(
+            config=SimpleNamespace(stats_interval_sec=0),
+            mqtt_connected=False,
+            wake=threading.Event(),
+            outbox=None,
+            event_receive=False,
+            last_receive_scan=0.0,
+            receive_poller=AdaptiveInterval(0.25, 5),
+            received_journal=MagicMock(),
+            worker=MagicMock(),
+        )
+        ctx.worker.submit_once.return_value = None
+        ctx.modems = [ctx]
+        sms2mqtt.timer_step(ctx, PollScheduler(), 100.0)
+        ctx.worker.submit_once.assert_called_once_with("receive", mqtt_layer.poll_receive, ctx)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+"""Tests for the threaded runtime: timer_step deadlines and wake-ups from MQTT and workers."""
+
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so sms2mqtt can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+import sms2mqtt  # noqa: E402
+from modem_worker import ModemWorker  # noqa: E402
+from scheduler import AdaptiveInterval, PollScheduler  # noqa: E402
+
+
+def _ctx(stats_interval_sec=0):
+    ctx = SimpleNamespace(
+        config=SimpleNamespace(stats_interval_sec=stats_interval_sec, outbox_flush_sec=1.0),
+        mqtt_connected=True,
+        wake=threading.Event(),
+        last_stats_publish=0.0,
+        outbox=None,
+        event_receive=False,
+        last_receive_scan=0.0,
+        receive_poller=AdaptiveInterval(0.25, 5),
+        worker=MagicMock(),
+    )
+    ctx.worker.submit_once.return_value = None
+    ctx.modems = [ctx]
+    return ctx
+
+
+class TestTimerStep(unittest.TestCase):
+    def test_waits_until_earliest_deadline(self):
+        ctx = _ctx()
+        ctx.worker.submit_once.return_value = MagicMock()
+        ctx.receive_poller.interval = 4.0
+        scheduler = PollScheduler(rand=lambda: 0.0)
+        scheduler.add("signal", 15, now=100.0)
+        wait = sms2mqtt.timer_step(ctx, scheduler, 100.0)
+        calls = [c[0][:2] for c in ctx.worker.submit_once.call_args_list]
+        self.assertEqual(
+            calls,
+            [("receive", mqtt_layer.poll_receive), ("status", mqtt_layer.poll_status)],
+        )
+        self.assertEqual(wait, 4.0)
+
+    def test_status_stays_due_while_earlier_poll_is_busy(self):
+        ctx = _ctx()
+        ctx.receive_poller.interval = 4.0
+        scheduler = PollScheduler(rand=lambda: 0.0)
+        scheduler.add("signal", 15, now=100.0)
+        wait = sms2mqtt.timer_step(ctx, scheduler, 100.0)
+        self.assertEqual(wait, mqtt_layer.STATUS_BUSY_RETRY_SEC)
+        self.assertEqual(scheduler.next_due(), 100.0)
+        ctx.worker.submit_once.return_value = MagicMock()
+        sms2mqtt.timer_step(ctx, scheduler, 101.0)
+        self.assertEqual(scheduler.next_due(), 116.0)
+
+    def test_disconnected_skips_modem_jobs(self):
+        ctx = _ctx()
+        ctx.mqtt_connected = False
+        scheduler = PollScheduler()
+        scheduler.add("signal", 15, now=0.0)
+        wait = sms2mqtt.timer_step(ctx, scheduler, 100.0)
+        ctx.worker.submit_once.assert_not_called()
+        self.assertEqual(wait, sms2mqtt.MAX_TIMER_WAIT_SEC)
+
+    def test_stats_published_on_schedule(self):
+        ctx = _ctx(stats_interval_sec=60)
+        ctx.mqtt_connected = False
+        with patch.object(mqtt_layer, "publish_stats") as publish:
+            self.assertEqual(sms2mqtt.timer_step(ctx, PollScheduler(), 30.0), 30.0)
+            publish.assert_not_called()
+            self.assertEqual(sms2mqtt.timer_step(ctx, PollScheduler(), 60.0), 60.0)
+            publish.assert_called_once_with(ctx)
+
+
+class TestWakeUps(unittest.TestCase):
+    def test_finished_scan_wakes_timer_loop(self):
+        ctx = _ctx()
+        future = Future()
+        ctx.worker.submit_once.return_value = future
+        sms2mqtt.schedule_receive(ctx, 10.0, ctx.wake)
+        self.assertFalse(ctx.wake.is_set())
+        future.set_result(None)
+        self.assertTrue(ctx.wake.is_set())
+
+    def test_event_ticks_keep_their_cadence(self):
+        ctx = _ctx()
+        ctx.event_receive = True
+        ctx.worker = ModemWorker(name="test-modem")
+        ctx.worker.start()
+        self.addCleanup(ctx.worker.stop)
+        ticks = []
+        scheduler = PollScheduler()
+        with patch.object(mqtt_layer, "receive_tick", side_effect=lambda c, now: ticks.append(now)):
+            # The run_threaded loop: each finished tick wakes it early
+            deadline = time.monotonic() + 0.5
+            while time.monotonic() < deadline:
+                ctx.wake.clear()
+                ctx.wake.wait(sms2mqtt.timer_step(ctx, scheduler, time.time()))
+        self.assertGreater(len(ticks), 2)
+        self.assertLessEqual(len(ticks), 0.5 / sms2mqtt.EVENT_TICK_SEC + 2)
+
+    def test_connect_wakes_timer_loop(self):
+        ctx = SimpleNamespace(
+            config=SimpleNamespace(prefix="test"),
+            mqtt_connected=False,
+            wake=threading.Event(),
+            outbox=None,
+        )
+        mqtt_layer.on_mqtt_connect(MagicMock(), ctx, None, 0, None)
+        self.assertTrue(ctx.mqtt_connected)
+        self.assertTrue(ctx.wake.is_set())
+
+    def test_stores_closed_only_after_workers_stop(self):
+        ctx = _ctx()
+        ctx.outbox = MagicMock()
+        ctx.idempotency = None
+        ctx.reassembler = MagicMock()
+        ctx.received_journal = None
+        calls = []
+        ctx.worker.stop.side_effect = lambda: calls.append("stop") or True
+        ctx.outbox.close.side_effect = lambda: calls.append("close")
+        sms2mqtt.close_stores(ctx)
+        self.assertEqual(calls, ["stop", "close"])
+
+        ctx.worker.stop.side_effect = None
+        ctx.worker.stop.return_value = False
+        ctx.reassembler.reset_mock()
+        sms2mqtt.close_stores(ctx)
+        ctx.reassembler.close.assert_not_called()
+
+    def test_shutdown_stops_main_loop_without_touching_outbox(self):
+        ctx = _ctx()
+        ctx.config.prefix = "test"
+        ctx.client = MagicMock()
+        ctx.outbox = MagicMock()
+        ctx.stopping = False
+        mqtt_layer.shutdown(ctx=ctx)
+        self.assertTrue(ctx.stopping)
+        self.assertTrue(ctx.wake.is_set())
+        ctx.outbox.flush.assert_not_called()
+        ctx.outbox = None
+        ctx.config.host, ctx.config.port, ctx.config.receive_mode = "broker", 1883, "poll"
+        sms2mqtt.run_threaded(ctx, PollScheduler())
+        ctx.client.loop_start.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Tests for periodic polling: per-metric status scheduler and adaptive receive interval."""
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so sms2mqtt can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+import sms2mqtt  # noqa: E402
+from scheduler import AdaptiveInterval, PollScheduler  # noqa: E402
+
+
+class TestPollScheduler(unittest.TestCase):
+    def test_each_job_runs_at_its_own_interval(self):
+        s = PollScheduler(rand=lambda: 0.5)
+        s.add("signal", 15, now=0)
+        s.add("battery", 60, now=0)
+        runs = {"signal": 0, "battery": 0}
+        for t in range(0, 120):
+            for name in s.due(t):
+                runs[name] += 1
+        self.assertEqual(runs, {"signal": 8, "battery": 2})
+
+    def test_jitter_spreads_start_and_interval(self):
+        s = PollScheduler(rand=lambda: 1.0)
+        s.add("signal", 10, jitter=0.2, now=0)
+        self.assertEqual(s.next_due(), 2.0)
+        self.assertEqual(s.due(2.0), ["signal"])
+        self.assertEqual(s.next_due(), 14.0)
+        self.assertEqual(s.due(13.9), [])
+
+    def test_status_polls_from_env(self):
+        env = {"SIGNAL_POLL_SEC": "5", "SIGNAL_POLL_JITTER": "3", "BATTERY_POLL_SEC": "x"}
+        with patch.dict(os.environ, env):
+            polls = sms2mqtt._status_polls()
+        self.assertEqual(polls["signal"], (5.0, 1.0))
+        self.assertEqual(polls["battery"], (60.0, 0.1))
+
+    def test_scheduler_only_has_enabled_metrics(self):
+        config = SimpleNamespace(
+            moreinfo=False, heartbeat=True, status_polls=dict(sms2mqtt._status_polls())
+        )
+        scheduler = sms2mqtt.build_status_scheduler(config, now=0)
+        self.assertEqual(sorted(scheduler.intervals()), ["datetime", "signal"])
+
+
+class TestPollStatus(unittest.TestCase):
+    def test_polls_only_requested_metrics(self):
+        ctx = SimpleNamespace(config=SimpleNamespace(moreinfo=True, heartbeat=True))
+        fakes = {name: MagicMock() for name in mqtt_layer.STATUS_METRICS}
+        with patch.dict(mqtt_layer.STATUS_METRICS, fakes):
+            mqtt_layer.poll_status(ctx, ["battery"])
+            fakes["battery"].assert_called_once_with(ctx)
+            fakes["signal"].assert_not_called()
+            mqtt_layer.poll_status(ctx)
+        self.assertTrue(all(f.called for f in fakes.values()))
+
+
+class TestAdaptiveReceive(unittest.TestCase):
+    def test_backs_off_when_idle_and_tightens_on_activity(self):
+        poller = AdaptiveInterval(0.25, 5, backoff=2)
+        self.assertEqual([poller.record(False) for _ in range(6)], [0.5, 1, 2, 4, 5, 5])
+        self.assertEqual(poller.record(True), 0.25)
+
+    def test_poll_receive_counts_only_new_sms(self):
+        poller = AdaptiveInterval(0.25, 5)
+        poller.interval = 4
+        stuck = [{"Location": 3, "UDH": {"Type": "ConcatenatedMessages", "AllParts": 2}}]
+        ctx = SimpleNamespace(
+            config=SimpleNamespace(prefix="test"),
+            gammusm=MagicMock(),
+            client=MagicMock(),
+            receive_poller=poller,
+            stuck_sms_detected=False,
+            last_stuck_sms=[],
+            last_stuck_locations=None,
+        )
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = [stuck]
+            gio.link_sms.return_value = [stuck]
+            mqtt_layer.poll_receive(ctx)
+            self.assertEqual(poller.interval, 0.25)
+            # Same part still waiting on the SIM: not activity
+            mqtt_layer.poll_receive(ctx)
+            self.assertEqual(poller.interval, 0.5)
+
+    def test_schedule_receive_uses_modem_interval(self):
+        mctx = SimpleNamespace(
+            event_receive=False,
+            last_receive_scan=10.0,
+            receive_poller=AdaptiveInterval(0.25, 5),
+            worker=MagicMock(),
+        )
+        mctx.receive_poller.interval = 2.0
+        sms2mqtt.schedule_receive(mctx, 11.0)
+        mctx.worker.submit_once.assert_not_called()
+        sms2mqtt.schedule_receive(mctx, 12.0)
+        mctx.worker.submit_once.assert_called_once_with("receive", mqtt_layer.poll_receive, mctx)
+
+
+if __name__ == "__main__":
+    unittest.main()
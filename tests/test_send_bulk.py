@@ -0,0 +1,136 @@
+"""Tests for send_bulk: job validation, per-recipient enqueue, compact progress and summary."""
+
+import json
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+from logic import validate_bulk_payload  # noqa: E402
+
+
+class TestValidateBulkPayload(unittest.TestCase):
+    def test_numbers_with_shared_text(self):
+        payload = b'{"job_id": "j1", "text": "Hi", "numbers": [" +7 900 ", "7901"]}'
+        job_id, items, rejected, err = validate_bulk_payload(payload)
+        self.assertIsNone(err)
+        self.assertEqual(job_id, "j1")
+        self.assertEqual(items, [("+7900", "Hi"), ("7901", "Hi")])
+        self.assertEqual(rejected, [])
+
+    def test_per_recipient_texts(self):
+        payload = json.dumps(
+            {"JOB_ID": 42, "messages": [{"number": "1", "text": "a"}, {"Number": "2", "Text": "b"}]}
+        ).encode()
+        job_id, items, rejected, err = validate_bulk_payload(payload)
+        self.assertIsNone(err)
+        self.assertEqual(job_id, "42")
+        self.assertEqual(items, [("1", "a"), ("2", "b")])
+
+    def test_invalid_recipients_rejected_not_fatal(self):
+        payload = json.dumps(
+            {
+                "job_id": "j",
+                "messages": [
+                    {"number": "1", "text": "ok"},
+                    {"number": "", "text": "x"},
+                    {"number": "2;3", "text": "x"},
+                    {"number": "4", "text": "toolong"},
+                ],
+            }
+        ).encode()
+        job_id, items, rejected, err = validate_bulk_payload(payload, max_text_length=5)
+        self.assertIsNone(err)
+        self.assertEqual(items, [("1", "ok")])
+        self.assertEqual(len(rejected), 3)
+        self.assertIn("max length", rejected[2]["error"])
+
+    def test_job_level_errors(self):
+        cases = [
+            (b"not json", "decode"),
+            (b'{"text": "x", "numbers": ["1"]}', "job_id"),
+            (b'{"job_id": "j", "text": "x"}', "no numbers"),
+            (b'{"job_id": "j", "text": "x", "numbers": []}', "no recipients"),
+            (b'{"job_id": "j", "numbers": ["1"]}', "no text"),
+        ]
+        for payload, expected in cases:
+            job_id, items, rejected, err = validate_bulk_payload(payload)
+            self.assertIsNotNone(err, payload)
+            self.assertIn(expected, err["result"])
+
+    def test_too_many_recipients(self):
+        payload = b'{"job_id": "j", "text": "x", "numbers": ["1", "2", "3"]}'
+        _, _, _, err = validate_bulk_payload(payload, max_recipients=2)
+        self.assertIn("too many recipients", err["result"])
+        self.assertEqual(err["job_id"], "j")
+
+
+class TestSendBulkFlow(unittest.TestCase):
+    def _ctx(self, every=2):
+        return SimpleNamespace(
+            config=SimpleNamespace(prefix="test", max_text_length=None, bulk_progress_every=every),
+            gammusm=MagicMock(),
+            send_failures=0,
+            last_send_failure=0.0,
+        )
+
+    def _published(self, client, suffix):
+        return [
+            json.loads(c[0][1])
+            for c in client.publish.call_args_list
+            if c[0][0] == f"test/{suffix}"
+        ]
+
+    def test_progress_and_summary_instead_of_sent_echo(self):
+        ctx = self._ctx(every=2)
+        client = MagicMock()
+        payload = b'{"job_id": "j1", "text": "Hi", "numbers": ["1", "2", "3", "4", "5"]}'
+        msg = SimpleNamespace(topic="test/send_bulk", payload=payload)
+
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.send_sms.side_effect = [None, None, RuntimeError("boom"), None, None]
+            mqtt_layer.on_mqtt_message(client, ctx, msg)
+
+        self.assertEqual(gio.send_sms.call_count, 5)
+        self.assertEqual(self._published(client, "sent"), [])
+        progress = self._published(client, "send_bulk_progress")
+        self.assertEqual([p["done"] for p in progress], [2, 4])
+        self.assertEqual(progress[1], {"job_id": "j1", "done": 4, "total": 5, "failed": 1})
+        (summary,) = self._published(client, "send_bulk_result")
+        self.assertEqual(summary["result"], "partial")
+        self.assertEqual((summary["sent"], summary["failed"]), (4, 1))
+        self.assertEqual(summary["failures"], [{"number": "3", "error": "error : send failed"}])
+
+    def test_all_rejected_publishes_summary_without_sending(self):
+        ctx = self._ctx()
+        client = MagicMock()
+        msg = SimpleNamespace(
+            topic="test/send_bulk", payload=b'{"job_id": "j", "text": "x", "numbers": ["abc"]}'
+        )
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            mqtt_layer.on_mqtt_message(client, ctx, msg)
+        gio.send_sms.assert_not_called()
+        (summary,) = self._published(client, "send_bulk_result")
+        self.assertEqual(summary["result"], "error : send failed")
+        self.assertEqual(summary["failed"], 1)
+
+    def test_invalid_job_reports_error(self):
+        ctx = self._ctx()
+        client = MagicMock()
+        msg = SimpleNamespace(topic="test/send_bulk", payload=b'{"text": "x"}')
+        mqtt_layer.on_mqtt_message(client, ctx, msg)
+        (result,) = self._published(client, "send_bulk_result")
+        self.assertIn("job_id", result["result"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,8 @@
 import json
 import sys
 import unittest
-from unittest.mock import MagicMock
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
 # Mock heavy deps so sms2mqtt can be imported without gammu/paho installed (e.g. in CI)
 for mod in ("gammu", "certifi"):
@@ -13,7 +14,9 @@ sys.modules["paho"] = paho_mock
 sys.modules["paho.mqtt"] = paho_mock
 sys.modules["paho.mqtt.client"] = paho_mock
 
+import mqtt_layer  # noqa: E402
 import sms2mqtt  # noqa: E402
+from logic import parse_send_request  # noqa: E402
 
 
 class TestValidateSendPayload(unittest.TestCase):
@@ -150,5 +153,42 @@ class TestValidateSendPayload(unittest.TestCase):
         self.assertEqual(text, long_text)
 
 
+class TestParseSendRequest(unittest.TestCase):
+    """Tests for parse_send_request — the single-parse request object used by the send path."""
+
+    def test_recipients_normalized_once(self):
+        request = parse_send_request(b'{"number": "+7 900-123; 8 (900) 456", "text": "Hi"}')
+        self.assertIsNone(request.error)
+        self.assertEqual(request.numbers, ("+7900123", "8900456"))
+        self.assertEqual(request.text, "Hi")
+        self.assertFalse(hasattr(request, "__dict__"))
+
+    def test_action_payload_is_control_request(self):
+        request = parse_send_request(b'{"action": "gammu_stats"}')
+        self.assertEqual(request.action, "gammu_stats")
+        self.assertEqual(request.numbers, ())
+        self.assertIsNone(request.error)
+
+    def test_non_object_json_returns_error(self):
+        request = parse_send_request(b'["+7900", "Hi"]')
+        self.assertIn("json object", request.error["result"].lower())
+        self.assertEqual(request.error["payload"], '["+7900", "Hi"]')
+
+    def test_on_mqtt_message_sends_each_recipient_with_feedback(self):
+        ctx = SimpleNamespace(config=SimpleNamespace(prefix="sms2mqtt"), gammusm=object())
+        client = MagicMock()
+        msg = SimpleNamespace(
+            topic="sms2mqtt/send", payload=b'{"number": "+7900; +7901", "text": "Hi"}'
+        )
+        with patch.object(mqtt_layer, "send_one") as send_one:
+            mqtt_layer.on_mqtt_message(client, ctx, msg)
+        self.assertEqual(
+            [c.args[1:] for c in send_one.call_args_list], [("+7900", "Hi"), ("+7901", "Hi")]
+        )
+        feedback = [json.loads(c.args[1]) for c in client.publish.call_args_list]
+        self.assertEqual([f["number"] for f in feedback], ["+7900", "+7901"])
+        self.assertTrue(all(f["result"] == "success" for f in feedback))
+
+
 if __name__ == "__main__":
     unittest.main()
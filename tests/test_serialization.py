@@ -0,0 +1,87 @@
+"""Tests for payload serialization: formats per topic suffix and published payloads."""
+
+import importlib.util
+import json
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import mqtt_layer  # noqa: E402
+import serialization  # noqa: E402
+
+HAVE_MSGPACK = importlib.util.find_spec("msgpack") is not None
+
+
+class TestSerializer(unittest.TestCase):
+    def tearDown(self):
+        serialization.configure()
+
+    def test_json_default_keeps_unicode(self):
+        payload = serialization.dumps("received", {"text": "Привет"})
+        self.assertEqual(payload, '{"text": "Привет"}')
+
+    def test_parse_topic_formats(self):
+        self.assertEqual(
+            serialization.parse_topic_formats("received=msgpack, /sent = CBOR"),
+            {"received": "msgpack", "sent": "cbor"},
+        )
+        self.assertEqual(serialization.parse_topic_formats(""), {})
+        with self.assertRaises(ValueError):
+            serialization.parse_topic_formats("received=xml")
+        with self.assertRaises(ValueError):
+            serialization.parse_topic_formats("received")
+
+    def test_missing_library_is_reported(self):
+        real = sys.modules.get("cbor2")
+        sys.modules["cbor2"] = None
+        try:
+            with self.assertRaises(ValueError):
+                serialization.Serializer("cbor")
+        finally:
+            if real is not None:
+                sys.modules["cbor2"] = real
+            else:
+                del sys.modules["cbor2"]
+
+    @unittest.skipUnless(HAVE_MSGPACK, "msgpack not installed")
+    def test_binary_only_on_configured_topics(self):
+        import msgpack
+
+        serialization.configure("json", {"received": "msgpack"})
+        ctx = SimpleNamespace(
+            gammusm=MagicMock(),
+            client=MagicMock(),
+            config=SimpleNamespace(prefix="sms2mqtt"),
+            worker=object(),
+            stuck_sms_detected=False,
+            last_stuck_sms=[],
+        )
+        ctx.client.publish.return_value = SimpleNamespace(rc=0, mid=1)
+        sms = {
+            "Location": 1,
+            "DateTime": "2025-02-24 12:00:00",
+            "Number": "+7999",
+            "Text": "Hi",
+            "UDH": {"Type": "NoUDH"},
+        }
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.fetch_sms_batch.return_value = [[sms]]
+            gio.link_sms.return_value = [[sms]]
+            mqtt_layer.loop_sms_receive(ctx)
+        topic, payload = ctx.client.publish.call_args[0][:2]
+        self.assertEqual(topic, "sms2mqtt/received")
+        self.assertEqual(msgpack.unpackb(payload)["text"], "Hi")
+        self.assertEqual(json.loads(serialization.dumps("stats", {"a": 1})), {"a": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+"""Tests for SMS storage monitoring: fill levels, pressure cadence and routing to ME."""
+
+import json
+import os
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Mock heavy deps so mqtt_layer can be imported without gammu/paho installed (e.g. in CI)
+for mod in ("gammu", "certifi"):
+    sys.modules.setdefault(mod, MagicMock())
+paho_mock = MagicMock()
+sys.modules["paho"] = paho_mock
+sys.modules["paho.mqtt"] = paho_mock
+sys.modules["paho.mqtt.client"] = paho_mock
+
+import gammu_layer  # noqa: E402
+import mqtt_layer  # noqa: E402
+import sms2mqtt  # noqa: E402
+from scheduler import AdaptiveInterval  # noqa: E402
+from storage_monitor import StorageMonitor  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _status(sim_used, sim_size=30, phone_used=0, phone_size=0):
+    return {
+        "SIMUsed": sim_used,
+        "SIMSize": sim_size,
+        "PhoneUsed": phone_used,
+        "PhoneSize": phone_size,
+    }
+
+
+def _ctx(**kwargs):
+    ctx = SimpleNamespace(
+        config=SimpleNamespace(prefix="test", receive_fallback_poll_sec=30),
+        client=MagicMock(),
+        gammusm=MagicMock(),
+        storage_monitor=StorageMonitor(threshold=0.8),
+        receive_poller=AdaptiveInterval(0.25, 8),
+        incoming_sms_pending=False,
+        last_receive_scan=0.0,
+        **kwargs,
+    )
+    return ctx
+
+
+class TestStorageMonitor(unittest.TestCase):
+    def test_fill_per_memory_and_pressure(self):
+        monitor = StorageMonitor(threshold=0.8)
+        self.assertTrue(monitor.update(_status(12, phone_used=5, phone_size=100)))
+        self.assertEqual(monitor.stats()["fill"], {"SM": 0.4, "ME": 0.05})
+        self.assertFalse(monitor.pressure)
+        self.assertFalse(monitor.update(_status(12, phone_used=5, phone_size=100)))
+        monitor.update(_status(27))
+        self.assertEqual(
+            monitor.stats(), {"fill": {"SM": 0.9}, "pressure": True, "pressure_events": 1}
+        )
+
+    def test_checked_every_pass_only_under_pressure(self):
+        clock = Clock()
+        monitor = StorageMonitor(threshold=0.8, interval_sec=60, clock=clock)
+        monitor.update(_status(3))
+        clock.now = 10
+        self.assertFalse(monitor.due())
+        monitor.update(_status(29))
+        self.assertTrue(monitor.due())
+
+
+class TestStorageCadence(unittest.TestCase):
+    def test_publishes_changes_and_keeps_fast_cadence(self):
+        ctx = _ctx()
+        with (
+            patch.object(mqtt_layer, "gammu_io") as gio,
+            patch.object(
+                mqtt_layer,
+                "loop_sms_receive",
+                side_effect=lambda c: mqtt_layer.check_storage(c) or 0,
+            ),
+        ):
+            gio.get_sms_status.return_value = _status(28)
+            mqtt_layer.poll_receive(ctx)
+            mqtt_layer.poll_receive(ctx)
+            self.assertEqual(ctx.receive_poller.interval, 0.25)
+            gio.get_sms_status.return_value = _status(2)
+            mqtt_layer.poll_receive(ctx)
+            mqtt_layer.poll_receive(ctx)
+        self.assertEqual(ctx.receive_poller.interval, 1.0)
+        payloads = [json.loads(c[0][1]) for c in ctx.client.publish.call_args_list]
+        self.assertEqual([c[0][0] for c in ctx.client.publish.call_args_list], ["test/storage"] * 2)
+        self.assertEqual(payloads[0]["SM"], {"used": 28, "size": 30, "fill": 0.933})
+        self.assertEqual([p["pressure"] for p in payloads], [True, False])
+
+    def test_status_reread_under_pressure(self):
+        ctx = _ctx(inbox_scanner=SimpleNamespace(status_supported=True, last_status=_status(29)))
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            mqtt_layer.check_storage(ctx)
+            gio.get_sms_status.assert_not_called()
+            self.assertTrue(ctx.storage_monitor.pressure)
+            # The scanner's counters predate this pass's deletes
+            gio.get_sms_status.return_value = _status(10)
+            mqtt_layer.check_storage(ctx)
+        self.assertFalse(ctx.storage_monitor.pressure)
+
+    def test_only_unsupported_status_disables_monitor(self):
+        ctx = _ctx()
+        with patch.object(mqtt_layer, "gammu_io") as gio:
+            gio.get_sms_status.side_effect = RuntimeError("timeout")
+            gio.is_unsupported.return_value = False
+            mqtt_layer.check_storage(ctx)
+            self.assertIsNotNone(ctx.storage_monitor)
+            gio.is_unsupported.return_value = True
+            mqtt_layer.check_storage(ctx)
+        self.assertIsNone(ctx.storage_monitor)
+
+    def test_event_mode_scans_every_tick_under_pressure(self):
+        ctx = _ctx()
+        ctx.storage_monitor.update(_status(30))
+        with (
+            patch.object(mqtt_layer, "gammu_io"),
+            patch.object(mqtt_layer, "loop_sms_receive") as loop,
+        ):
+            self.assertTrue(mqtt_layer.receive_tick(ctx, now=1.0))
+        loop.assert_called_once_with(ctx)
+
+
+class TestIncomingStorageRouting(unittest.TestCase):
+    def test_cpms_written_to_device(self):
+        master, slave = os.openpty()
+        self.addCleanup(os.close, master)
+        self.addCleanup(os.close, slave)
+        received = []
+
+        def modem():
+            received.append(os.read(master, 256))
+            os.write(master, b"\r\n+CPMS: 0,255,0,255,0,255\r\n\r\nOK\r\n")
+
+        thread = threading.Thread(target=modem)
+        thread.start()
+        self.assertTrue(gammu_layer.set_incoming_storage(os.ttyname(slave), "ME"))
+        thread.join()
+        self.assertEqual(received, [b'AT+CPMS="ME","ME","ME"\r'])
+
+    def test_unknown_storage_is_ignored(self):
+        with patch.dict(os.environ, {"SMS_STORAGE": "flash"}, clear=False):
+            self.assertIsNone(sms2mqtt.build_config_from_env().sms_storage)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+"""
+MQTT v5 topic aliases for outgoing publishes. The first PUBLISH of a topic on a connection
+carries the topic and an alias; later ones carry only the 2-byte alias. Mappings live as long
+as the network connection, so reset() on every (re)connect with the broker's Topic Alias
+Maximum from CONNACK (0 disables aliases). No MQTT.
+"""
+
+import threading
+
+
+class TopicAliases:
+    """
+    Alias table for a fixed set of topics. Callers hold lock from resolve() until the
+    publish is queued, so the publish that announces an alias always goes out first.
+    """
+
+    def __init__(self, topics=(), maximum: int = 0):
+        self.lock = threading.Lock()
+        self.topics = frozenset(topics)
+        self.maximum = maximum
+        self.aliases = {}
+
+    def reset(self, maximum: int = 0) -> None:
+        """Forget all aliases (new connection); maximum is the broker's Topic Alias Maximum."""
+        with self.lock:
+            self.maximum = maximum
+            self.aliases = {}
+
+    def resolve(self, topic: str) -> tuple:
+        """
+        (topic to send, alias or None). ("", alias) once the alias is known to the broker,
+        (topic, alias) to announce a new one, (topic, None) if the topic gets no alias.
+        """
+        if topic not in self.topics:
+            return topic, None
+        alias = self.aliases.get(topic)
+        if alias is not None:
+            return "", alias
+        if len(self.aliases) >= self.maximum:
+            return topic, None
+        alias = self.aliases[topic] = len(self.aliases) + 1
+        return topic, alias